@@ -7,6 +7,7 @@
 # Extra  : 3-candle cooldown after each exit
 # Fees   : 0.03% brokerage each side (applied net at exit)
 # Outputs: trades_master.csv, events_master.csv, pnl_master.csv, available_balance_master.png
+# Run    : python -m backtest_runner.Bro_gaurd_SILVERMINI   (from the project root)
 
 import os
 import pandas as pd
@@ -14,6 +15,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime
 
+from utils.signals import c3_breakout_masks
+from utils.indicator_cache import indicator_cache, dataset_fingerprint
+from utils.trade_analytics import trade_analytics
+from utils.metrics import compute_metrics
+
 # ===================== User settings =====================
 
 # DATA_FILE = "SILVERM_15M_max.csv"   # change if needed
@@ -128,12 +134,12 @@ def load_data(path: str) -> pd.DataFrame:
     raw.sort_values("datetime", inplace=True)
     raw.reset_index(drop=True, inplace=True)
 
+    fp = dataset_fingerprint(raw)
     raw["ym"] = raw["datetime"].dt.to_period("M")
-    raw["is_month_end"] = False
-    raw.loc[raw.groupby("ym").tail(1).index, "is_month_end"] = True
+    raw["is_month_end"] = indicator_cache.month_end(raw["datetime"], "last_row", fp)
 
-    raw["ema_s"] = raw["close"].ewm(span=EMA_SHORT, adjust=False).mean()
-    raw["ema_l"] = raw["close"].ewm(span=EMA_LONG,  adjust=False).mean()
+    raw["ema_s"] = indicator_cache.ema(raw["close"], EMA_SHORT, fp)
+    raw["ema_l"] = indicator_cache.ema(raw["close"], EMA_LONG, fp)
 
     print(f"Rows in file: {total_rows} | Parsed bars used: {len(raw)}")
     print(f"Range  {raw['datetime'].min()}  to  {raw['datetime'].max()}")
@@ -203,6 +209,9 @@ def backtest(df: pd.DataFrame, starting_cash: float):
     current_day = None
     # ----------------------------------------------------------------
 
+    # C3 breakout masks, precomputed once for the whole series
+    long_breaks, short_breaks = c3_breakout_masks(df, BREAKOUT_BUFFER)
+
     def exit_now(ts, idx, reason: str, c3, l3, h3):
         nonlocal cash,pos_side,pos_price,pos_lots,realized_pnl_cum,wins,losses,flat_cash_min,flat_cash_max
         nonlocal fixed_stop,trail_stop
@@ -211,20 +220,11 @@ def backtest(df: pd.DataFrame, starting_cash: float):
 
         # -------- ADDED: require opposite C3 when reason == "EMA_REVERSAL" --------
         if reason == "EMA_REVERSAL":
-            # we need the last two completed candles (i-2, i-1)
-            if idx >= 2:
-                o1,h1,l1,c1 = df.iloc[idx-2][["open","high","low","close"]]
-                o2,h2,l2,c2 = df.iloc[idx-1][["open","high","low","close"]]
-                # if we are LONG, require a SHORT C3 breakout to confirm reversal
-                if pos_side == 1:
-                    opposite_c3 = (c1 < o1) and (c2 < o2) and (l2 < l1) and (c3 < (l2 * (1 - BREAKOUT_BUFFER)))
-                else:
-                    opposite_c3 = (c1 > o1) and (c2 > o2) and (h2 > h1) and (c3 > (h2 * (1 + BREAKOUT_BUFFER)))
-                if not opposite_c3:
-                    # do NOT exit on this bar; wait until opposite C3 confirms
-                    return
-            else:
-                # not enough history to confirm — skip exit this bar
+            # if we are LONG, require a SHORT C3 breakout to confirm reversal
+            # (masks are False for idx < 2: not enough history to confirm)
+            opposite_c3 = short_breaks[idx] if pos_side == 1 else long_breaks[idx]
+            if not opposite_c3:
+                # do NOT exit on this bar; wait until opposite C3 confirms
                 return
         # ---------------------------------------------------------------------------
 
@@ -316,8 +316,6 @@ def backtest(df: pd.DataFrame, starting_cash: float):
         row = df.iloc[i]
         ts = row["datetime"]
         o3,h3,l3,c3 = row[["open","high","low","close"]]
-        o1,h1,l1,c1 = df.iloc[i-2][["open","high","low","close"]]
-        o2,h2,l2,c2 = df.iloc[i-1][["open","high","low","close"]]
         ema_s = row["ema_s"]; ema_l = row["ema_l"]
         month_end = bool(row["is_month_end"])
 
@@ -364,8 +362,8 @@ def backtest(df: pd.DataFrame, starting_cash: float):
                 continue
             # --------------------------------------------------------------
 
-            long_break  = (c1 > o1) and (c2 > o2) and (h2 > h1) and (c3 > (h2 * (1 + BREAKOUT_BUFFER)))
-            short_break = (c1 < o1) and (c2 < o2) and (l2 < l1) and (c3 < (l2 * (1 - BREAKOUT_BUFFER)))
+            long_break  = long_breaks[i]
+            short_break = short_breaks[i]
             long_ok  = ema_s > ema_l
             short_ok = ema_s < ema_l
 
@@ -400,88 +398,20 @@ def backtest(df: pd.DataFrame, starting_cash: float):
 # ===================== Post-hoc P&L =====================
 
 def build_pnl_from_events(df: pd.DataFrame, events_df: pd.DataFrame) -> pd.DataFrame:
-    rows = []
-    open_pos = None
-    for _, e in events_df.sort_values("time").iterrows():
-        if e["event"] == "ENTRY":
-            open_pos = {
-                "time": e["time"],
-                "bar_index": int(e["bar_index"]),
-                "direction": e["direction"],
-                "price": float(e["price"]),
-                "lots": int(e["lots"]),
-                "reason": e["reason"],
-                "starting_cash": float(e["available_cash"])
-            }
-        elif e["event"] == "EXIT" and open_pos is not None:
-            entry_idx = open_pos["bar_index"]
-            exit_idx  = int(e["bar_index"])
-            entry_price = open_pos["price"]
-            exit_price  = float(e["price"])
-            dir_mult = 1 if open_pos["direction"]=="LONG" else -1
-
-            sl = df.iloc[entry_idx:exit_idx+1]
-            if open_pos["direction"] == "LONG":
-                mfe_pct = (sl["high"].max() - entry_price) / entry_price * 100.0
-                mae_pct = (sl["low"].min()  - entry_price) / entry_price * 100.0
-            else:
-                mfe_pct = (entry_price - sl["low"].min())  / entry_price * 100.0
-                mae_pct = (entry_price - sl["high"].max()) / entry_price * 100.0
-
-            gross_pnl = (exit_price - entry_price) * dir_mult * open_pos["lots"] * POINT_VALUE
-            brokerage_entry = BROKERAGE_PCT * entry_price * open_pos["lots"] * POINT_VALUE
-            brokerage_exit  = BROKERAGE_PCT * exit_price  * open_pos["lots"] * POINT_VALUE
-            total_brokerage = brokerage_entry + brokerage_exit
-            net_pnl = gross_pnl - total_brokerage
-
-            pnl_pct   = (exit_price - entry_price) / entry_price * 100.0 * dir_mult
-            hold_bars = (exit_idx - entry_idx)
-            hold_mins = hold_bars * BAR_MINUTES
-
-            rows.append({
-                "entry_time": open_pos["time"],
-                "exit_time": e["time"],
-                "direction": open_pos["direction"],
-                "entry_price": entry_price,
-                "exit_price": exit_price,
-                "lots": open_pos["lots"],
-                "reason_entry": open_pos["reason"],
-                "reason_exit": e["reason"],
-                "holding_bars": hold_bars,
-                "holding_minutes": hold_mins,
-                "mfe_pct": mfe_pct,
-                "mae_pct": mae_pct,
-                "gross_pnl": gross_pnl,
-                "brokerage": total_brokerage,
-                "net_pnl":   net_pnl,
-                "pnl_pct_price": pnl_pct,
-                "starting_cash_at_entry": open_pos["starting_cash"],
-                "available_after_exit": float(e["available_cash"]),
-            })
-            open_pos = None
-
-    return pd.DataFrame(rows)
+    # MFE / MAE over the bars of each trade, all trades at once (reduceat over high / low)
+    return trade_analytics(events_df, df["high"].to_numpy(), df["low"].to_numpy(),
+                           point_value=POINT_VALUE, brokerage_pct=BROKERAGE_PCT, bar_minutes=BAR_MINUTES)
 
 # ===================== Yearly compounded returns (unchanged) =====================
 
 def compute_yearly_compound_returns(events_df: pd.DataFrame, start_cash: float):
     if events_df.empty:
         return [], 0.0
-    exits = events_df[events_df["event"]=="EXIT"][["time","available_cash"]].copy()
-    if exits.empty:
+    out = compute_metrics(events_df, start_cash)["yearly"]
+    if not out:
         return [], 0.0
-    exits["year"] = pd.to_datetime(exits["time"]).dt.year
-    years = sorted(exits["year"].unique().tolist())
-    out, prev_end_cash = [], start_cash
-    for y in years:
-        yr = exits[exits["year"]==y].sort_values("time")
-        start_cash_y = prev_end_cash
-        end_cash_y   = float(yr["available_cash"].iloc[-1]) if not yr.empty else start_cash_y
-        ret_y = (end_cash_y / start_cash_y - 1.0) * 100.0 if start_cash_y > 0 else 0.0
-        out.append({"year": y, "start_cash": start_cash_y, "end_cash": end_cash_y, "return_pct": ret_y})
-        prev_end_cash = end_cash_y
     n_years = len(out)
-    cagr = ((out[-1]["end_cash"] / out[0]["start_cash"]) ** (1.0 / n_years) - 1.0) * 100.0 if n_years>0 and out[0]["start_cash"]>0 else 0.0
+    cagr = ((out[-1]["end_cash"] / out[0]["start_cash"]) ** (1.0 / n_years) - 1.0) * 100.0 if out[0]["start_cash"]>0 else 0.0
     return out, cagr
 
 # ===================== Reporting & I/O =====================
@@ -530,6 +460,12 @@ def print_summary(df, events_df, trades_df, stats):
         print(f"\nOverall CAGR across {len(yrs)} year(s): {cagr_pct:.2f}%")
     else:
         print("\nYearly compounded returns: (no EXIT events to compute)")
+
+    m = compute_metrics(events_df, STARTING_CASH, stats)
+    fmt_ratio = lambda v: "n/a" if v is None else f"{v:.2f}"
+    print(f"Max drawdown: {fmt_r(m['max_drawdown'])} ({fmt_ratio(m['max_drawdown_pct'])}%) over {m['max_drawdown_duration_days']:.1f} days")
+    print(f"Sharpe: {fmt_ratio(m['sharpe'])} | Sortino: {fmt_ratio(m['sortino'])} | Profit factor: {fmt_ratio(m['profit_factor'])}")
+    print(f"Expectancy: {fmt_r(m['expectancy'])} | Streaks W/L: {m['max_win_streak']}/{m['max_loss_streak']} | Exposure: {m['exposure_pct']:.2f}%")
     print("Done.")
 
 
@@ -14,6 +14,6 @@ class AngelOneKeyAdmin(admin.ModelAdmin):
 
 @admin.register(RunRequest)
 class RunRequestAdmin(admin.ModelAdmin):
-    list_display = ('id','user','strategy','status','created_at','finished_at')
+    list_display = ('id','user','strategy','status','progress','stage','created_at','finished_at')
     list_filter = ('status','strategy')
     readonly_fields = ('created_at','finished_at')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BacktestRunnerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backtest_runner'
+
+    def ready(self):
+        from backtest_runner import signals  # noqa: F401  (registers receivers)
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from utils.signals import c3_breakout_masks
+
 def backtest(df, strategy, starting_cash):
     """
     Universal backtest function
@@ -25,6 +27,9 @@ def backtest(df, strategy, starting_cash):
     df["ema_s"] = df["close"].ewm(span=EMA_SHORT, adjust=False).mean()
     df["ema_l"] = df["close"].ewm(span=EMA_LONG, adjust=False).mean()
 
+    # C3 breakout masks (this engine never required C2 higher-high / lower-low)
+    long_breaks, short_breaks = c3_breakout_masks(df, BREAKOUT_BUFFER, confirm_extreme=False)
+
     # Flags
     cash = starting_cash
     pos_side = 0              # 1=LONG, -1=SHORT, 0=FLAT
@@ -170,20 +175,13 @@ def backtest(df, strategy, starting_cash):
         if trades_today >= DAILY_TRADE_CAP:
             continue
 
-        # C3 breakout
-        o1, h1, l1, c1 = df.iloc[i-2][["open","high","low","close"]]
-        o2, h2, l2, c2 = df.iloc[i-1][["open","high","low","close"]]
-
-        long_break = (c1 > o1) and (c2 > o2) and (price > h2*(1+BREAKOUT_BUFFER))
-        short_break = (c1 < o1) and (c2 < o2) and (price < l2*(1-BREAKOUT_BUFFER))
-
         # Long entry
-        if long_break and row["ema_s"] > row["ema_l"]:
+        if long_breaks[i] and row["ema_s"] > row["ema_l"]:
             enter(i, 1, "C3_LONG + EMA_OK")
             continue
 
         # Short entry
-        if short_break and row["ema_s"] < row["ema_l"]:
+        if short_breaks[i] and row["ema_s"] < row["ema_l"]:
             enter(i, -1, "C3_SHORT + EMA_OK")
             continue
 
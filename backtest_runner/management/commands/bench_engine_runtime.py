@@ -0,0 +1,38 @@
+# backtest_runner/management/commands/bench_engine_runtime.py
+import json
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.runtime_benchmark import RUNTIMES, compare_runtimes
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the threaded and asyncio live-engine runtimes: engines per process, memory, "
+        "context switches and tick fan-out. Example: manage.py bench_engine_runtime --engines 50 200 --ticks 600"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--engines", type=int, nargs="+", default=[100], help="Engine counts to host")
+        parser.add_argument("--ticks", type=int, default=600, help="Ticks fanned out to every engine")
+        parser.add_argument("--idle", type=float, default=2.0, help="Idle window (seconds) for wake-up cost")
+        parser.add_argument("--runtime", action="append", choices=RUNTIMES, help="Runtime to run (default: both)")
+        parser.add_argument("--json", help="Also write the results to this JSON file")
+
+    def handle(self, *args, **opts):
+        if any(n < 1 for n in opts["engines"]):
+            raise CommandError("--engines must be positive")
+        results = []
+        for n in opts["engines"]:
+            self.stdout.write(f"Hosting {n} engine(s)...")
+            results += compare_runtimes(n, opts["ticks"], opts["idle"], opts["runtime"] or RUNTIMES)
+
+        columns = ["runtime", "engines", "os_threads", "rss_mb", "startup_s", "idle_ctx_switches_per_s",
+                   "idle_cpu_pct", "fanout_s", "ticks_per_s", "fanout_ctx_switches", "fanout_cpu_s"]
+        self.stdout.write(pd.DataFrame(results)[columns].to_string(index=False))
+
+        if opts["json"]:
+            with open(opts["json"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {opts['json']}"))
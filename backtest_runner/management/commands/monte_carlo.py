@@ -0,0 +1,62 @@
+# backtest_runner/management/commands/monte_carlo.py
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.backtest import backtest
+from utils.monte_carlo import run_monte_carlo
+from utils.sweep import strategy_by_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Backtest a candle CSV, then bootstrap its trade sequence through the lot-sizing rules "
+        "and report drawdown / ruin distributions. "
+        "Example: manage.py monte_carlo --csv SILVERM_15M.csv --paths 20000 --method block"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--csv", required=True, help="Candle CSV (datetime, open, high, low, close)")
+        parser.add_argument("--strategy", help="Strategy name supplying the parameters")
+        parser.add_argument("--cash", type=float, default=2_500_000.0, help="Starting cash")
+        parser.add_argument("--paths", type=int, default=10000, help="Number of simulated paths")
+        parser.add_argument("--horizon", type=int, default=None, help="Trades per path (default: backtest trade count)")
+        parser.add_argument("--method", choices=["bootstrap", "block"], default="bootstrap")
+        parser.add_argument("--block-size", type=int, default=5, help="Block length for --method block")
+        parser.add_argument("--sizing", choices=["backtest", "live"], default="backtest",
+                            help="Lot rules: backtest engine or live PositionManager")
+        parser.add_argument("--ruin-fraction", type=float, default=0.5,
+                            help="Path is ruined when cash <= this fraction of starting cash")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--out", help="Write per-path results to this CSV")
+
+    def handle(self, *args, **opts):
+        try:
+            strategy = strategy_by_name(opts["strategy"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        candles = pd.read_csv(opts["csv"])
+        try:
+            events_df, _, _ = backtest(candles, strategy=strategy, starting_cash=opts["cash"])
+            paths, summary = run_monte_carlo(
+                events_df, strategy=strategy, starting_cash=opts["cash"], n_paths=opts["paths"],
+                horizon=opts["horizon"], method=opts["method"], block_size=opts["block_size"],
+                sizing=opts["sizing"], ruin_fraction=opts["ruin_fraction"], seed=opts["seed"],
+            )
+        except (ValueError, KeyError) as e:
+            raise CommandError(str(e))
+
+        if opts["out"]:
+            paths.to_csv(opts["out"], index=False)
+            self.stdout.write(self.style.SUCCESS(f"Saved {len(paths)} paths to {opts['out']}"))
+
+        self.stdout.write(f"Trades: {summary['trades']} | paths: {summary['paths']} x {summary['horizon']} "
+                          f"| {summary['method']} / {summary['sizing']} sizing")
+        self.stdout.write(f"Ruin probability: {summary['ruin_probability']:.2%} | "
+                          f"loss probability: {summary['loss_probability']:.2%}")
+        for key in ("ending_cash", "max_drawdown", "max_drawdown_pct"):
+            row = "  ".join(f"p{q}={v:,.2f}" for q, v in summary[key].items())
+            self.stdout.write(f"{key}: {row}")
+        hist = summary["historical"]
+        self.stdout.write(f"Historical order: ending cash {hist['ending_cash']:,.2f} | "
+                          f"max drawdown {hist['max_drawdown_pct']:.2f}%")
@@ -0,0 +1,47 @@
+# backtest_runner/management/commands/portfolio_backtest.py
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.portfolio import run_portfolio
+from utils.sweep import strategy_by_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Backtest several Strategy rows against one shared cash / margin pool. "
+        "Example: manage.py portfolio_backtest --leg SILVERMINI=silverm_15m.csv --leg GOLDMINI=goldm_15m.csv"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--leg", action="append", required=True,
+                            help="STRATEGY_NAME=candles.csv (repeat for each instrument)")
+        parser.add_argument("--cash", type=float, default=2_500_000.0, help="Shared starting cash")
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes for leg preparation")
+        parser.add_argument("--out", help="Write the combined events to this CSV")
+
+    def handle(self, *args, **opts):
+        legs = {}
+        for spec in opts["leg"]:
+            name, sep, path = spec.partition("=")
+            if not sep or not path:
+                raise CommandError(f"Invalid --leg (expected NAME=path.csv): {spec}")
+            try:
+                strategy = strategy_by_name(name)
+            except ValueError as e:
+                raise CommandError(str(e))
+            legs[name] = (pd.read_csv(path), strategy)
+
+        try:
+            events_df, leg_results, stats = run_portfolio(legs, starting_cash=opts["cash"], workers=opts["workers"])
+        except (ValueError, KeyError) as e:
+            raise CommandError(str(e))
+
+        if opts["out"]:
+            events_df.to_csv(opts["out"], index=False)
+            self.stdout.write(self.style.SUCCESS(f"Saved {len(events_df)} events to {opts['out']}"))
+
+        for name, (_, trades_df, st) in leg_results.items():
+            self.stdout.write(f"{name}: trades {len(trades_df)} (W {st['wins']} / L {st['losses']}) "
+                              f"| realized {st['realized_pnl_sum']:,.2f}")
+        self.stdout.write(f"Portfolio: ending cash {stats['ending_cash']:,.2f} | "
+                          f"min cash {stats['flat_cash_min'][0]:,.2f} at {stats['flat_cash_min'][1]}")
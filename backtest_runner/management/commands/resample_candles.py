@@ -0,0 +1,31 @@
+# backtest_runner/management/commands/resample_candles.py
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.candle_resampler import update_resampled, load_resampled, TIMEFRAMES
+
+
+class Command(BaseCommand):
+    help = (
+        "Build / top up 5m, 15m, 30m and 1h LiveCandle rows from the stored 1-minute candles. "
+        "Example: manage.py resample_candles --user 1 --token 451669 --interval 15m --out SILVERM_15M.csv"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, required=True, help="User id owning the 1-minute candles")
+        parser.add_argument("--token", required=True, help="Instrument token")
+        parser.add_argument("--interval", action="append", choices=list(TIMEFRAMES),
+                            help="Interval to update (repeatable; default: all)")
+        parser.add_argument("--out", help="Export the first --interval as a backtest candle CSV")
+
+    def handle(self, *args, **opts):
+        intervals = opts["interval"] or list(TIMEFRAMES)
+        written = update_resampled(opts["user"], opts["token"], intervals)
+        for interval, n in written.items():
+            self.stdout.write(f"{interval}: {n} bar(s) written")
+
+        if opts["out"]:
+            df = load_resampled(opts["user"], opts["token"], intervals[0])
+            if df.empty:
+                raise CommandError(f"No {intervals[0]} candles stored for token {opts['token']}")
+            df.to_csv(opts["out"], index=False)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(df)} {intervals[0]} candles to {opts['out']}"))
@@ -0,0 +1,56 @@
+# backtest_runner/management/commands/run_benchmarks.py
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.benchmark import (
+    BENCHMARKS, DEFAULT_SIZES, run_benchmarks, load_history, append_history, compare_runs,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the backtest, indicator and P&L builders on seeded synthetic candles "
+        "(wall time + peak memory) and append the run to benchmarks/history.json. "
+        "Example: manage.py run_benchmarks --sizes 10000 100000 --only apply_indicators"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Bar counts")
+        parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Subset of benchmarks")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed calls per target (best is kept)")
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--include-slow", action="store_true",
+                            help="Also run row-by-row legacy engines above 100k bars")
+        parser.add_argument("--history", default=os.path.join(settings.BASE_DIR, "benchmarks", "history.json"))
+        parser.add_argument("--label", help="Free-text label stored with the run (e.g. release tag)")
+        parser.add_argument("--no-save", action="store_true", help="Do not write the history file")
+        parser.add_argument("--threshold", type=float, default=0.2, help="Regression threshold (0.2 = 20%% slower)")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **opts):
+        def log(row):
+            self.stdout.write(f"{row['name']:<28} {row['bars']:>9} bars  "
+                              f"{row['seconds']:>10.4f} s  {row['peak_mb']:>9.1f} MB")
+
+        results = run_benchmarks(sizes=opts["sizes"], names=opts["only"], repeat=opts["repeat"],
+                                 seed=opts["seed"], include_slow=opts["include_slow"], log=log)
+        for row in results:
+            if "skipped" in row:
+                self.stdout.write(f"{row['name']:<28} {row['bars']:>9} bars  skipped: {row['skipped']}")
+
+        history = load_history(opts["history"])
+        current = {"results": results}
+        if not opts["no_save"]:
+            current = append_history(opts["history"], results, label=opts["label"])
+            self.stdout.write(self.style.SUCCESS(f"Appended run to {opts['history']}"))
+
+        if history:
+            regressions = compare_runs(history[-1], current, opts["threshold"])
+            for r in regressions:
+                self.stdout.write(self.style.WARNING(
+                    f"REGRESSION {r['name']} @ {r['bars']} bars: {r['before']:.4f}s -> {r['after']:.4f}s (x{r['ratio']})"
+                ))
+            if regressions and opts["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} benchmark regression(s) vs previous run")
@@ -0,0 +1,41 @@
+# backtest_runner/management/commands/stream_backtest.py
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.streaming_backtest import stream_backtest
+from utils.sweep import strategy_by_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Backtest a candle CSV / Parquet file chunk by chunk in bounded memory "
+        "(same results as the in-memory engine). "
+        "Example: manage.py stream_backtest --file SILVERM_1M_2015_2024.csv --chunksize 200000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", required=True, help="Candle CSV or .parquet (datetime, open, high, low, close)")
+        parser.add_argument("--chunksize", type=int, default=100_000, help="Rows read per chunk")
+        parser.add_argument("--strategy", help="Strategy name supplying the parameters")
+        parser.add_argument("--cash", type=float, default=2_500_000.0, help="Starting cash")
+        parser.add_argument("--out", help="Write events to this CSV")
+
+    def handle(self, *args, **opts):
+        try:
+            strategy = strategy_by_name(opts["strategy"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        try:
+            events_df, trades_df, stats = stream_backtest(opts["file"], strategy=strategy,
+                                                          starting_cash=opts["cash"], chunksize=opts["chunksize"])
+        except (OSError, ValueError, KeyError, ImportError) as e:
+            raise CommandError(str(e))
+
+        if opts["out"]:
+            events_df.to_csv(opts["out"], index=False)
+            self.stdout.write(self.style.SUCCESS(f"Saved {len(events_df)} events to {opts['out']}"))
+
+        self.stdout.write(
+            f"{stats['first_ts']} -> {stats['last_ts']} | trades {len(trades_df)} "
+            f"(W {stats['wins']} / L {stats['losses']}) | ending cash {stats['ending_cash']:,.2f}"
+        )
@@ -0,0 +1,44 @@
+# backtest_runner/management/commands/sweep_strategy.py
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.sweep import run_sweep, SWEEP_FIELDS, load_grid, strategy_by_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a parallel parameter sweep of the C3+EMA backtest over a candle CSV. "
+        'Example: manage.py sweep_strategy --csv SILVERM_15M.csv --strategy SILVERMINI '
+        '--grid \'{"ema_short": [9, 27], "ema_long": [26, 78], "fixed_sl_pct": [0.01, 0.015]}\''
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--csv", required=True, help="Candle CSV (datetime, open, high, low, close)")
+        parser.add_argument("--grid", required=True,
+                            help=f"JSON object or path to a JSON file; keys from {', '.join(SWEEP_FIELDS)}")
+        parser.add_argument("--strategy", help="Strategy name supplying the fixed parameters")
+        parser.add_argument("--cash", type=float, default=2_500_000.0, help="Starting cash")
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+        parser.add_argument("--rank-by", default="ending_cash", help="Result column to rank by")
+        parser.add_argument("--top", type=int, default=20, help="Rows to print")
+        parser.add_argument("--out", help="Write the full ranked table to this CSV")
+
+    def handle(self, *args, **opts):
+        try:
+            grid = load_grid(opts["grid"])
+            strategy = strategy_by_name(opts["strategy"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        candles = pd.read_csv(opts["csv"])
+        try:
+            table = run_sweep(candles, grid, strategy=strategy, starting_cash=opts["cash"],
+                              workers=opts["workers"], rank_by=opts["rank_by"])
+        except (ValueError, KeyError) as e:
+            raise CommandError(str(e))
+
+        if opts["out"]:
+            table.to_csv(opts["out"], index=False)
+            self.stdout.write(self.style.SUCCESS(f"Saved {len(table)} rows to {opts['out']}"))
+
+        self.stdout.write(table.head(opts["top"]).to_string(index=False))
@@ -0,0 +1,46 @@
+# backtest_runner/management/commands/tick_journal.py
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.tick_journal import export_to_livetick, journal_days, read_ticks, ticks_frame
+
+
+class Command(BaseCommand):
+    help = (
+        "Inspect / export the per-instrument tick journal. "
+        "Example: manage.py tick_journal --token 451669 --day 2024-03-01 --csv ticks.csv"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--token", required=True, help="Instrument token")
+        parser.add_argument("--day", help="IST day YYYY-MM-DD (default: list journal days)")
+        parser.add_argument("--csv", help="Write the day's ticks (datetime, price) to this CSV")
+        parser.add_argument("--to-db", action="store_true", help="Copy the day's ticks into LiveTick rows")
+        parser.add_argument("--user", type=int, help="User id owning the LiveTick rows (with --to-db)")
+
+    def handle(self, *args, **opts):
+        token = opts["token"]
+        if not opts["day"]:
+            for day in journal_days(token):
+                self.stdout.write(f"{day}: {len(read_ticks(token, day))} tick(s)")
+            return
+
+        try:
+            day = datetime.strptime(opts["day"], "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"Invalid --day: {opts['day']}")
+        ticks = read_ticks(token, day)
+        if not len(ticks):
+            raise CommandError(f"No ticks journaled for token {token} on {day}")
+        self.stdout.write(f"{day}: {len(ticks)} tick(s), price {ticks['price'].min():.2f} .. {ticks['price'].max():.2f}")
+
+        if opts["csv"]:
+            ticks_frame(token, day).to_csv(opts["csv"], index=False)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(ticks)} ticks to {opts['csv']}"))
+
+        if opts["to_db"]:
+            if opts["user"] is None:
+                raise CommandError("--to-db needs --user")
+            n = export_to_livetick(opts["user"], token, day)
+            self.stdout.write(self.style.SUCCESS(f"Exported {n} ticks into LiveTick"))
@@ -0,0 +1,56 @@
+# backtest_runner/management/commands/walk_forward.py
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.sweep import SWEEP_FIELDS, load_grid, strategy_by_name
+from utils.walk_forward import run_walk_forward
+
+
+class Command(BaseCommand):
+    help = (
+        "Walk-forward optimisation of the C3+EMA backtest over a candle CSV: optimise the grid on "
+        "rolling in-sample months, trade the winner on the next out-of-sample months. "
+        'Example: manage.py walk_forward --csv SILVERM_15M.csv --is-months 6 --oos-months 1 '
+        '--grid \'{"ema_short": [9, 27], "ema_long": [26, 78]}\''
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--csv", required=True, help="Candle CSV (datetime, open, high, low, close)")
+        parser.add_argument("--grid", required=True,
+                            help=f"JSON object or path to a JSON file; keys from {', '.join(SWEEP_FIELDS)}")
+        parser.add_argument("--strategy", help="Strategy name supplying the fixed parameters")
+        parser.add_argument("--cash", type=float, default=2_500_000.0, help="Starting cash")
+        parser.add_argument("--is-months", type=int, default=6, help="In-sample months per window")
+        parser.add_argument("--oos-months", type=int, default=1, help="Out-of-sample months per window")
+        parser.add_argument("--step-months", type=int, default=None,
+                            help="Window step, >= --oos-months (default: --oos-months)")
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+        parser.add_argument("--rank-by", default="ending_cash", help="In-sample column to optimise")
+        parser.add_argument("--out", help="Write the stitched out-of-sample events to this CSV")
+
+    def handle(self, *args, **opts):
+        try:
+            grid = load_grid(opts["grid"])
+            strategy = strategy_by_name(opts["strategy"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        candles = pd.read_csv(opts["csv"])
+        try:
+            events_df, windows_df, stats = run_walk_forward(
+                candles, grid, strategy=strategy, starting_cash=opts["cash"],
+                in_sample_months=opts["is_months"], out_of_sample_months=opts["oos_months"],
+                step_months=opts["step_months"], workers=opts["workers"], rank_by=opts["rank_by"],
+            )
+        except (ValueError, KeyError) as e:
+            raise CommandError(str(e))
+
+        if opts["out"]:
+            events_df.to_csv(opts["out"], index=False)
+            self.stdout.write(self.style.SUCCESS(f"Saved {len(events_df)} events to {opts['out']}"))
+
+        self.stdout.write(windows_df.to_string(index=False))
+        self.stdout.write(
+            f"Out-of-sample: {stats['first_ts']} -> {stats['last_ts']} | "
+            f"trades {stats['wins'] + stats['losses']} | ending cash {stats['ending_cash']:,.2f}"
+        )
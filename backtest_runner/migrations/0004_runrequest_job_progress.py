@@ -0,0 +1,43 @@
+# Generated by Django 4.2.26 on 2026-10-18 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backtest_runner', '0003_remove_runrequest_balance_png_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='runrequest',
+            name='cancel_requested',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='runrequest',
+            name='params',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='runrequest',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='runrequest',
+            name='stage',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='runrequest',
+            name='task_id',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='runrequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+    ]
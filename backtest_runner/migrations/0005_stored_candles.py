@@ -0,0 +1,46 @@
+# Generated by Django 4.2.26 on 2026-10-18 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backtest_runner', '0004_runrequest_job_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredCandleDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exchange', models.CharField(max_length=10)),
+                ('token', models.CharField(max_length=20)),
+                ('interval', models.CharField(max_length=20)),
+                ('day', models.DateField()),
+                ('candles', models.IntegerField(default=0)),
+                ('fetched_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('exchange', 'token', 'interval', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StoredCandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exchange', models.CharField(max_length=10)),
+                ('token', models.CharField(max_length=20)),
+                ('interval', models.CharField(max_length=20)),
+                ('start_time', models.DateTimeField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('volume', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('exchange', 'token', 'interval', 'start_time')},
+            },
+        ),
+    ]
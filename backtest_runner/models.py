@@ -53,6 +53,7 @@ class RunRequest(models.Model):
         ('running','Running'),
         ('done','Done'),
         ('failed','Failed'),
+        ('cancelled','Cancelled'),
     ]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -64,8 +65,48 @@ class RunRequest(models.Model):
     finished_at = models.DateTimeField(null=True, blank=True)
     error = models.TextField(blank=True, null=True)
 
+    # async job state (backtest_runner.tasks.run_backtest_job)
+    params = models.JSONField(blank=True, null=True)               # from/to dates, intrabar, ...
+    task_id = models.CharField(max_length=50, blank=True, null=True)
+    progress = models.PositiveSmallIntegerField(default=0)           # 0-100
+    stage = models.CharField(max_length=100, blank=True, default='')
+    cancel_requested = models.BooleanField(default=False)
+
     # Optionally store results as JSON in the DB (not mandatory)
     results = models.JSONField(blank=True, null=True)
 
     def __str__(self):
         return f"Run #{self.id} by {self.user} ({self.status})"
+
+
+class StoredCandle(models.Model):
+    """
+    Broker candles kept locally (utils.candle_store), so history already
+    downloaded is served from the database instead of getCandleData.
+    """
+    exchange = models.CharField(max_length=10)
+    token = models.CharField(max_length=20)
+    interval = models.CharField(max_length=20)                    # AngelOne name, e.g. FIFTEEN_MINUTE
+    start_time = models.DateTimeField()
+
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('exchange', 'token', 'interval', 'start_time')
+
+
+class StoredCandleDay(models.Model):
+    """One row per (instrument, interval, IST day) fully present in StoredCandle (holidays included)."""
+    exchange = models.CharField(max_length=10)
+    token = models.CharField(max_length=20)
+    interval = models.CharField(max_length=20)
+    day = models.DateField()
+    candles = models.IntegerField(default=0)
+    fetched_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('exchange', 'token', 'interval', 'day')
@@ -0,0 +1,13 @@
+# backtest_runner/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from backtest_runner.models import Strategy
+from utils.result_cache import result_cache
+
+
+@receiver(post_save, sender=Strategy)
+@receiver(post_delete, sender=Strategy)
+def drop_cached_results(sender, instance, **kwargs):
+    # cached dashboard backtests were computed with the old parameters
+    result_cache.invalidate(instance.pk)
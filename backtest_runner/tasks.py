@@ -0,0 +1,249 @@
+# backtest_runner/tasks.py
+import base64
+import os
+
+import pandas as pd
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from logzero import logger
+
+from backtest_runner.models import RunRequest
+from utils.angel_one import get_rms_balance, refresh
+from utils.candle_store import get_angelone_candles_cached
+from utils.backtest import backtest, balance_chart_base64, resolve_strategy_params
+from utils.intrabar import SUB_BAR_INTERVAL
+from utils.metrics import compute_metrics
+from utils.result_cache import result_cache, result_key
+
+BAR_INTERVAL = "FIFTEEN_MINUTE"
+
+IST = "Asia/Kolkata"
+
+# share of the progress bar given to the backtest loop itself
+BACKTEST_PROGRESS = (35, 85)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobError(Exception):
+    """Failure with a message meant for the user (shown on the page as is)."""
+
+
+# -------------------------
+# Progress / cancellation
+# -------------------------
+def _set(run_id, **fields):
+    # field-level update: never overwrites cancel_requested set by the web process
+    RunRequest.objects.filter(pk=run_id).update(**fields)
+
+
+def report(run_id, progress, stage=None):
+    """Store progress (0-100) and stage; raises JobCancelled if the user cancelled."""
+    fields = {"progress": int(progress)}
+    if stage is not None:
+        fields["stage"] = stage
+    _set(run_id, **fields)
+    if RunRequest.objects.filter(pk=run_id, cancel_requested=True).exists():
+        raise JobCancelled()
+
+
+def _api_date(value):
+    """AngelOne expects "YYYY-MM-DD HH:MM" (no seconds), naive."""
+    dt = pd.Timestamp(value)
+    if dt.tzinfo is not None:
+        dt = dt.tz_convert(None)
+    return dt.strftime("%Y-%m-%d %H:%M")
+
+
+def _range_closed(to_date):
+    """True if the range ends before today (IST): today's candles still change, so such results are not cached."""
+    return pd.Timestamp(to_date).date() < pd.Timestamp.now(tz=IST).date()
+
+
+def _json_stats(stats):
+    fmin, tmin = stats["flat_cash_min"]
+    fmax, tmax = stats["flat_cash_max"]
+    as_str = lambda ts: None if ts is None else str(ts)
+    return {
+        "wins": stats["wins"], "losses": stats["losses"],
+        "ending_cash": stats["ending_cash"], "realized_pnl_sum": stats["realized_pnl_sum"],
+        "flat_cash_min": [fmin, as_str(tmin)], "flat_cash_max": [fmax, as_str(tmax)],
+        "first_ts": as_str(stats["first_ts"]), "last_ts": as_str(stats["last_ts"]),
+    }
+
+
+def format_numeric(df):
+    if df is None or df.empty:
+        return df
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].map(lambda x: f"{x:,.2f}")
+    return df
+
+
+def _html(df):
+    return format_numeric(df).head(50).to_html(classes="table table-striped table-sm", index=False) \
+        if df is not None and not df.empty else ""
+
+
+# -------------------------
+# Job body
+# -------------------------
+def _refresh_session(run):
+    report(run.pk, 5, "Refreshing AngelOne session")
+    ang_key = refresh(run.api_key)
+    if not ang_key.jwt_token:
+        raise JobError("AngelOne session expired. Please reconnect API.")
+    return ang_key
+
+
+def _rms_starting_cash(run, ang_key):
+    """Available cash from RMS; DEFAULT_STARTING_CASH if it cannot be read."""
+    report(run.pk, 10, "Fetching RMS balance")
+    starting_cash = float(getattr(settings, "DEFAULT_STARTING_CASH", 2_500_000))
+    try:
+        rms_data, rms_err = get_rms_balance(ang_key)
+        if rms_data and isinstance(rms_data, dict):
+            available = rms_data.get("availablecash") or rms_data.get("available_cash") or rms_data.get("net")
+            if available is not None:
+                starting_cash = float(available)
+    except Exception:
+        pass
+    return starting_cash
+
+
+def execute_backtest_run(run):
+    """
+    Everything the live backtest page used to do inside the request:
+    candles + RMS from AngelOne, backtest, metrics, chart and CSVs. Starting
+    cash is the submitted amount, else the RMS available cash (part of the
+    result key either way). A finished run with the same key
+    (utils.result_cache.result_key) skips the candle download and the
+    simulation, and with a submitted amount the broker session too; ranges
+    reaching today are never cached. Returns the JSON stored in
+    RunRequest.results.
+    """
+    params, strategy = run.params or {}, run.strategy
+    if strategy is None:
+        raise JobError("Strategy no longer exists.")
+    if run.api_key is None:
+        raise JobError("No AngelOne credentials found. Add them in API Integration.")
+
+    symbol_token = str(strategy.symbol).strip()
+    from_date, to_date = _api_date(params["from_date"]), _api_date(params["to_date"])
+
+    ang_key = None
+    if params.get("starting_cash"):
+        starting_cash = float(params["starting_cash"])
+    else:
+        ang_key = _refresh_session(run)
+        starting_cash = _rms_starting_cash(run, ang_key)
+
+    key = result_key(resolve_strategy_params(strategy), symbol_token, BAR_INTERVAL, from_date, to_date,
+                     starting_cash, intrabar=bool(params.get("intrabar")))
+    cached = result_cache.get(strategy.pk, key)
+    if cached is not None:
+        report(run.pk, 90, "Loaded cached result")
+        return _write_outputs(run, cached, starting_cash, symbol_token, from_cache=True)
+
+    if ang_key is None:
+        ang_key = _refresh_session(run)
+
+    def candles(interval):
+        df, err = get_angelone_candles_cached(jwt_token=ang_key.jwt_token, api_key=ang_key.api_key,
+                                              exchange=strategy.exchange, symbol_token=symbol_token,
+                                              interval=interval, fromdate=from_date, todate=to_date)
+        if err:
+            raise JobError(f"API Error: {err}" if interval == BAR_INTERVAL else f"API Error (1-minute candles): {err}")
+        return df
+
+    report(run.pk, 15, "Downloading candles")
+    candles_df = candles(BAR_INTERVAL)
+    if candles_df is None or len(candles_df) == 0:
+        raise JobError("No candle data returned for the given range.")
+
+    sub_candles = None
+    if params.get("intrabar"):
+        report(run.pk, 25, "Downloading 1-minute candles")
+        sub_candles = candles(SUB_BAR_INTERVAL)
+
+    lo, hi = BACKTEST_PROGRESS
+    report(run.pk, lo, "Running backtest")
+    try:
+        events_df, trades_df, stats = backtest(
+            candles_df, strategy=strategy, starting_cash=starting_cash, sub_candles=sub_candles,
+            progress=lambda done, total: report(run.pk, lo + (hi - lo) * done / max(total, 1)))
+    except JobCancelled:
+        raise
+    except Exception as e:
+        raise JobError(f"Backtest failed: {e}")
+
+    report(run.pk, 90, "Writing results")
+    _, b64 = balance_chart_base64(events_df).split(",", 1)
+    entry = {"events": events_df, "trades": trades_df, "stats": stats, "chart_png": base64.b64decode(b64)}
+    if _range_closed(to_date):
+        result_cache.put(strategy.pk, key, entry)
+    return _write_outputs(run, entry, starting_cash, symbol_token)
+
+
+def _write_outputs(run, entry, starting_cash, symbol_token, from_cache=False):
+    """CSVs + chart into the run's media directory; returns RunRequest.results."""
+    events_df, trades_df, stats = entry["events"], entry["trades"], entry["stats"]
+    pnl_df = (events_df.loc[events_df["event"] == "EXIT", ["time", "realized_pnl"]]
+              .rename(columns={"time": "exit_time", "realized_pnl": "net_pnl"})
+              .reset_index(drop=True)) if not events_df.empty else pd.DataFrame()
+    metrics = compute_metrics(events_df, starting_cash, stats)
+
+    # media/live_outputs/user_{id}/run_{id}/
+    rel_dir = f"live_outputs/user_{run.user_id}/run_{run.pk}"
+    out_dir = os.path.join(settings.MEDIA_ROOT, rel_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    events_df.to_csv(os.path.join(out_dir, "events.csv"), index=False)
+    trades_df.to_csv(os.path.join(out_dir, "trades.csv"), index=False)
+    pnl_df.to_csv(os.path.join(out_dir, "pnl.csv"), index=False)
+    with open(os.path.join(out_dir, "balance.png"), "wb") as fh:
+        fh.write(entry["chart_png"])
+
+    url = settings.MEDIA_URL + rel_dir
+    return {
+        "stats": _json_stats(stats),
+        "metrics": metrics,
+        "starting_cash": starting_cash,
+        "symbol_token": symbol_token,
+        "from_cache": from_cache,
+        "events": _html(events_df),
+        "trades": _html(trades_df),
+        "pnl": _html(pnl_df),
+        "chart": f"{url}/balance.png",
+        "events_csv": f"{url}/events.csv",
+        "trades_csv": f"{url}/trades.csv",
+        "pnl_csv": f"{url}/pnl.csv",
+    }
+
+
+@shared_task(bind=True)
+def run_backtest_job(self, run_id):
+    """Celery entry point: run one RunRequest and record its outcome."""
+    run = RunRequest.objects.select_related("strategy", "api_key", "user").filter(pk=run_id).first()
+    if run is None or run.status != "pending":
+        return
+    if run.cancel_requested:
+        _set(run_id, status="cancelled", stage="Cancelled", finished_at=timezone.now())
+        return
+
+    _set(run_id, status="running", progress=0, stage="Starting")
+    try:
+        results = execute_backtest_run(run)
+    except JobCancelled:
+        _set(run_id, status="cancelled", stage="Cancelled", finished_at=timezone.now())
+    except JobError as e:
+        _set(run_id, status="failed", error=str(e), stage="Failed", finished_at=timezone.now())
+    except Exception as e:
+        logger.exception("Backtest job %s failed", run_id)
+        _set(run_id, status="failed", error=f"Backtest failed: {e}", stage="Failed", finished_at=timezone.now())
+    else:
+        _set(run_id, status="done", results=results, progress=100, stage="Done", finished_at=timezone.now())
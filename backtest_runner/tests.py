@@ -1,3 +1,1240 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from accounts.models import User
+from backtest_runner.models import AngelOneKey, RunRequest, Strategy
+from backtest_runner.tasks import BAR_INTERVAL, _range_closed, execute_backtest_run
+
+from utils.backtest import backtest, normalize_candles, apply_indicators, resolve_strategy_params, build_detailed_pnl_df
+from utils.signals import c3_breakout_masks, c3_breakout_mask_table
+from utils.sweep import run_sweep, expand_grid, summarize_stats, load_grid, strategy_by_name
+from utils.indicator_cache import IndicatorCache, dataset_fingerprint
+from utils.walk_forward import run_walk_forward, month_windows
+from utils.streaming_backtest import stream_backtest
+from utils.portfolio import run_portfolio
+from utils.benchmark import synthetic_ohlc, measure, append_history, compare_runs
+from utils.event_log import EventLog, TRADE_SCHEMA
+from utils.trade_analytics import trade_analytics, segment_extremes
+from utils.monte_carlo import trade_samples, resample_indices, simulate_paths, run_monte_carlo
+from utils.metrics import compute_metrics
+from utils.intrabar import sub_bar_arrays
+from utils.candle_resampler import resample_ohlc, update_resampled, load_resampled
+from utils.result_cache import ResultCache, result_cache, result_key
+from utils.candle_store import get_candles, missing_day_runs
+from utils.historical_downloader import TokenBucket, split_windows, download_candles
+from utils.broker_client import AngelOneClient, LatencyHistogram, ENDPOINTS
+from utils.live_indicators import LiveIndicators
+from utils.candle_ring import CandleRingBuffer, to_epoch_ns
+from utils.tick_writer import BatchedTickWriter, save_live_ticks
+from utils.market_data_hub import MarketDataHub, LocalFeed, decode_tick, market_data_hub
+from utils.live_data_runner import UserEngine, on_market_tick, websocket_thread
+from utils.tick_journal import TickJournal, read_ticks, ticks_frame, journal_days, export_to_livetick
+from utils.candle_builder import update_candle
+from utils.engine_runtime import AsyncEngineRuntime
+from utils.runtime_benchmark import benchmark_runtime
+from utils.strategies_live import c3_strategy, c3_signal
+from utils.indicator_preprocessor import add_indicators
+
+
+class ArrayEngineParityTests(SimpleTestCase):
+
+    def assert_same_run(self, candles, strategy=None):
+        ev_a, tr_a, st_a = backtest(candles, strategy=strategy, engine="array")
+        ev_p, tr_p, st_p = backtest(candles, strategy=strategy, engine="pandas")
+
+        self.assertGreater(len(tr_p), 20)
+        pd.testing.assert_frame_equal(ev_a, ev_p)
+        pd.testing.assert_frame_equal(tr_a, tr_p)
+        self.assertEqual(st_a, st_p)
+
+    def test_matches_pandas_loop(self):
+        self.assert_same_run(synthetic_ohlc())
+
+    def test_matches_pandas_loop_tz_aware(self):
+        # get_angelone_candles returns Asia/Kolkata timestamps
+        self.assert_same_run(synthetic_ohlc(seed=11, tz="Asia/Kolkata"),
+                             strategy={"daily_trade_cap": 2, "breakout_buffer": 0.0005})
+
+    def test_short_input(self):
+        ev, tr, st = backtest(synthetic_ohlc(2))
+        self.assertTrue(ev.empty and tr.empty)
+        self.assertEqual(st["ending_cash"], 2500000.0)
+
+
+class C3SignalMaskTests(SimpleTestCase):
+
+    def test_masks_match_scalar_rule(self):
+        df = synthetic_ohlc(3000, seed=3)
+        buf = 0.0012
+        long_break, short_break = c3_breakout_masks(df, buf)
+
+        o, h, l, c = (df[k].tolist() for k in ("open", "high", "low", "close"))
+        for i in range(len(df)):
+            if i < 2:
+                exp_long = exp_short = False
+            else:
+                exp_long = (c[i-2] > o[i-2]) and (c[i-1] > o[i-1]) and (h[i-1] > h[i-2]) and (c[i] > h[i-1] * (1 + buf))
+                exp_short = (c[i-2] < o[i-2]) and (c[i-1] < o[i-1]) and (l[i-1] < l[i-2]) and (c[i] < l[i-1] * (1 - buf))
+            self.assertEqual(bool(long_break[i]), exp_long)
+            self.assertEqual(bool(short_break[i]), exp_short)
+
+    def test_table_matches_single_buffer(self):
+        df = synthetic_ohlc(1000, seed=5)
+        table = c3_breakout_mask_table(df, [0.0, 0.0012, 0.003])
+        for buf, (lb, sb) in table.items():
+            exp_lb, exp_sb = c3_breakout_masks(df, buf)
+            np.testing.assert_array_equal(lb, exp_lb)
+            np.testing.assert_array_equal(sb, exp_sb)
+
+    def test_script_engine_matches_utils_engine(self):
+        from backtest_runner import Bro_gaurd_SILVERMINI as script
+
+        candles = synthetic_ohlc(4000, seed=9)
+        prepared = apply_indicators(normalize_candles(candles), {"ema_short": 27, "ema_long": 78})
+        with redirect_stdout(io.StringIO()):
+            ev_s, tr_s, st_s = script.backtest(prepared, script.STARTING_CASH)
+        ev_u, tr_u, st_u = backtest(candles, starting_cash=script.STARTING_CASH)
+
+        pd.testing.assert_frame_equal(ev_s, ev_u)
+        self.assertEqual(st_s, st_u)
+
+
+class SweepTests(SimpleTestCase):
+
+    def test_load_grid(self):
+        self.assertEqual(load_grid('{"ema_short": [9, 27]}'), {"ema_short": [9, 27]})
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as fh:
+            json.dump({"ema_long": [26]}, fh)
+        try:
+            self.assertEqual(load_grid(fh.name), {"ema_long": [26]})
+        finally:
+            os.remove(fh.name)
+        for bad in ("{not json", "/no/such/grid.json"):
+            with self.assertRaises(ValueError):
+                load_grid(bad)
+        self.assertIsNone(strategy_by_name(None))
+
+    def test_rows_match_single_backtests(self):
+        candles = synthetic_ohlc(3000, seed=4)
+        grid = {"ema_short": [9, 27], "breakout_buffer": [0.0006, 0.0012], "margin_factor": [0.15]}
+        table = run_sweep(candles, grid, workers=2)
+
+        self.assertEqual(len(table), 4)
+        self.assertEqual(table["rank"].tolist(), [1, 2, 3, 4])
+        self.assertTrue(table["ending_cash"].is_monotonic_decreasing)
+        for _, row in table.iterrows():
+            params = {"ema_short": int(row["ema_short"]), "breakout_buffer": row["breakout_buffer"]}
+            ev, _, stats = backtest(candles, strategy=params)
+            expected = summarize_stats(stats, ev, 2500000.0)
+            for col, val in expected.items():
+                if val is None:
+                    self.assertTrue(pd.isna(row[col]))
+                else:
+                    self.assertAlmostEqual(row[col], val, places=6)
+
+    def test_unknown_field_rejected(self):
+        with self.assertRaises(ValueError):
+            expand_grid({"cooldown": [1, 2]})
+
+
+class IndicatorCacheTests(SimpleTestCase):
+
+    def test_ema_matches_pandas_and_hits(self):
+        df = synthetic_ohlc(2000, seed=6)
+        cache = IndicatorCache()
+        fp = dataset_fingerprint(df)
+
+        ema = cache.ema(df["close"], 27, fp)
+        np.testing.assert_array_equal(ema, df["close"].ewm(span=27, adjust=False).mean().to_numpy())
+        self.assertIs(cache.ema(df["close"], 27, fp), ema)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertFalse(ema.flags.writeable)
+
+        # changed candles -> new fingerprint -> recomputed
+        other = df.copy()
+        other.loc[100, "close"] += 1.0
+        self.assertNotEqual(dataset_fingerprint(other), fp)
+
+    def test_lru_eviction(self):
+        cache = IndicatorCache(max_entries=2)
+        close = synthetic_ohlc(500)["close"]
+        for span in (9, 26, 78):
+            cache.ema(close, span)
+        self.assertEqual(len(cache._mem), 2)
+        cache.ema(close, 9)
+        self.assertEqual(cache.misses, 4)
+
+        # byte bound: 500 float64 = 4000 bytes per array
+        cache = IndicatorCache(max_bytes=10_000)
+        for span in (9, 26, 78):
+            cache.ema(close, span)
+        self.assertEqual((len(cache._mem), cache.size_bytes()), (2, 8000))
+
+    def test_disk_tier_round_trip(self):
+        close = synthetic_ohlc(500)["close"]
+        with tempfile.TemporaryDirectory() as tmp:
+            first = IndicatorCache(disk_dir=tmp).ema(close, 78)
+            second = IndicatorCache(disk_dir=tmp)
+            np.testing.assert_array_equal(second.ema(close, 78), first)
+            self.assertEqual((second.disk_hits, second.misses), (1, 0))
+
+    def test_month_end_rules(self):
+        df = synthetic_ohlc(4000, seed=2, tz="Asia/Kolkata")
+        cache = IndicatorCache()
+        ym = df["datetime"].dt.tz_localize(None).dt.to_period("M")
+
+        expected = np.zeros(len(df), dtype=bool)
+        expected[df.groupby(ym).tail(1).index] = True
+        np.testing.assert_array_equal(cache.month_end(df["datetime"], "last_row"), expected)
+
+        expected = (df.groupby(ym)["datetime"].transform("max") == df["datetime"]).to_numpy()
+        np.testing.assert_array_equal(cache.month_end(df["datetime"], "max_time"), expected)
+
+
+class WalkForwardTests(SimpleTestCase):
+
+    def test_month_windows(self):
+        times = pd.Series(pd.date_range("2023-01-01", "2023-06-30 23:00", freq="h"))
+        windows = month_windows(times, in_sample_months=3, out_of_sample_months=1)
+        self.assertEqual(len(windows), 3)
+        for is_a, is_b, oos_a, oos_b in windows:
+            self.assertEqual(is_b, oos_a)
+            self.assertEqual(times[oos_a].day, 1)
+            self.assertEqual(times[oos_b - 1].month, times[oos_a].month)
+        self.assertEqual(windows[-1][3], len(times))
+
+        # overlapping out-of-sample windows would trade the same months twice
+        with self.assertRaises(ValueError):
+            month_windows(times, in_sample_months=2, out_of_sample_months=3, step_months=1)
+        windows = month_windows(times, in_sample_months=2, out_of_sample_months=1, step_months=2)
+        self.assertEqual([times[w[2]].month for w in windows], [3, 5])
+
+    def test_stitched_out_of_sample(self):
+        candles = synthetic_ohlc(8000, seed=12)
+        grid = {"ema_short": [9, 27], "breakout_buffer": [0.0006, 0.0012]}
+        ev, windows, stats = run_walk_forward(candles, grid, in_sample_months=2, out_of_sample_months=1, workers=2)
+        ev_1, windows_1, stats_1 = run_walk_forward(candles, grid, in_sample_months=2, out_of_sample_months=1, workers=1)
+
+        pd.testing.assert_frame_equal(ev, ev_1)
+        pd.testing.assert_frame_equal(windows, windows_1)
+        self.assertEqual(stats, stats_1)
+
+        self.assertGreaterEqual(len(windows), 3)
+        self.assertEqual(sorted(ev["window"].unique()), list(range(len(windows))))
+        self.assertAlmostEqual(stats["ending_cash"], 2500000.0 + sum(stats["exit_pnls"]), places=4)
+        self.assertAlmostEqual(ev["realized_pnl_cum"].iloc[-1], stats["realized_pnl_sum"], places=4)
+        for _, w in windows.iterrows():
+            seg = ev[ev["window"] == w["window"]]
+            self.assertTrue(((seg["time"] >= w["oos_start"]) & (seg["time"] <= w["oos_end"])).all())
+
+            self.assertAlmostEqual(w["oos_pnl"], seg.loc[seg["event"] == "EXIT", "realized_pnl"].sum(), places=4)
+
+
+class MonteCarloTests(SimpleTestCase):
+
+    def test_historical_order_reproduces_backtest(self):
+        # per-lot P&L re-sized by the replayed lot rules gives back the engine's cash path
+        ev, tr, st = backtest(synthetic_ohlc(8000, seed=3))
+        samples = trade_samples(ev)
+        n = len(samples["pnl_per_lot"])
+        self.assertEqual(n, len(tr))
+
+        hist = simulate_paths(samples, np.arange(n)[None, :], resolve_strategy_params(), 2500000.0, ruin_fraction=0)
+        self.assertAlmostEqual(hist["ending_cash"][0], st["ending_cash"], places=4)
+        self.assertAlmostEqual(hist["min_cash"][0], min(st["flat_cash_min"][0], 2500000.0), places=4)
+        self.assertEqual(hist["max_lots"][0], tr["lots"].max())
+
+    def test_block_indices_are_contiguous(self):
+        idx = resample_indices(50, 200, horizon=30, method="block", block_size=5, seed=1)
+        self.assertEqual(idx.shape, (200, 30))
+        steps = np.diff(idx.reshape(200, 6, 5), axis=2) % 50
+        self.assertTrue((steps == 1).all())
+
+    def test_summary(self):
+        ev, _, _ = backtest(synthetic_ohlc(8000, seed=3))
+        paths, summary = run_monte_carlo(ev, n_paths=2000, seed=4, method="block")
+        self.assertEqual(len(paths), 2000)
+        self.assertTrue(0.0 <= summary["ruin_probability"] <= 1.0)
+        self.assertEqual(summary["ruin_probability"], paths["ruined"].mean())
+        self.assertTrue((paths.loc[paths["ruined"], "ending_cash"] <= 1250000.0).all())
+        pct = list(summary["max_drawdown_pct"].values())
+        self.assertEqual(pct, sorted(pct))
+
+        again, _ = run_monte_carlo(ev, n_paths=2000, seed=4, method="block")
+        pd.testing.assert_frame_equal(paths, again)
+
+
+class StreamingBacktestTests(SimpleTestCase):
+
+    def assert_same_as_in_memory(self, source, candles, chunksize):
+        ev_m, tr_m, st_m = backtest(candles)
+        ev_s, tr_s, st_s = stream_backtest(source, chunksize=chunksize)
+        pd.testing.assert_frame_equal(ev_s, ev_m)
+        pd.testing.assert_frame_equal(tr_s, tr_m)
+        self.assertEqual(st_s, st_m)
+
+    def test_chunk_boundaries(self):
+        # chunk edges land inside C3 patterns, open positions and month ends
+        candles = synthetic_ohlc(6000, seed=5, tz="Asia/Kolkata")
+        for chunksize in (997, 1232, 10000):
+            self.assert_same_as_in_memory(candles, candles, chunksize)
+
+    def test_tiny_chunks(self):
+        candles = synthetic_ohlc(600, seed=8)
+        self.assert_same_as_in_memory(candles, candles, 2)
+
+    def test_csv_file(self):
+        candles = synthetic_ohlc(4000, seed=9)
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as fh:
+            candles.to_csv(fh, index=False)
+        try:
+            self.assert_same_as_in_memory(fh.name, pd.read_csv(fh.name), 750)
+        finally:
+            os.unlink(fh.name)
+
+    def test_out_of_order_chunks_rejected(self):
+        candles = synthetic_ohlc(400)
+        with self.assertRaises(ValueError):
+            stream_backtest([candles.iloc[200:], candles.iloc[:200]])
+
+
+class PortfolioTests(SimpleTestCase):
+
+    def test_single_leg_matches_backtest(self):
+        candles = synthetic_ohlc(5000, seed=1)
+        events, legs, stats = run_portfolio({"SILVERMINI": (candles, None)}, workers=1)
+        ev, tr, st = backtest(candles)
+        pd.testing.assert_frame_equal(
+            legs["SILVERMINI"][0], ev.rename(columns={"available_cash": "pool_cash_view"}))
+        self.assertNotIn("ending_cash", legs["SILVERMINI"][2])
+        self.assertEqual(legs["SILVERMINI"][2]["wins"], st["wins"])
+        self.assertEqual(stats["ending_cash"], st["ending_cash"])
+        self.assertEqual(events["portfolio_cash"].tolist(), ev["available_cash"].tolist())
+
+    def test_shared_pool(self):
+        silver = synthetic_ohlc(5000, seed=1)
+        gold = synthetic_ohlc(4000, seed=2)
+        gold["datetime"] = gold["datetime"] + pd.Timedelta(minutes=5)
+        legs_in = {"SILVERMINI": (silver, None), "GOLDMINI": (gold, {"point_value": 10, "breakout_buffer": 0.0006})}
+        events, legs, stats = run_portfolio(legs_in, workers=2)
+
+        self.assertEqual(set(events["leg"]), {"SILVERMINI", "GOLDMINI"})
+        self.assertTrue(events["time"].is_monotonic_increasing)
+        self.assertAlmostEqual(stats["ending_cash"], 2500000.0 + sum(stats["exit_pnls"]), places=4)
+        self.assertAlmostEqual(events["portfolio_cash"].iloc[-1], stats["ending_cash"], places=4)
+        self.assertEqual(stats["wins"] + stats["losses"], sum(len(tr) for _, tr, _ in legs.values()))
+
+        # while one leg holds margin, the other leg is sized on what is left
+        single = backtest(gold, strategy=legs_in["GOLDMINI"][1])[0]
+        self.assertFalse(legs["GOLDMINI"][0]["lots"].equals(single["lots"]))
+
+    def test_mixed_timezones_rejected(self):
+        with self.assertRaises(ValueError):
+            run_portfolio({"A": (synthetic_ohlc(300), None),
+                           "B": (synthetic_ohlc(300, tz="Asia/Kolkata"), None)}, workers=1)
+
+
+class BenchmarkTests(SimpleTestCase):
+
+    def test_synthetic_ohlc_is_seeded(self):
+        a, b = synthetic_ohlc(1000, seed=3), synthetic_ohlc(1000, seed=3)
+        pd.testing.assert_frame_equal(a, b)
+        self.assertFalse(a["close"].equals(synthetic_ohlc(1000, seed=4)["close"]))
+        self.assertTrue((a["high"] >= a[["open", "close"]].max(axis=1)).all())
+        self.assertTrue((a["low"] <= a[["open", "close"]].min(axis=1)).all())
+
+    def test_history_and_regressions(self):
+        seconds, peak_mb = measure(lambda: np.ones(1_000_000), repeat=2)
+        self.assertGreater(seconds, 0)
+        self.assertGreater(peak_mb, 7.0)            # 8 MB array shows up in the traced peak
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "benchmarks", "history.json")
+            first = append_history(path, [{"name": "x", "bars": 10, "seconds": 1.0, "peak_mb": 1.0}])
+            second = append_history(path, [{"name": "x", "bars": 10, "seconds": 1.5, "peak_mb": 1.0},
+                                           {"name": "y", "bars": 10, "skipped": "slow"}])
+            with open(path) as fh:
+                self.assertEqual(len(json.load(fh)), 2)
+        self.assertEqual([r["name"] for r in compare_runs(first, second, threshold=0.2)], ["x"])
+        self.assertEqual(compare_runs(first, second, threshold=0.6), [])
+
+
+class EventLogTests(SimpleTestCase):
+
+    def test_growth_categories_and_tz(self):
+        log = EventLog(TRADE_SCHEMA, capacity=2, tz="Asia/Kolkata")
+        times = pd.date_range("2024-03-01 09:15", periods=5, freq="15min", tz="Asia/Kolkata")
+        for k, ts in enumerate(times):
+            log.append(ts.value, "LONG" if k % 2 else "SHORT", 100.0 + k, k + 1, "STOP", -1.5 * k, 1000.0 - k)
+
+        df = log.to_frame()
+        self.assertEqual(len(df), 5)
+        self.assertEqual(list(df.columns), [name for name, _ in TRADE_SCHEMA])
+        self.assertTrue((df["time"] == times).all())
+        self.assertEqual(df["direction"].tolist(), ["SHORT", "LONG", "SHORT", "LONG", "SHORT"])
+        self.assertEqual(df["direction"].dtype, object)
+        self.assertEqual(log.categories("direction"), ["SHORT", "LONG"])
+        self.assertEqual(log.to_frame(categorical=True)["direction"].tolist(), df["direction"].tolist())
+        self.assertEqual(df["lots"].tolist(), [1, 2, 3, 4, 5])
+
+    def test_frame_is_a_view(self):
+        log = EventLog(TRADE_SCHEMA)
+        log.append(0, "LONG", 1.0, 1, "EOD", 2.0, 3.0)
+        df = log.to_frame(categorical=True)
+        self.assertTrue(np.shares_memory(df["price"].to_numpy(), log._data))
+        self.assertTrue(np.shares_memory(df["reason"].cat.codes.to_numpy(), log._data))
+
+    def test_empty(self):
+        ev, tr, _ = backtest(synthetic_ohlc(2))
+        self.assertEqual(list(ev.columns)[:3], ["time", "event", "direction"])
+        self.assertTrue(ev.empty and tr.empty)
+
+
+class TradeAnalyticsTests(SimpleTestCase):
+
+    def test_segment_extremes(self):
+        rng = np.random.default_rng(0)
+        high, low = rng.random(200), rng.random(200)
+        start = np.array([0, 5, 40, 150, 199])
+        stop = np.array([3, 5, 90, 199, 199])
+        seg_high, seg_low = segment_extremes(high, low, start, stop)
+        for k in range(len(start)):
+            self.assertEqual(seg_high[k], high[start[k]:stop[k] + 1].max())
+            self.assertEqual(seg_low[k], low[start[k]:stop[k] + 1].min())
+
+    def test_matches_per_trade_slices(self):
+        candles = synthetic_ohlc(6000, seed=21, tz="Asia/Kolkata")
+        params = resolve_strategy_params()
+        df = apply_indicators(normalize_candles(candles), params)
+        ev, tr, _ = backtest(candles)
+        pnl = trade_analytics(ev, df["high"].to_numpy(), df["low"].to_numpy(), point_value=params["point_value"])
+
+        self.assertEqual(len(pnl), len(tr))
+        np.testing.assert_allclose(pnl["net_pnl"], tr["realized_pnl"])
+        for k in (0, len(pnl) // 2, len(pnl) - 1):
+            row = pnl.iloc[k]
+            entry = ev[(ev["event"] == "ENTRY") & (ev["time"] == row["entry_time"])].iloc[0]
+            exit_ = ev[(ev["event"] == "EXIT") & (ev["time"] == row["exit_time"])].iloc[0]
+            bars = df.iloc[entry["bar_index"]:exit_["bar_index"] + 1]
+            if row["direction"] == "LONG":
+                mfe = (bars["high"].max() - row["entry_price"]) / row["entry_price"] * 100.0
+            else:
+                mfe = (row["entry_price"] - bars["low"].min()) / row["entry_price"] * 100.0
+            self.assertAlmostEqual(row["mfe_pct"], mfe, places=10)
+            self.assertGreaterEqual(row["mfe_pct"], max(row["pnl_pct_price"], 0.0) - 1e-9)
+            self.assertLessEqual(row["mae_pct"], min(row["pnl_pct_price"], 0.0) + 1e-9)
+
+        detailed = build_detailed_pnl_df(ev, candles=df, point_value=params["point_value"])
+        np.testing.assert_allclose(detailed["brokerage"], pnl["brokerage"].round(2))
+        self.assertTrue((detailed["brokerage"] > 0).all())
+
+
+class MetricsTests(SimpleTestCase):
+
+    def events(self, pnls, start_cash=1000.0):
+        times = pd.date_range("2023-11-01", periods=2 * len(pnls), freq="7D")
+        cash = start_cash + np.cumsum(pnls)
+        rows = []
+        for k, pnl in enumerate(pnls):
+            rows.append({"time": times[2 * k], "event": "ENTRY", "realized_pnl": 0.0,
+                         "available_cash": cash[k] - pnl if k else start_cash})
+            rows.append({"time": times[2 * k + 1], "event": "EXIT", "realized_pnl": pnl, "available_cash": cash[k]})
+        return pd.DataFrame(rows)
+
+    def test_hand_computed_values(self):
+        ev = self.events([100.0, -50.0, -150.0, 200.0, 30.0, -20.0])
+        m = compute_metrics(ev, 1000.0)
+
+        self.assertEqual(m["trades"], 6)
+        self.assertAlmostEqual(m["ending_cash"], 1110.0)
+        self.assertAlmostEqual(m["profit_factor"], 330.0 / 220.0)
+        self.assertAlmostEqual(m["expectancy"], 110.0 / 6)
+        self.assertAlmostEqual(m["max_drawdown"], 200.0)
+        self.assertAlmostEqual(m["max_drawdown_pct"], 200.0 / 1100.0 * 100.0)
+        # peak at the first exit (day 7), back above it at the fourth (day 49)
+        self.assertAlmostEqual(m["max_drawdown_duration_days"], 42.0)
+        self.assertEqual((m["max_win_streak"], m["max_loss_streak"]), (2, 2))
+        self.assertAlmostEqual(m["exposure_pct"], 6 * 7 / 77 * 100.0)
+        self.assertEqual([y["year"] for y in m["yearly"]], [2023, 2024])
+        self.assertAlmostEqual(m["yearly"][0]["end_cash"], 1100.0)
+        self.assertAlmostEqual(m["yearly"][1]["return_pct"], (1110.0 / 1100.0 - 1) * 100.0)
+        self.assertEqual(m["monthly"][0]["month"], "2023-11")
+
+    def test_backtest_metrics_consistent_with_stats(self):
+        candles = synthetic_ohlc(6000, seed=5)
+        ev, tr, stats = backtest(candles)
+        m = compute_metrics(ev, 2500000.0, stats)
+
+        self.assertEqual(m["trades"], len(tr))
+        self.assertAlmostEqual(m["ending_cash"], stats["ending_cash"], places=6)
+        self.assertAlmostEqual(m["win_rate"], stats["wins"] / len(tr) * 100.0)
+        self.assertAlmostEqual(m["yearly"][-1]["end_cash"], stats["ending_cash"], places=6)
+        self.assertGreaterEqual(m["max_drawdown"], 2500000.0 - stats["flat_cash_min"][0])
+        self.assertIsNone(compute_metrics(ev.iloc[:0], 2500000.0)["sharpe"])
+
+    def test_exposure_pairs_portfolio_legs(self):
+        # A: day 0-4, B: day 2-6 (interleaved ENTRY A, ENTRY B, EXIT A, EXIT B); span day 0-10
+        t = pd.Timestamp("2024-01-01")
+        rows = [(0, "A", "ENTRY", 0.0), (2, "B", "ENTRY", 0.0), (4, "A", "EXIT", 10.0), (6, "B", "EXIT", -5.0)]
+        ev = pd.DataFrame([{"time": t + pd.Timedelta(days=d), "leg": leg, "event": kind, "realized_pnl": pnl,
+                            "portfolio_cash": 1000.0} for d, leg, kind, pnl in rows])
+        m = compute_metrics(ev, 1000.0, {"first_ts": t, "last_ts": t + pd.Timedelta(days=10)})
+        self.assertAlmostEqual(m["exposure_pct"], 60.0)   # union of [0, 4] and [2, 6]
+
+
+class IntrabarStopTests(SimpleTestCase):
+
+    def minute_and_bars(self):
+        sub = synthetic_ohlc(60000, seed=9, tz="Asia/Kolkata", freq="1min")
+        bars = (sub.resample("15min", on="datetime")
+                .agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+                .dropna().reset_index())
+        return sub, bars
+
+    def test_alignment_with_gaps(self):
+        bars = pd.date_range("2024-01-01 09:00", periods=4, freq="15min")
+        sub = pd.DataFrame({"datetime": pd.to_datetime(["2024-01-01 09:00", "2024-01-01 09:14", "2024-01-01 09:15",
+                                                        "2024-01-01 09:50", "2024-01-01 10:30"]),
+                            "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0})
+        arr = sub_bar_arrays(bars, sub)
+        self.assertEqual(arr["sub_start"].tolist(), [0, 2, 3, 3])
+        self.assertEqual(arr["sub_stop"].tolist(), [2, 3, 3, 4])
+        with self.assertRaises(ValueError):
+            sub_bar_arrays(bars.tz_localize("Asia/Kolkata"), sub)
+
+    def test_stops_fill_on_first_breaching_sub_bar(self):
+        sub, bars = self.minute_and_bars()
+        ev, tr, _ = backtest(bars, sub_candles=sub)
+        ev_bar, tr_bar, _ = backtest(bars)
+
+        stops = ev[(ev["event"] == "EXIT") & (ev["reason"] == "STOP")]
+        self.assertGreater(len(stops), 20)
+        sub_by_time = sub.set_index("datetime")
+        bar_time = pd.DatetimeIndex(bars["datetime"])
+        for _, row in stops.iterrows():
+            start = bar_time[row["bar_index"]]
+            self.assertTrue(start <= row["time"] < start + pd.Timedelta(minutes=15))
+            fill = sub_by_time.loc[row["time"]]
+            self.assertTrue(fill["low"] - 1e-9 <= row["price"] <= fill["high"] + 1e-9)
+            earlier = sub_by_time.loc[start:row["time"]].iloc[:-1]
+            if row["direction"] == "LONG":
+                self.assertTrue((earlier["low"] > row["price"]).all())
+            else:
+                self.assertTrue((earlier["high"] < row["price"]).all())
+
+        # entries before the first stop are untouched by intrabar mode
+        first_stop = stops.index[0]
+        pd.testing.assert_frame_equal(ev.iloc[:first_stop], ev_bar.iloc[:first_stop])
+        with self.assertRaises(ValueError):
+            backtest(bars, sub_candles=sub, engine="pandas")
+
+
+class CandleResamplerTests(TestCase):
+
+    def minutes(self, n=3000):
+        df = synthetic_ohlc(n, seed=13, tz="Asia/Kolkata", freq="1min")
+        return df.rename(columns={"datetime": "start_time"})[["start_time", "open", "high", "low", "close"]]
+
+    def test_matches_pandas_resample(self):
+        minutes = self.minutes()
+        for interval, rule in (("5m", "5min"), ("15m", "15min"), ("1h", "60min")):
+            ours = resample_ohlc(minutes, {"5m": 5, "15m": 15, "1h": 60}[interval])
+            ref = (minutes.resample(rule, on="start_time")
+                   .agg({"open": "first", "high": "max", "low": "min", "close": "last"}).dropna().reset_index())
+            pd.testing.assert_frame_equal(ours.drop(columns="n_minutes"), ref, check_freq=False, check_index_type=False)
+        self.assertEqual(resample_ohlc(minutes, 15)["start_time"].iloc[0], pd.Timestamp("2023-01-02 09:00", tz="Asia/Kolkata"))
+
+    def test_incremental_updates_only_open_bar(self):
+        from accounts.models import User
+        from live_trading.models import LiveCandle
+
+        user = User.objects.create(username="resampler")
+        minutes = self.minutes(200)
+
+        def store(rows):
+            LiveCandle.objects.bulk_create([
+                LiveCandle(user=user, token="451669", interval="1m", start_time=r.start_time,
+                           end_time=r.start_time + pd.Timedelta(minutes=1),
+                           open=r.open, high=r.high, low=r.low, close=r.close)
+                for r in rows.itertuples(index=False)])
+
+        store(minutes.iloc[:107])
+        update_resampled(user.id, 451669)
+        for k in range(107, 200):
+            store(minutes.iloc[k:k + 1])
+            written = update_resampled(user.id, 451669, ["15m"])
+            # the last stored bar (re-finalised when a new one opens) and the open bar
+            self.assertLessEqual(written["15m"], 2)
+
+        update_resampled(user.id, 451669)
+        for interval, step in (("5m", 5), ("15m", 15), ("30m", 30), ("1h", 60)):
+            stored = load_resampled(user.id, 451669, interval)
+            expected = resample_ohlc(minutes, step)
+            self.assertEqual(len(stored), len(expected))
+            np.testing.assert_allclose(stored[["open", "high", "low", "close"]].to_numpy(),
+                                       expected[["open", "high", "low", "close"]].to_numpy())
+            self.assertTrue((stored["datetime"].to_numpy() == expected["start_time"].to_numpy()).all())
+
+
+class BacktestJobTests(TestCase):
+
+    def setUp(self):
+        from accounts.models import User
+        from backtest_runner.models import Strategy
+        self.user = User.objects.create_user(username="jobs", password="pw")
+        self.strategy = Strategy.objects.create(
+            name="SILVERMINI", exchange="MCX", symbol="451669", point_value=5, ema_short=27, ema_long=78,
+            fixed_sl_pct=0.015, trail_sl_pct=0.025, breakout_buffer=0.0012)
+
+    def test_progress_callback_keeps_results(self):
+        candles = synthetic_ohlc(12000, seed=17)
+        seen = []
+        ev_p, tr_p, st_p = backtest(candles, progress=lambda done, total: seen.append((done, total)))
+        ev, tr, st = backtest(candles)
+
+        pd.testing.assert_frame_equal(ev_p, ev)
+        self.assertEqual(st_p, st)
+        self.assertEqual(seen[-1], (12000, 12000))
+        self.assertEqual(len(seen), 3)
+
+    def test_cancel_and_failure_paths(self):
+        from backtest_runner.models import RunRequest
+        from backtest_runner.tasks import run_backtest_job
+
+        params = {"from_date": "2024-01-01T09:00:00", "to_date": "2024-02-01T23:00:00", "intrabar": False}
+        cancelled = RunRequest.objects.create(user=self.user, strategy=self.strategy, params=params,
+                                              cancel_requested=True)
+        run_backtest_job(cancelled.pk)
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, "cancelled")
+
+        no_key = RunRequest.objects.create(user=self.user, strategy=self.strategy, params=params)
+        run_backtest_job(no_key.pk)
+        no_key.refresh_from_db()
+        self.assertEqual(no_key.status, "failed")
+        self.assertIn("No AngelOne credentials", no_key.error)
+        self.assertIsNotNone(no_key.finished_at)
+
+    def test_status_and_cancel_endpoints(self):
+        from django.urls import reverse
+        from backtest_runner.models import RunRequest
+
+        run = RunRequest.objects.create(user=self.user, strategy=self.strategy, params={})
+        self.client.login(username="jobs", password="pw")
+        status = self.client.get(reverse("dashboard:backtest_status", args=[run.pk])).json()
+        self.assertEqual((status["status"], status["progress"]), ("pending", 0))
+
+        self.client.post(reverse("dashboard:backtest_cancel", args=[run.pk]))
+        run.refresh_from_db()
+        self.assertTrue(run.cancel_requested)
+        self.assertEqual(run.status, "cancelled")
+
+
+class ResultCacheTests(TestCase):
+
+    def test_key_covers_inputs(self):
+        params = resolve_strategy_params()
+        base = result_key(params, "451669", "FIFTEEN_MINUTE", "2024-01-01 09:00", "2024-02-01 23:00", 2500000.0)
+        self.assertEqual(base, result_key(dict(params), "451669", "FIFTEEN_MINUTE", "2024-01-01 09:00",
+                                          "2024-02-01 23:00", 2500000))
+        self.assertNotEqual(base, result_key({**params, "ema_short": 9}, "451669", "FIFTEEN_MINUTE",
+                                             "2024-01-01 09:00", "2024-02-01 23:00", 2500000.0))
+        self.assertNotEqual(base, result_key(params, "451669", "FIFTEEN_MINUTE", "2024-01-01 09:00",
+                                             "2024-02-01 23:00", 2500000.0, intrabar=True))
+
+    def test_lru_eviction_and_invalidation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(tmp)
+            ev, tr, st = backtest(synthetic_ohlc(3000, seed=2))
+            entry = {"events": ev, "trades": tr, "stats": st, "chart_png": b"png"}
+            cache.put(1, "a", entry)
+            got = cache.get(1, "a")
+            pd.testing.assert_frame_equal(got["events"], ev)
+            self.assertEqual(got["stats"], st)
+
+            cache.max_bytes = cache.size_bytes() + 2000
+            os.utime(os.path.join(tmp, "strategy_1", "a.pkl"), (1, 1))   # least recently used
+            cache.put(2, "b", {"chart_png": b"x" * 4000})
+            self.assertIsNone(cache.get(1, "a"))
+            self.assertIsNotNone(cache.get(2, "b"))
+            self.assertLessEqual(cache.size_bytes(), cache.max_bytes)
+
+            cache.invalidate(2)
+            self.assertIsNone(cache.get(2, "b"))
+
+    def test_strategy_change_drops_its_results(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            disk_dir, result_cache.disk_dir = result_cache.disk_dir, tmp
+            try:
+                strategy = Strategy.objects.create(
+                    name="GOLDMINI", exchange="MCX", symbol="1", point_value=10, ema_short=27, ema_long=78,
+                    fixed_sl_pct=0.015, trail_sl_pct=0.025, breakout_buffer=0.0012)
+                result_cache.put(strategy.pk, "k", {"chart_png": b""})
+                self.assertIsNotNone(result_cache.get(strategy.pk, "k"))
+                strategy.ema_short = 9
+                strategy.save()
+                self.assertIsNone(result_cache.get(strategy.pk, "k"))
+            finally:
+                result_cache.disk_dir = disk_dir
+
+    def test_cache_hit_needs_no_broker_and_open_ranges_are_not_cached(self):
+        self.assertTrue(_range_closed("2024-02-01 23:00"))
+        self.assertFalse(_range_closed(pd.Timestamp.now(tz="Asia/Kolkata").strftime("%Y-%m-%d 23:59")))
+
+        user = User.objects.create_user(username="cache", password="pw")
+        strategy = Strategy.objects.create(
+            name="SILVERMINI", exchange="MCX", symbol="451669", point_value=5, ema_short=27, ema_long=78,
+            fixed_sl_pct=0.015, trail_sl_pct=0.025, breakout_buffer=0.0012)
+        # no jwt: any session refresh / broker call would fail the run
+        key_row = AngelOneKey.objects.create(user=user, client_code="X", password="x", totp_secret="x", api_key="x")
+        params = {"from_date": "2024-01-01T09:00:00", "to_date": "2024-02-01T23:00:00", "intrabar": False,
+                  "starting_cash": 1_000_000}
+        run = RunRequest.objects.create(user=user, strategy=strategy, api_key=key_row, params=params)
+
+        ev, tr, st = backtest(synthetic_ohlc(3000, seed=2), strategy=strategy, starting_cash=1_000_000)
+        with tempfile.TemporaryDirectory() as tmp, override_settings(MEDIA_ROOT=tmp):
+            disk_dir, result_cache.disk_dir = result_cache.disk_dir, tmp
+            try:
+                key = result_key(resolve_strategy_params(strategy), "451669", BAR_INTERVAL, "2024-01-01 09:00",
+                                 "2024-02-01 23:00", 1_000_000, intrabar=False)
+                result_cache.put(strategy.pk, key, {"events": ev, "trades": tr, "stats": st, "chart_png": b"png"})
+                results = execute_backtest_run(run)
+            finally:
+                result_cache.disk_dir = disk_dir
+        self.assertTrue(results["from_cache"])
+        self.assertEqual(results["starting_cash"], 1_000_000.0)
+
+
+class CandleStoreTests(TestCase):
+
+    def setUp(self):
+        candles = synthetic_ohlc(2000, seed=8)
+        candles["datetime"] = candles["datetime"].dt.tz_localize("Asia/Kolkata")
+        self.candles = candles
+        self.calls = []
+
+    def fetch(self, first, last):
+        self.calls.append((first, last))
+        t = self.candles["datetime"]
+        rows = self.candles[(t >= pd.Timestamp(first, tz="Asia/Kolkata")) & (t <= pd.Timestamp(last, tz="Asia/Kolkata"))]
+        return (rows.reset_index(drop=True), None) if len(rows) else (None, "No data available.")
+
+    def test_missing_day_runs(self):
+        days = list(pd.date_range("2024-01-01", "2024-01-07").date)
+        covered = {days[2], days[3], days[6]}
+        self.assertEqual(missing_day_runs(days, covered), [(days[0], days[1]), (days[4], days[5])])
+
+    def test_only_gaps_are_fetched(self):
+        df, err = get_candles(self.fetch, "MCX", "451669", "FIFTEEN_MINUTE", "2023-01-09 00:00", "2023-01-20 23:59")
+        self.assertIsNone(err)
+        self.assertEqual(self.calls, [("2023-01-09 00:00", "2023-01-20 23:59")])
+        t = self.candles["datetime"]
+        expected = self.candles[(t >= "2023-01-09") & (t < "2023-01-21")].reset_index(drop=True)
+        np.testing.assert_allclose(df[["open", "high", "low", "close"]], expected[["open", "high", "low", "close"]])
+        self.assertTrue((df["datetime"].to_numpy() == expected["datetime"].to_numpy()).all())
+
+        # wider range: only the new days go to the broker; the weekend inside stays cached
+        self.calls.clear()
+        df2, _ = get_candles(self.fetch, "MCX", "451669", "FIFTEEN_MINUTE", "2023-01-05 00:00", "2023-01-24 23:59")
+        self.assertEqual(self.calls, [("2023-01-05 00:00", "2023-01-08 23:59"), ("2023-01-21 00:00", "2023-01-24 23:59")])
+
+        self.calls.clear()
+        df3, _ = get_candles(self.fetch, "MCX", "451669", "FIFTEEN_MINUTE", "2023-01-05 00:00", "2023-01-24 23:59")
+        self.assertEqual(self.calls, [])
+        pd.testing.assert_frame_equal(df2, df3)
+
+    def test_refetched_bars_overwrite_stored_ones(self):
+        today = pd.Timestamp.now(tz="Asia/Kolkata").normalize().tz_localize(None)
+        bars = pd.DataFrame({"datetime": [today + pd.Timedelta(hours=10)],  # naive: taken as IST
+                             "open": [100.0], "high": [101.0], "low": [99.0], "close": [100.5], "volume": [10]})
+
+        def fetch(first, last):
+            self.calls.append((first, last))
+            return bars.copy(), None
+
+        day = f"{today:%Y-%m-%d}"
+        get_candles(fetch, "MCX", "451669", "ONE_MINUTE", f"{day} 00:00", f"{day} 23:59")
+        bars.loc[0, ["high", "close", "volume"]] = [103.0, 102.5, 25]  # bar still forming
+        df, err = get_candles(fetch, "MCX", "451669", "ONE_MINUTE", f"{day} 00:00", f"{day} 23:59")
+        self.assertIsNone(err)
+        self.assertEqual(len(self.calls), 2)  # today is never marked complete
+        self.assertEqual(df[["high", "close", "volume"]].iloc[0].tolist(), [103.0, 102.5, 25])
+
+
+class HistoricalDownloaderTests(SimpleTestCase):
+
+    class FakeResponse:
+        def __init__(self, status_code, payload):
+            self.status_code, self.payload = status_code, payload
+
+        def json(self):
+            return self.payload
+
+        @property
+        def content(self):
+            import json
+            return json.dumps(self.payload).encode()
+
+    class FakeSession:
+        """getCandleData stand-in: serves rows of a candle frame; first call per window is throttled."""
+
+        def __init__(self, candles):
+            self.candles, self.calls, self.seen = candles, [], set()
+
+        def request(self, method, url, headers=None, json=None, data=None, timeout=None):
+            window = (json["fromdate"], json["todate"])
+            self.calls.append(window)
+            if window not in self.seen:
+                self.seen.add(window)
+                return HistoricalDownloaderTests.FakeResponse(429, {})
+            t = self.candles["datetime"]
+            rows = self.candles[(t >= window[0]) & (t <= window[1] + ":59")]
+            # overlap one candle into the next window to exercise de-duplication
+            rows = self.candles.iloc[rows.index.min():rows.index.max() + 2] if len(rows) else rows
+            data = [[ts.strftime("%Y-%m-%dT%H:%M:%S+05:30"), o, h, l, c, v]
+                    for ts, o, h, l, c, v in rows.itertuples(index=False)]
+            return HistoricalDownloaderTests.FakeResponse(200, {"status": True, "data": data})
+
+    def test_split_windows(self):
+        windows = split_windows("2023-01-01 00:00", "2023-03-15 23:59", "ONE_MINUTE")
+        self.assertEqual(windows[0], ("2023-01-01 00:00", "2023-01-30 23:59"))
+        self.assertEqual(windows[1][0], "2023-01-31 00:00")
+        self.assertEqual(windows[-1][1], "2023-03-15 23:59")
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(len(split_windows("2020-01-01 00:00", "2023-01-01 00:00", "FIFTEEN_MINUTE")), 6)
+
+    def test_token_bucket_spaces_requests(self):
+        now = [0.0]
+        bucket = TokenBucket(2, capacity=2, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+        for _ in range(6):
+            bucket.acquire()
+        self.assertAlmostEqual(now[0], 2.0)
+
+    def test_concurrent_download_merges_windows(self):
+        candles = synthetic_ohlc(30000, seed=6)
+        candles = candles[candles["datetime"] <= "2023-06-30 23:59"]
+        session = self.FakeSession(candles)
+        client = AngelOneClient(session=session, sleep=lambda s: None)
+        df, err = download_candles("jwt", "key", "MCX", "451669", "ONE_MINUTE", "2023-01-02 00:00", "2023-06-30 23:59",
+                                   limiter=TokenBucket(1e6), client=client)
+        self.assertIsNone(err)
+        # one histogram sample per attempt, throttled ones counted as errors
+        stats = client.latency_stats()["candles"]
+        self.assertEqual((stats["count"], stats["errors"]), (len(session.calls), len(session.calls) // 2))
+        self.assertEqual(len(session.calls), 2 * len(split_windows("2023-01-02 00:00", "2023-06-30 23:59", "ONE_MINUTE")))
+        self.assertTrue(df["datetime"].is_monotonic_increasing)
+        self.assertFalse(df["datetime"].duplicated().any())
+        self.assertEqual(len(df), len(candles))
+        np.testing.assert_allclose(df["close"], candles["close"])
+
+    def test_only_access_rate_errors_are_retried(self):
+        class BodyErrorSession:
+            def __init__(self, message):
+                self.message, self.calls = message, 0
+
+            def request(self, method, url, headers=None, json=None, data=None, timeout=None):
+                self.calls += 1
+                return HistoricalDownloaderTests.FakeResponse(200, {"status": False, "message": self.message})
+
+        for message, calls in (("Access denied because of exceeding access rate", 3),
+                               ("Invalid rate of interval; generate a new token", 1)):
+            session = BodyErrorSession(message)
+            df, err = download_candles("jwt", "key", "MCX", "451669", "ONE_DAY", "2023-01-02 00:00",
+                                       "2023-01-10 23:59", limiter=TokenBucket(1e6),
+                                       client=AngelOneClient(session=session, sleep=lambda s: None), retries=2)
+            self.assertIsNone(df)
+            self.assertIn(message, err)
+            self.assertEqual(session.calls, calls)
+
+
+class BrokerClientTests(SimpleTestCase):
+
+    class FakeSession:
+        """Replays `outcomes` (status code or exception) in order, recording each request."""
+
+        def __init__(self, outcomes):
+            self.outcomes, self.calls = list(outcomes), []
+
+        def request(self, method, url, headers=None, json=None, data=None, timeout=None):
+            self.calls.append((method, url, timeout))
+            outcome = self.outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return HistoricalDownloaderTests.FakeResponse(outcome, {"status": True})
+
+    def make_client(self, outcomes, retries=2):
+        return AngelOneClient(retries=retries, session=self.FakeSession(outcomes), sleep=lambda s: None)
+
+    def test_idempotent_call_retried_with_endpoint_timeout(self):
+        import requests
+        client = self.make_client([requests.ReadTimeout("slow"), 503, 200])
+        resp = client.request("rms")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([c[2] for c in client.session.calls], [ENDPOINTS["rms"][2]] * 3)
+        self.assertEqual(client.session.calls[0][0], "GET")
+        stats = client.latency_stats()["rms"]
+        self.assertEqual((stats["count"], stats["errors"]), (3, 2))
+
+    def test_order_not_resent_after_it_may_have_reached_broker(self):
+        import requests
+        client = self.make_client([requests.ReadTimeout("no response")])
+        with self.assertRaises(requests.ReadTimeout):
+            client.request("place_order", data="{}")
+        self.assertEqual(len(client.session.calls), 1)
+
+        # a connect timeout never reached the broker: safe to retry; HTTP 503 is final
+        client = self.make_client([requests.ConnectTimeout("no route"), 503])
+        self.assertEqual(client.request("place_order", data="{}").status_code, 503)
+        self.assertEqual(len(client.session.calls), 2)
+
+    def test_latency_histogram_quantiles(self):
+        h = LatencyHistogram(buckets=(10, 100, 1000))
+        for ms in [1] * 90 + [50] * 9 + [5000]:
+            h.observe(ms)
+        self.assertEqual(h.quantile(0.5), 10)
+        self.assertEqual(h.quantile(0.95), 100)
+        self.assertEqual(h.quantile(1.0), 5000)
+        self.assertEqual(h.stats()["buckets"], {"<=10": 90, "<=100": 9, "<=1000": 0, "inf": 1})
+
+
+class LiveIndicatorsTests(SimpleTestCase):
+
+    def setUp(self):
+        df = synthetic_ohlc(400, seed=8, freq="1min")
+        self.rows = df.rename(columns={"datetime": "start"}).to_dict("records")
+
+    def test_streaming_matches_dataframe_path(self):
+        ind = LiveIndicators().seed(self.rows[:150])
+        for i in range(150, len(self.rows)):
+            ind.update(self.rows[i])
+            df = pd.DataFrame(self.rows[:i + 1]).rename(columns={"start": "timestamp"})
+            full = add_indicators(df)
+            self.assertAlmostEqual(ind.ema_fast.value, full["ema_27"].iloc[-1], places=6)
+            self.assertAlmostEqual(ind.ema_slow.value, full["ema_78"].iloc[-1], places=6)
+            expected = c3_strategy(df)
+            self.assertEqual(c3_signal(ind)["action"], expected["action"])
+            self.assertEqual(c3_signal(ind)["reason"], expected["reason"])
+
+    def test_warm_up_and_bad_candles(self):
+        ind = LiveIndicators()
+        self.assertEqual(c3_signal(ind)["reason"], "Not enough candles")
+        ind.seed(self.rows[:80])
+        self.assertFalse(ind.ready)
+        self.assertFalse(ind.update({**self.rows[80], "close": float("nan")}))
+        self.assertFalse(ind.update(self.rows[10]))  # out of order / already seen
+        ind.update(self.rows[80])
+        self.assertTrue(ind.ready)
+        self.assertEqual(ind.count, 81)
+
+    def test_month_end_in_ist(self):
+        ind = LiveIndicators()
+        ind.update({"start": pd.Timestamp("2024-01-31 18:40", tz="UTC"), "open": 1, "high": 1, "low": 1, "close": 1})
+        self.assertFalse(ind.is_month_end)  # already 1 Feb in IST
+        ind.update({"start": pd.Timestamp("2024-02-29 10:00", tz="Asia/Kolkata"), "open": 1, "high": 1, "low": 1,
+                    "close": 1})
+        self.assertTrue(ind.is_month_end)
+
+
+class CandleRingBufferTests(SimpleTestCase):
+
+    def test_wraps_and_keeps_newest_contiguous(self):
+        df = synthetic_ohlc(25, seed=9, freq="1min")
+        rows = df.rename(columns={"datetime": "start"}).to_dict("records")
+        ring = CandleRingBuffer(10)
+        backing = ring._buf
+        ring.extend(rows)
+
+        self.assertEqual(len(ring), 10)
+        self.assertIs(ring._buf, backing)
+        last = ring.last(4)
+        np.testing.assert_allclose(last["close"], df["close"].iloc[-4:])
+        self.assertTrue(np.shares_memory(last, backing))
+        np.testing.assert_array_equal(ring.times(), df["datetime"].iloc[-10:].to_numpy(dtype="M8[ns]"))
+        self.assertEqual(ring.last_epoch_ns, to_epoch_ns(rows[-1]["start"]))
+        self.assertEqual(len(ring.last(50)), 10)
+
+    def test_candles_round_trip(self):
+        ts = pd.Timestamp("2024-03-01 09:15", tz="Asia/Kolkata")
+        ring = CandleRingBuffer(3)
+        ring.append({"start": ts, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5})
+        (c,) = ring.candles()
+        self.assertEqual(c["start"], ts)
+        self.assertEqual((c["open"], c["high"], c["low"], c["close"]), (1.0, 2.0, 0.5, 1.5))
+        ring.clear()
+        self.assertEqual(len(ring), 0)
+        self.assertIsNone(ring.last_epoch_ns)
+
+
+class BatchedTickWriterTests(TestCase):
+
+    def ticks(self, n):
+        t0 = pd.Timestamp("2024-03-01 09:00", tz="UTC")
+        return [{"token": "451669", "ltp": 100.0 + i, "timestamp": t0 + pd.Timedelta(milliseconds=i)} for i in range(n)]
+
+    def test_size_threshold_and_final_flush_on_stop(self):
+        import queue
+        import threading
+        q, saved = queue.Queue(), []
+        for t in self.ticks(1200):
+            q.put(t)
+        writer = BatchedTickWriter(q, user_id=1, batch_size=500, flush_interval=60,
+                                   save=lambda user_id, batch: saved.append(len(batch)))
+        running = threading.Event()
+        running.set()
+        thread = threading.Thread(target=writer.run, args=(running,), daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while writer.rows < 1000 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(saved, [500, 500])  # 200 left pending: neither threshold reached
+
+        running.clear()
+        writer.stop()
+        thread.join(5)
+        self.assertEqual(saved, [500, 500, 200])
+        metrics = writer.metrics()
+        self.assertEqual((metrics["batches"], metrics["rows"], metrics["max_batch"]), (3, 1200, 500))
+        self.assertEqual(metrics["flush_latency"]["count"], 3)
+
+    def test_time_threshold(self):
+        import queue
+        import threading
+        q, saved = queue.Queue(), []
+        writer = BatchedTickWriter(q, user_id=1, batch_size=500, flush_interval=0.05,
+                                   save=lambda user_id, batch: saved.append(len(batch)))
+        running = threading.Event()
+        running.set()
+        thread = threading.Thread(target=writer.run, args=(running,), daemon=True)
+        thread.start()
+        for t in self.ticks(3):
+            q.put(t)
+        deadline = time.monotonic() + 5
+        while writer.rows < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(saved, [3])  # flushed by age while the loop is still running
+        running.clear()
+        writer.stop()
+        thread.join(5)
+        self.assertEqual(saved, [3])
+
+    def test_save_live_ticks(self):
+        from django.contrib.auth import get_user_model
+        from live_trading.models import LiveTick
+
+        user = get_user_model().objects.create(username="ticks")
+        save_live_ticks(user.pk, self.ticks(3))
+        self.assertEqual(list(LiveTick.objects.filter(user=user).order_by("ltp").values_list("ltp", flat=True)),
+                         [100.0, 101.0, 102.0])
+
+    def test_stop_without_loop_flushes_queue(self):
+        import queue
+        q, saved = queue.Queue(), []
+        for t in self.ticks(7):
+            q.put(t)
+        writer = BatchedTickWriter(q, user_id=1, batch_size=5, save=lambda user_id, batch: saved.append(len(batch)))
+        writer.stop()
+        self.assertEqual(saved, [5, 2])
+
+
+class TickJournalTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def ticks(self, start, n, step="1s"):
+        times = pd.date_range(start, periods=n, freq=step)
+        return [{"token": "451669", "ltp": 100.0 + i, "timestamp": ts.to_pydatetime()} for i, ts in enumerate(times)]
+
+    def test_append_and_memmap_read_across_ist_days(self):
+        journal = TickJournal("451669", root=self.root)
+        # 18:29:58 .. 18:30:02 UTC crosses IST midnight
+        ticks = self.ticks(pd.Timestamp("2024-03-01 18:29:58", tz="UTC"), 5)
+        self.assertEqual(journal.append_ticks(ticks[:3]), 3)
+        self.assertEqual(journal.append_ticks(ticks[2:]), 2)  # overlap with what is already written is skipped
+
+        from datetime import date
+        self.assertEqual(journal_days("451669", self.root), [date(2024, 3, 1), date(2024, 3, 2)])
+        day1 = read_ticks("451669", date(2024, 3, 1), self.root)
+        self.assertIsInstance(day1, np.memmap)
+        np.testing.assert_array_equal(day1["price"], [100.0, 101.0])
+        df = ticks_frame("451669", date(2024, 3, 2), self.root)
+        self.assertEqual(list(df["price"]), [102.0, 103.0, 104.0])
+        self.assertEqual(str(df["datetime"].iloc[0]), "2024-03-02 00:00:00+05:30")
+
+    def test_missing_day_and_torn_record(self):
+        from datetime import date
+        self.assertEqual(len(read_ticks("451669", date(2024, 1, 1), self.root)), 0)
+        journal = TickJournal("451669", root=self.root)
+        journal.append_ticks(self.ticks(pd.Timestamp("2024-03-01 04:00", tz="UTC"), 2))
+        path = os.path.join(self.root, "451669", "2024-03-01.ticks")
+        with open(path, "ab") as fh:
+            fh.write(b"\x00" * 5)
+        self.assertEqual(len(read_ticks("451669", date(2024, 3, 1), self.root)), 2)
+
+    def test_export_to_livetick(self):
+        from datetime import date
+        from django.contrib.auth import get_user_model
+        from live_trading.models import LiveTick
+
+        user = get_user_model().objects.create(username="journal")
+        ticks = self.ticks(pd.Timestamp("2024-03-01 04:00", tz="UTC"), 3)
+        TickJournal("451669", root=self.root).append_ticks(ticks)
+        self.assertEqual(export_to_livetick(user.pk, "451669", date(2024, 3, 1), self.root), 3)
+        rows = list(LiveTick.objects.filter(user=user).order_by("exchange_timestamp"))
+        self.assertEqual([r.ltp for r in rows], [100.0, 101.0, 102.0])
+        self.assertEqual(rows[0].exchange_timestamp, ticks[0]["timestamp"])
+
+
+class MarketDataHubTests(SimpleTestCase):
+
+    class CountingFeed(LocalFeed):
+        started = 0
+
+        def start(self, publish):
+            type(self).started += 1
+            super().start(publish)
+
+    def test_one_feed_per_instrument_fans_out_to_all_engines(self):
+        import queue
+        self.CountingFeed.started = 0
+        hub = MarketDataHub(feed_factory=self.CountingFeed)
+        queues = [queue.Queue() for _ in range(5)]
+        subs = [hub.subscribe(451669, q.put_nowait) for q in queues]
+        other = queue.Queue()
+        hub.subscribe(123, other.put_nowait)
+        self.assertEqual(self.CountingFeed.started, 2)
+
+        feed = hub.feed(451669)
+        for price in (100.0, 100.5, 101.0):
+            feed.push(price)
+        self.assertTrue(all(q.qsize() == 3 for q in queues))
+        self.assertTrue(other.empty())
+        self.assertEqual(queues[0].get()["ltp"], 100.0)
+        self.assertEqual(hub.stats()[451669], {"subscribers": 5, "ticks": 3})
+
+        for sub in subs[:-1]:
+            hub.unsubscribe(sub)
+        self.assertIs(hub.feed(451669), feed)
+        hub.unsubscribe(subs[-1])
+        self.assertIsNone(hub.feed(451669))
+        feed.push(102.0)  # stopped feed publishes nothing
+        self.assertEqual(queues[-1].qsize(), 3)
+
+    def test_failing_subscriber_does_not_block_others(self):
+        import queue
+        hub = MarketDataHub(feed_factory=LocalFeed)
+        good = queue.Queue()
+
+        def broken(tick):
+            raise RuntimeError("boom")
+
+        bad = hub.subscribe(451669, broken)
+        hub.subscribe(451669, good.put_nowait)
+        hub.feed(451669).push(100.0)
+        self.assertEqual(good.qsize(), 1)
+        self.assertEqual(bad.failed, 1)
+
+    def test_engine_callback_only_enqueues(self):
+        import queue
+        from types import SimpleNamespace
+
+        class SlowExit:
+            def check_exit_on_tick(self, ltp):
+                raise AssertionError("exit check ran on the feed thread")
+
+        hub = MarketDataHub(feed_factory=LocalFeed)
+        engines = [SimpleNamespace(position_manager=SlowExit(), tick_queue_db=queue.Queue(),
+                                   tick_queue_candle=queue.Queue()) for _ in range(3)]
+        subs = [hub.subscribe(451669, lambda tick, e=e: on_market_tick(e, tick)) for e in engines]
+        hub.feed(451669).push(100.0)
+        self.assertEqual([s.failed for s in subs], [0, 0, 0])
+        self.assertEqual([e.tick_queue_candle.qsize() for e in engines], [1, 1, 1])
+
+    def test_decode_and_journal_replay(self):
+        tick = decode_tick({"token": "451669", "last_traded_price": 7012350, "exchange_timestamp": 1709265600000})
+        self.assertEqual(tick["ltp"], 70123.5)
+        self.assertEqual(tick["timestamp"], pd.Timestamp("2024-03-01 04:00", tz="UTC"))
+        self.assertIsNone(decode_tick({"subscription_mode": 1}))
+
+        from datetime import date
+        root = tempfile.mkdtemp()
+        try:
+            TickJournal("451669", root=root).append([1709265600 * 10**9 + i for i in range(4)], [1.0, 2.0, 3.0, 4.0])
+            hub, got = MarketDataHub(feed_factory=LocalFeed), []
+            hub.subscribe("451669", got.append)
+            self.assertEqual(hub.feed("451669").replay_journal(date(2024, 3, 1), root), 4)
+            self.assertEqual([t["ltp"] for t in got], [1.0, 2.0, 3.0, 4.0])
+        finally:
+            import shutil
+            shutil.rmtree(root, ignore_errors=True)
+
+
+class EngineRuntimeTests(SimpleTestCase):
+    def test_update_candle_closes_on_minute_change(self):
+        class Engine:
+            current_candle = None
+            last_candle_start = None
+
+        engine, t0 = Engine(), pd.Timestamp("2024-03-01 04:00:05", tz="UTC")
+        self.assertIsNone(update_candle(engine, {"ltp": 100.0, "timestamp": t0}))
+        self.assertIsNone(update_candle(engine, {"ltp": 103.0, "timestamp": t0 + pd.Timedelta(seconds=20)}))
+        self.assertIsNone(update_candle(engine, {"ltp": 99.0, "timestamp": t0 + pd.Timedelta(seconds=40)}))
+        closed = update_candle(engine, {"ltp": 101.0, "timestamp": t0 + pd.Timedelta(seconds=60)})
+        self.assertEqual((closed["open"], closed["high"], closed["low"], closed["close"]), (100.0, 103.0, 99.0, 99.0))
+        self.assertEqual(engine.current_candle["open"], 101.0)
+
+    def test_async_tick_writer_flushes_and_stops(self):
+        import asyncio
+        import threading
+        saved = []
+        rt = AsyncEngineRuntime(blocking_workers=2)
+        try:
+            q = asyncio.Queue()
+            writer = BatchedTickWriter(q, 1, batch_size=10, flush_interval=0.05,
+                                       save=lambda user_id, ticks: saved.extend(ticks))
+            running = threading.Event()
+            running.set()
+            future = rt.submit(writer.arun(running))
+            for i in range(25):
+                rt.loop.call_soon_threadsafe(q.put_nowait, {"ltp": float(i), "timestamp": None})
+            running.clear()
+            writer.stop(timeout=5)
+            future.result(timeout=5)
+        finally:
+            rt.shutdown()
+        self.assertEqual([t["ltp"] for t in saved], [float(i) for i in range(25)])
+
+    def test_benchmark_delivers_every_tick_in_both_runtimes(self):
+        for runtime in ("threads", "asyncio"):
+            with self.subTest(runtime=runtime):
+                result = benchmark_runtime(runtime, engines=3, ticks=120, idle=0.05, timeout=30)
+                self.assertEqual(result["delivered"], 360)
+                self.assertEqual(result["flushed_rows"], 360)
+                self.assertEqual(result["candles_closed"], 3)
+        self.assertEqual(benchmark_runtime("asyncio", engines=3, ticks=1, idle=0.01)["os_threads"], 1)
+
+
+class LiveEngineTests(TestCase):
+
+    def test_engine_stopped_during_login_never_subscribes(self):
+        user = User.objects.create_user(username="live", password="pw")
+        AngelOneKey.objects.create(user=user, client_code="X", password="x", totp_secret="x", api_key="x")
+        engine = UserEngine(user.pk, "451669", runtime="threads")
+        engine.jwt_token, engine.last_login_time = "jwt", time.time()   # session counts as valid
+
+        engine.stop()   # user stops while websocket_thread is still logging in
+        self.assertFalse(websocket_thread(engine, on_tick=lambda tick: None))
+        self.assertIsNone(engine.market_sub)
+        self.assertNotIn(451669, market_data_hub.stats())
@@ -30,6 +30,8 @@ class LiveBacktestForm(forms.Form):
     # interval = forms.ChoiceField(choices=[("ONE_MINUTE","1min"),("FIVE_MINUTES","5min"),("ONE_HOUR","1h")])
     from_date = forms.DateTimeField(widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}))
     to_date = forms.DateTimeField(widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}))
+    intrabar = forms.BooleanField(required=False, label="Intrabar stops (1-minute candles)")
+    starting_cash = forms.FloatField(required=False, min_value=1, label="Starting cash (blank: AngelOne available cash)")
 
 
 # class LiveBacktestForm(forms.Form):
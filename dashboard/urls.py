@@ -10,6 +10,8 @@ urlpatterns = [
     path("reports/", views.reports, name="reports"),
     path("api-integration/", views.api_integration, name="api_integration"),
     path("live-backtest/", views.live_backtest, name="live_backtest"),
+    path("live-backtest/<int:run_id>/status/", views.backtest_status, name="backtest_status"),
+    path("live-backtest/<int:run_id>/cancel/", views.backtest_cancel, name="backtest_cancel"),
     path('start-trading/', views.start_trading, name='start_trading'),
     path('stop-trading/', views.stop_trading, name='stop_trading'),
 
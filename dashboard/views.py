@@ -1,5 +1,4 @@
 # dashboard/views.py
-import base64
 import os, sys, subprocess
 from django.db.models import Sum
 from django.shortcuts import render, redirect, get_object_or_404
@@ -11,12 +10,14 @@ from accounts.models import User  # Adjust if your user model is custom
 from dashboard.forms import AngelOneKeyForm, LiveBacktestForm
 from utils.angel_one import get_daily_pnl, get_monthly_pnl, get_yearly_pnl, angel_login, \
     get_rms_balance, get_angelone_candles, get_real_time_pnl, refresh
-from utils.backtest import backtest, balance_chart_base64
 from django.contrib import messages
 import csv
 from backtest_runner.models import Strategy, AngelOneKey, RunRequest
 from utils.engine_manager import start_live_engine, stop_live_engine
 from django.http import JsonResponse
+from django.urls import reverse
+from backtest_runner.tasks import run_backtest_job
+from portal.celery import app as celery_app
 
 from .models import BacktestResult
 from django.utils import timezone
@@ -183,131 +184,63 @@ def live_backtest(request):
             context["error"] = "Invalid form data."
             return render(request, "dashboard/live_backtest.html", context)
 
-        strategy = form.cleaned_data["strategy"]    # Strategy model instance
-        interval = 'FIFTEEN_MINUTE'
-        from_dt = form.cleaned_data["from_date"]
-        to_dt   = form.cleaned_data["to_date"]
-
-        # AngelOne expects "YYYY-MM-DD HH:MM" (no seconds)
-        def fmt(dt):
-            if hasattr(dt, "tzinfo") and dt.tzinfo is not None:
-                dt = pd.to_datetime(dt).tz_convert(None)
-            return dt.strftime("%Y-%m-%d %H:%M")
-
-        from_date = fmt(from_dt)
-        to_date   = fmt(to_dt)
-
-        # symbol token should be numeric token stored in strategy.symbol (if you store plain symbol update DB)
-        symbol_token = str(strategy.symbol).strip()
-        # if ang_key.updated_at > timezone.now() - timedelta(hours=1):
-        ang_key = refresh(ang_key)
-
-        if not ang_key.jwt_token:
-            context["error"] = "AngelOne session expired. Please reconnect API."
-            return render(request, "dashboard/live_backtest.html", context)
-
-        candles_df, err = get_angelone_candles(
-            jwt_token=ang_key.jwt_token,
-            api_key=ang_key.api_key,
-            exchange=strategy.exchange,
-            symbol_token=symbol_token,
-            interval=interval,
-            fromdate=from_date,
-            todate= to_date
+        # the backtest runs as a Celery job; this request only queues it
+        run = RunRequest.objects.create(
+            user=user,
+            strategy=form.cleaned_data["strategy"],
+            api_key=ang_key,
+            params={
+                "from_date": form.cleaned_data["from_date"].isoformat(),
+                "to_date": form.cleaned_data["to_date"].isoformat(),
+                "intrabar": bool(form.cleaned_data.get("intrabar")),
+                "starting_cash": form.cleaned_data.get("starting_cash"),
+            },
         )
-        if err:
-            context["error"] = f"API Error: {err}"
-            return render(request, "dashboard/live_backtest.html", context)
-
-        if candles_df is None or (isinstance(candles_df, (list,tuple)) and len(candles_df)==0):
-            context["error"] = "No candle data returned for the given range."
-            # still show empty chart
-            context["chart_base64"] = None
-            return render(request, "dashboard/live_backtest.html", context)
-
-        # starting cash from RMS (preferred)
-        starting_cash = getattr(settings, "DEFAULT_STARTING_CASH", 2_500_000)
-        try:
-            rms_data, rms_err = get_rms_balance(ang_key)
-            if rms_data and isinstance(rms_data, dict):
-                available = rms_data.get("availablecash") or rms_data.get("available_cash") or rms_data.get("net")
-                if available is not None:
-                    starting_cash = float(available)
-        except Exception:
-            pass
-
-        # run backtest: engine accepts df, strategy object, starting_cash
         try:
-            events_df, trades_df, stats = backtest(candles_df, strategy=strategy, starting_cash=starting_cash)
-
+            task = run_backtest_job.delay(run.pk)
         except Exception as e:
-            context["error"] = f"Backtest failed: {e}"
-            return render(request, "dashboard/live_backtest.html", context)
+            RunRequest.objects.filter(pk=run.pk).update(
+                status="failed", error=f"Could not queue backtest: {e}", finished_at=timezone.now())
+        else:
+            RunRequest.objects.filter(pk=run.pk).update(task_id=task.id)
+        return redirect(f"{reverse('dashboard:live_backtest')}?run={run.pk}")
+
+    run_id = request.GET.get("run")
+    if run_id:
+        run = get_object_or_404(RunRequest, pk=run_id, user=user)
+        context["run"] = run
+        if run.status == "done" and run.results:
+            context.update(run.results)
+            context["strategy"] = run.strategy
+        elif run.status == "failed":
+            context["error"] = run.error
 
-        # build pnl table from events (if needed you can import an existing util)
-        try:
-            # using simple post-hoc: compute net pnl per exit included in events_df already
-            pnl_df = pd.DataFrame([{
-                "exit_time": r["time"],
-                "net_pnl": r["realized_pnl"]
+    return render(request, "dashboard/live_backtest.html", context)
 
-            } for _, r in events_df[events_df["event"]=="EXIT"].iterrows()]) if not events_df.empty else pd.DataFrame()
-        except Exception:
-            pnl_df = pd.DataFrame()
 
-        # produce base64 chart (works even when no EXIT events, returns "No data" image)
-        chart_b64 = balance_chart_base64(events_df)
+@login_required
+def backtest_status(request, run_id):
+    """Polled by the live backtest page while its job is queued / running."""
+    run = get_object_or_404(RunRequest.objects.only("status", "progress", "stage", "error", "user_id"),
+                            pk=run_id, user=request.user)
+    return JsonResponse({"status": run.status, "progress": run.progress, "stage": run.stage, "error": run.error})
+
 
-        # persist CSVs into media/live_outputs/user_{id}/ (optional)
-        out_dir = os.path.join(settings.MEDIA_ROOT, "live_outputs", f"user_{user.id}")
-        os.makedirs(out_dir, exist_ok=True)
-        events_path = os.path.join(out_dir, "events.csv")
-        trades_path = os.path.join(out_dir, "trades.csv")
-        pnl_path    = os.path.join(out_dir, "pnl.csv")
+@login_required
+def backtest_cancel(request, run_id):
+    if request.method != "POST":
+        return JsonResponse({"status": "error", "message": "Invalid request method."})
+    run = get_object_or_404(RunRequest, pk=run_id, user=request.user)
+    RunRequest.objects.filter(pk=run.pk).update(cancel_requested=True)
+    # not started yet: mark it now (the worker skips it); running jobs stop at their next progress report
+    cancelled = RunRequest.objects.filter(pk=run.pk, status="pending").update(
+        status="cancelled", stage="Cancelled", finished_at=timezone.now())
+    if cancelled and run.task_id:
         try:
-            events_df.to_csv(events_path, index=False)
-            trades_df.to_csv(trades_path, index=False)
-            pnl_df.to_csv(pnl_path, index=False)
-            chart_url = os.path.join(settings.MEDIA_URL, "live_outputs", f"user_{user.id}", "balance.png")
-            # also save chart as file for compatibility (decode base64)
-            chart_file_path = os.path.join(out_dir, "balance.png")
-            # decode and save
-            header, b64 = chart_b64.split(",", 1)
-            with open(chart_file_path, "wb") as fh:
-                fh.write(base64.b64decode(b64))
+            celery_app.control.revoke(run.task_id)
         except Exception:
-            chart_url = None
-
-        events_df = format_numeric(events_df)
-        trades_df = format_numeric(trades_df)
-        pnl_df = format_numeric(pnl_df)
-
-        context.update({
-            "chart": chart_url,
-            "chart_base64": chart_b64,
-            "events": events_df.head(50).to_html(classes="table table-striped table-sm",index=False) if not events_df.empty else "",
-            "trades": trades_df.head(50).to_html(classes="table table-striped table-sm", index=False) if not trades_df.empty else "",
-            "pnl": pnl_df.head(50).to_html(classes="table table-striped table-sm", index=False) if not pnl_df.empty else "",
-            "stats": stats,
-            "starting_cash": starting_cash,
-            "symbol_token": symbol_token,
-            "strategy": strategy,
-            "events_csv": settings.MEDIA_URL + f"live_outputs/user_{user.id}/events.csv",
-            "trades_csv": settings.MEDIA_URL + f"live_outputs/user_{user.id}/trades.csv",
-            "pnl_csv": settings.MEDIA_URL + f"live_outputs/user_{user.id}/pnl.csv",
-        })
-        return render(request, "dashboard/live_backtest.html", context)
-
-    return render(request, "dashboard/live_backtest.html", context)
-
-def format_numeric(df):
-    if df is None or df.empty:
-        return df
-    df = df.copy()
-    for col in df.columns:
-        if pd.api.types.is_numeric_dtype(df[col]):
-            df[col] = df[col].apply(lambda x: f"{x:,.2f}")
-    return df
+            pass
+    return JsonResponse({"status": "success"})
 
 
 @login_required
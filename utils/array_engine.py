@@ -0,0 +1,340 @@
+# utils/array_engine.py
+import numpy as np
+import pandas as pd
+
+from utils.event_log import EventLog, EVENT_SCHEMA, TRADE_SCHEMA
+from utils.signals import c3_breakout_masks
+
+EVENT_COLUMNS = [name for name, _ in EVENT_SCHEMA]
+TRADE_COLUMNS = [name for name, _ in TRADE_SCHEMA]
+
+
+# -------------------------
+# Array extraction
+# -------------------------
+def candle_arrays(df, breakout_buffer, masks=None):
+    """
+    Pull every per-bar input of the C3+EMA loop out of an indicator frame
+    (output of apply_indicators) once, so the loop never touches pandas.
+
+    'day' is the wall-clock calendar day as an integer, used for the daily
+    trade cap (same day boundary as Timestamp.date()).
+    masks: precomputed (long_break, short_break) for breakout_buffer, if any.
+    """
+    times = pd.DatetimeIndex(df["datetime"])
+    wall = times.tz_localize(None) if times.tz is not None else times
+    long_break, short_break = masks if masks is not None else c3_breakout_masks(df, breakout_buffer)
+    return {
+        "times": times,
+        "open": df["open"].to_numpy(),
+        "high": df["high"].to_numpy(),
+        "low": df["low"].to_numpy(),
+        "close": df["close"].to_numpy(),
+        "ema_s": df["ema_s"].to_numpy(),
+        "ema_l": df["ema_l"].to_numpy(),
+        "month_end": df["is_month_end"].to_numpy(dtype=bool),
+        "day": wall.values.astype("datetime64[D]").astype(np.int64),
+        "long_break": long_break,
+        "short_break": short_break,
+    }
+
+
+# -------------------------
+# Engine
+# -------------------------
+class ArrayEngine:
+    """
+    Stateful stop / cooldown / sizing machine of utils.backtest.backtest,
+    run over plain arrays instead of df.iloc lookups.
+
+    Usage:
+        eng = ArrayEngine(strategy_params, starting_cash)
+        eng.load(candle_arrays(df, strategy_params["breakout_buffer"]))
+        eng.run()
+        eng.close_open()
+        events_df, trades_df, stats = eng.results()
+
+    strategy_params must be a fully resolved dict (see DEFAULTS in utils/backtest.py).
+    """
+
+    def __init__(self, strategy_params, starting_cash):
+        p = strategy_params
+        self.point_value     = float(p["point_value"])
+        self.fixed_sl_pct    = float(p["fixed_sl_pct"])
+        self.trail_sl_pct    = float(p["trail_sl_pct"])
+        self.breakout_buffer = float(p["breakout_buffer"])
+        self.cooldown_bars   = int(p["cooldown_bars"])
+        self.initial_lots    = int(p["initial_lots"])
+        self.brokerage_pct   = float(p["brokerage_pct"])
+        self.daily_trade_cap = p["daily_trade_cap"]
+        self.reserve_cash    = float(p["reserve_cash"])
+        self.margin_factor   = float(p["margin_factor"])
+
+        # account / position state
+        self.cash = float(starting_cash)
+        self.pos_side, self.pos_price, self.pos_lots = 0, 0.0, 0
+        self.fixed_stop, self.trail_stop = None, None
+        self.pending_entry_fee = 0.0
+
+        # sizing state
+        self.position_size    = self.initial_lots
+        self.consecutive_loss = 0
+        self.consecutive_win  = 0
+        self.pending_reward   = False
+        self.boost_count      = 0
+        self.boost_next_entry = False
+
+        self.cooldown_left = 0
+        self.trades_today = 0
+        self.current_day = None
+
+        # results (columnar; event / direction / reason stored as category codes)
+        self.events, self.trades = EventLog(EVENT_SCHEMA), EventLog(TRADE_SCHEMA)
+        self.realized_pnl_cum = 0.0
+        self.wins = self.losses = 0
+        self.all_exit_pnls = []
+        self.flat_cash_min = (self.cash, None)
+        self.flat_cash_max = (self.cash, None)
+        self.first_ts = None
+        self.last_ts = None
+
+        self.bar_offset = 0
+        self.n = 0
+        self._sub = None
+
+    def load(self, arrays, bar_offset=0):
+        """
+        Bind a block of bars. bar_offset is the global index of arrays[0],
+        so event bar_index stays absolute when bars are fed in pieces.
+        """
+        self.times = arrays["times"]
+        self._ns = self.times.as_unit("ns").asi8.tolist()
+        self.events.tz = self.trades.tz = self.times.tz
+        # python lists: scalar indexing on them is far cheaper than on ndarrays
+        self._high  = arrays["high"].tolist()
+        self._low   = arrays["low"].tolist()
+        self._close = arrays["close"].tolist()
+        self._ema_s = arrays["ema_s"].tolist()
+        self._ema_l = arrays["ema_l"].tolist()
+        self._month_end = arrays["month_end"].tolist()
+        self._day = arrays["day"].tolist()
+        self._long_break = arrays["long_break"].tolist()
+        self._short_break = arrays["short_break"].tolist()
+        self.bar_offset = bar_offset
+        self.n = len(self._close)
+        # optional finer bars for intrabar stops (see utils/intrabar.py)
+        self._sub = arrays if "sub_low" in arrays else None
+
+        if self.n:
+            if self.first_ts is None:
+                self.first_ts = self.times[0]
+            self.last_ts = self.times[-1]
+
+    # small helpers (same as utils/backtest.py)
+    def _lots_from_cash(self, cash_amount, margin_per_lot):
+        usable = max(0.0, cash_amount - self.reserve_cash)
+        return max(int(usable // margin_per_lot), 1)
+
+    def _dynamic_max_lots(self, cash_amount, margin_per_lot):
+        half_cash = max(0.0, 0.5 * cash_amount)
+        return max(1, int(half_cash // margin_per_lot))
+
+    def _exit(self, idx, reason, price=None, sub_idx=None):
+        """Close at bar idx's close, or at `price` on sub-bar sub_idx (intrabar stop)."""
+        c3 = self._close[idx] if price is None else price
+
+        # require opposite C3 on EMA_REVERSAL (keeps same logic)
+        if reason == "EMA_REVERSAL":
+            opposite_c3 = self._short_break[idx] if self.pos_side == 1 else self._long_break[idx]
+            if not opposite_c3:
+                return
+
+        if self.pos_side == 0:
+            return
+
+        if sub_idx is None:
+            ts, ts_ns = self.times[idx], self._ns[idx]
+        else:
+            ts, ts_ns = self._sub["sub_times"][sub_idx], int(self._sub["sub_ns"][sub_idx])
+        pv = self.point_value
+        gross_pnl = (c3 - self.pos_price) * self.pos_side * self.pos_lots * pv
+        exit_fee = self.brokerage_pct * (c3 * self.pos_lots * pv)
+        pnl = gross_pnl - (self.pending_entry_fee + exit_fee)
+
+        self.cash += pnl
+        self.realized_pnl_cum += pnl
+        cash = self.cash
+        dir_str = "LONG" if self.pos_side == 1 else "SHORT"
+
+        self.events.append(ts_ns,"EXIT",dir_str,c3,self.pos_lots,reason,pnl,self.realized_pnl_cum,cash,0.0,self.bar_offset + idx)
+        self.trades.append(ts_ns,dir_str,c3,self.pos_lots,reason,pnl,cash)
+        self.all_exit_pnls.append(pnl)
+
+        self.pending_entry_fee = 0.0
+
+        if pnl >= 0:
+            self.wins += 1
+            self.consecutive_win += 1
+            self.consecutive_loss = 0
+            if self.pending_reward and self.boost_count > 0:
+                current_margin = max(1.0, self.margin_factor * c3 * pv)
+                self.position_size = min(self._dynamic_max_lots(cash, current_margin), self.position_size * 2)
+                self.boost_count -= 1
+                if self.boost_count == 0:
+                    self.pending_reward = False
+                    self.consecutive_loss = 0
+            if self.consecutive_win == 3:
+                self.boost_next_entry = True
+            else:
+                self.position_size = max(1, self.position_size // 2)
+        else:
+            self.losses += 1
+            self.consecutive_loss += 1
+            self.consecutive_win = 0
+            if self.consecutive_loss == 3:
+                self.pending_reward, self.boost_count = True, 1
+            elif self.consecutive_loss == 5:
+                self.pending_reward, self.boost_count = True, 2
+            self.position_size = max(1, self.position_size * 2)
+
+        if cash < self.flat_cash_min[0]: self.flat_cash_min = (cash, ts)
+        if cash > self.flat_cash_max[0]: self.flat_cash_max = (cash, ts)
+
+        # reset pos
+        self.pos_side, self.pos_price, self.pos_lots = 0, 0.0, 0
+        self.fixed_stop, self.trail_stop = None, None
+        self.cooldown_left = self.cooldown_bars
+
+    def _stop_out(self, idx):
+        """
+        STOP exit on bar idx. Without sub-bars it fills at the bar close; with
+        them, at the first sub-bar inside the bar that breaches the tighter of
+        the fixed / trailing stop, at the stop level (or that sub-bar's open if
+        it gapped through).
+        """
+        sub = self._sub
+        if sub is None:
+            return self._exit(idx, "STOP")
+
+        a, b = sub["sub_start"][idx], sub["sub_stop"][idx]
+        if self.pos_side == 1:
+            level = max(self.fixed_stop, self.trail_stop)
+            hit = np.flatnonzero(sub["sub_low"][a:b] <= level)
+        else:
+            level = min(self.fixed_stop, self.trail_stop)
+            hit = np.flatnonzero(sub["sub_high"][a:b] >= level)
+        if not len(hit):
+            # sub-bars never reached the level the bar did: keep the bar-close fill
+            return self._exit(idx, "STOP")
+
+        j = a + int(hit[0])
+        gap_open = float(sub["sub_open"][j])
+        price = min(level, gap_open) if self.pos_side == 1 else max(level, gap_open)
+        self._exit(idx, "STOP", price=price, sub_idx=j)
+
+    def _enter(self, idx, new_side, reason):
+        c3 = self._close[idx]
+        cash = self.cash
+        pv = self.point_value
+
+        current_margin_per_lot = max(1.0, self.margin_factor * c3 * pv)
+        lots_by_cash = self._lots_from_cash(cash, current_margin_per_lot)
+        dyn_cap      = self._dynamic_max_lots(cash, current_margin_per_lot)
+        desired_cap  = dyn_cap if self.boost_next_entry else self.position_size
+        lots         = max(1, min(lots_by_cash, desired_cap, dyn_cap))
+        margin_in_use = lots * current_margin_per_lot
+
+        self.pending_entry_fee = self.brokerage_pct * (c3 * lots * pv)
+
+        dir_str = "LONG" if new_side == 1 else "SHORT"
+        self.events.append(self._ns[idx],"ENTRY",dir_str,c3,lots,reason,0.0,self.realized_pnl_cum,cash,margin_in_use,self.bar_offset + idx)
+        self.pos_side, self.pos_price, self.pos_lots = new_side, c3, lots
+        self.boost_next_entry = False
+
+        if new_side == 1:
+            self.fixed_stop = c3 * (1 - self.fixed_sl_pct)
+            self.trail_stop = c3 * (1 - self.trail_sl_pct)
+        else:
+            self.fixed_stop = c3 * (1 + self.fixed_sl_pct)
+            self.trail_stop = c3 * (1 + self.trail_sl_pct)
+
+        if self.daily_trade_cap is not None:
+            self.trades_today += 1
+
+    def run(self, start=2, stop=None):
+        """Advance the state machine over loaded bars [start, stop)."""
+        h, l, c = self._high, self._low, self._close
+        ema_s, ema_l = self._ema_s, self._ema_l
+        month_end, day = self._month_end, self._day
+        long_break, short_break = self._long_break, self._short_break
+        cap = self.daily_trade_cap
+        trail_pct = self.trail_sl_pct
+        stop = self.n if stop is None else stop
+
+        for i in range(max(start, 2), stop):
+            # reset daily counter
+            if cap is not None and day[i] != self.current_day:
+                self.current_day = day[i]
+                self.trades_today = 0
+
+            side = self.pos_side
+
+            # month-end flat
+            if month_end[i] and side != 0:
+                self._exit(i, "MONTH_END")
+                continue
+
+            # cooldown
+            if self.cooldown_left > 0:
+                self.cooldown_left -= 1
+                continue
+
+            c3 = c[i]
+
+            # manage open
+            if side == 1:
+                l3 = l[i]
+                if (l3 <= self.fixed_stop) or (l3 <= self.trail_stop):
+                    self._stop_out(i); continue
+                if ema_s[i] < ema_l[i]:
+                    self._exit(i, "EMA_REVERSAL"); continue
+                if c3 > self.pos_price:
+                    new_trail = c3 * (1 - trail_pct)
+                    if new_trail > self.trail_stop: self.trail_stop = new_trail
+                continue
+
+            if side == -1:
+                h3 = h[i]
+                if (h3 >= self.fixed_stop) or (h3 >= self.trail_stop):
+                    self._stop_out(i); continue
+                if ema_s[i] > ema_l[i]:
+                    self._exit(i, "EMA_REVERSAL"); continue
+                if c3 < self.pos_price:
+                    new_trail = c3 * (1 + trail_pct)
+                    if new_trail < self.trail_stop: self.trail_stop = new_trail
+                continue
+
+            # flat: check entry
+            if (cap is not None) and (self.trades_today >= cap):
+                continue
+
+            if long_break[i] and ema_s[i] > ema_l[i]:
+                self._enter(i, +1, "C3_LONG + EMA_OK + BUFFER"); continue
+            if short_break[i] and ema_s[i] < ema_l[i]:
+                self._enter(i, -1, "C3_SHORT + EMA_OK + BUFFER"); continue
+
+    def close_open(self, reason="EOD"):
+        """Force exit on the last loaded bar if a position is still open."""
+        if self.pos_side != 0 and self.n:
+            self._exit(self.n - 1, reason)
+
+    def stats(self):
+        return {
+            "wins": self.wins, "losses": self.losses, "exit_pnls": self.all_exit_pnls,
+            "flat_cash_min": self.flat_cash_min, "flat_cash_max": self.flat_cash_max,
+            "first_ts": self.first_ts, "last_ts": self.last_ts,
+            "ending_cash": self.cash, "realized_pnl_sum": self.realized_pnl_cum
+        }
+
+    def results(self):
+        return self.events.to_frame(), self.trades.to_frame(), self.stats()
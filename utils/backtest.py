@@ -9,6 +9,10 @@ import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
+from utils.array_engine import ArrayEngine, candle_arrays
+from utils.indicator_cache import indicator_cache, dataset_fingerprint
+from utils.trade_analytics import trade_analytics
+
 # Default strategy parameters (used if strategy object lacks a field)
 DEFAULTS = {
     "point_value": 5,
@@ -23,8 +27,12 @@ DEFAULTS = {
     "daily_trade_cap": 10,
     "reserve_cash": 1000.0,
     "bar_minutes": 15,
+    "margin_factor": 0.15,
 }
 
+# bars per slice between progress callbacks in backtest(progress=...)
+PROGRESS_CHUNK_BARS = 5000
+
 # -------------------------
 # Helpers
 # -------------------------
@@ -70,28 +78,25 @@ def normalize_candles(raw):
 def apply_indicators(df, strategy_params):
     s = int(strategy_params.get("ema_short", DEFAULTS["ema_short"]))
     l = int(strategy_params.get("ema_long", DEFAULTS["ema_long"]))
-    df["ema_s"] = df["close"].ewm(span=s, adjust=False).mean()
-    df["ema_l"] = df["close"].ewm(span=l, adjust=False).mean()
 
-    # C3 breakout helper: we will compute prior candles needed by strategy loop
-    # For convenience compute 3-bar rolling extremes (not strictly required)
-    df["c3_high"] = df["high"].rolling(3).max()
-    df["c3_low"]  = df["low"].rolling(3).min()
-
-    # time features used in older script
-    # df["ym"] = df["datetime"].dt.to_period("M")
-    # df["is_month_end"] = df["ym"] = df["datetime"].dt.to_period("M")
-    # df["is_month_end"] = False
-    # df.loc[df.groupby("ym").tail(1).index, "is_month_end"] = True
-    # ["datetime"].dt.is_month_end.fillna(False)
     # ensure datetime is pandas datetime (CRITICAL)
     df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
     df = df.dropna(subset=["datetime"])
 
-    # EXACT match to original script behavior
+    # indicators come from the content-addressed cache: the same candles and
+    # span (repeat dashboard runs, sweeps) are computed once
+    fp = dataset_fingerprint(df)
+    df["ema_s"] = indicator_cache.ema(df["close"], s, fp)
+    df["ema_l"] = indicator_cache.ema(df["close"], l, fp)
+
+    # C3 breakout helper: we will compute prior candles needed by strategy loop
+    # For convenience compute 3-bar rolling extremes (not strictly required)
+    df["c3_high"] = indicator_cache.rolling_max(df["high"], 3, fp)
+    df["c3_low"]  = indicator_cache.rolling_min(df["low"], 3, fp)
+
+    # EXACT match to original script behavior (last candle of each month)
     df["ym"] = df["datetime"].dt.to_period("M")
-    df["is_month_end"] = False
-    df.loc[df.groupby("ym").tail(1).index, "is_month_end"] = True
+    df["is_month_end"] = indicator_cache.month_end(df["datetime"], "last_row", fp)
 
     return df
 
@@ -112,7 +117,30 @@ def make_empty_png_base64(text="No data available"):
 # -------------------------
 # Backtest engine (single unified signature)
 # -------------------------
-def backtest(df, strategy=None, starting_cash:float=2500000.0):
+def resolve_strategy_params(strategy=None):
+    """Fill DEFAULTS from a strategy (supports Django model instance or dict)."""
+    if strategy is None:
+        return DEFAULTS.copy()
+
+    strategy_params = {}
+    for k,v in DEFAULTS.items():
+        val = None
+        if isinstance(strategy, dict):
+            val = strategy.get(k)
+        else:
+            # some model names differ; try common names
+            attr_names = [k, k.replace("_",""), k.upper()]
+            for a in attr_names:
+                if hasattr(strategy, a):
+                    val = getattr(strategy, a)
+                    break
+        if val is None:
+            strategy_params[k] = v
+        else:
+            strategy_params[k] = val
+    return strategy_params
+
+def backtest(df, strategy=None, starting_cash:float=2500000.0, engine:str="array", sub_candles=None, progress=None):
     """
     Run the C3+EMA strategy on given candles.
 
@@ -120,6 +148,14 @@ def backtest(df, strategy=None, starting_cash:float=2500000.0):
       df: pandas.DataFrame or list-like — candle data
       strategy: strategy object or dict with keys used below (point_value, ema_short, ..)
       starting_cash: float — starting available balance
+      engine: "array" (default) runs the NumPy-array core in utils/array_engine.py,
+              "pandas" runs the original per-bar df.iloc loop below (reference)
+      sub_candles: optional finer candles (e.g. 1-minute) covering the same
+              period; STOP exits then fill at the first sub-bar that breaches
+              the stop instead of the bar close (array engine only)
+      progress: optional callable(done_bars, total_bars), called every
+              PROGRESS_CHUNK_BARS bars (array engine only); raising from it
+              aborts the run
 
     Returns:
       events_df, trades_df, stats
@@ -128,28 +164,7 @@ def backtest(df, strategy=None, starting_cash:float=2500000.0):
         raise ValueError("DataFrame is None")
 
     df = normalize_candles(df)
-    strategy_params = {}
-
-    # fill params from strategy (supports Django model instance or dict)
-    if strategy is None:
-        strategy_params = DEFAULTS.copy()
-    else:
-        # allow model objects with attributes
-        for k,v in DEFAULTS.items():
-            val = None
-            if isinstance(strategy, dict):
-                val = strategy.get(k)
-            else:
-                # some model names differ; try common names
-                attr_names = [k, k.replace("_",""), k.upper()]
-                for a in attr_names:
-                    if hasattr(strategy, a):
-                        val = getattr(strategy, a)
-                        break
-            if val is None:
-                strategy_params[k] = v
-            else:
-                strategy_params[k] = val
+    strategy_params = resolve_strategy_params(strategy)
 
     # convenience shorter names
     POINT_VALUE     = float(strategy_params.get("point_value", DEFAULTS["point_value"]))
@@ -164,10 +179,33 @@ def backtest(df, strategy=None, starting_cash:float=2500000.0):
     DAILY_TRADE_CAP = strategy_params.get("daily_trade_cap", DEFAULTS["daily_trade_cap"])
     RESERVE_CASH    = float(strategy_params.get("reserve_cash", DEFAULTS["reserve_cash"]))
     BAR_MINUTES     = int(strategy_params.get("bar_minutes", DEFAULTS["bar_minutes"]))
+    MARGIN_FACTOR   = float(strategy_params.get("margin_factor", DEFAULTS["margin_factor"]))
 
     # indicators
     df = apply_indicators(df, {"ema_short": EMA_SHORT, "ema_long": EMA_LONG})
 
+    if engine == "array":
+        arrays = candle_arrays(df, BREAKOUT_BUFFER)
+        if sub_candles is not None:
+            from utils.intrabar import sub_bar_arrays
+            arrays.update(sub_bar_arrays(arrays["times"], sub_candles, BAR_MINUTES))
+        eng = ArrayEngine(strategy_params, starting_cash)
+        eng.load(arrays)
+        if progress is None:
+            eng.run()
+        else:
+            # same bars, same order: running in slices does not change results
+            for start in range(2, max(eng.n, 2), PROGRESS_CHUNK_BARS):
+                stop = min(start + PROGRESS_CHUNK_BARS, eng.n)
+                eng.run(start, stop)
+                progress(stop, eng.n)
+        eng.close_open()
+        return eng.results()
+    if engine != "pandas":
+        raise ValueError(f"Unknown backtest engine: {engine}")
+    if sub_candles is not None:
+        raise ValueError("Intrabar stops (sub_candles) need engine='array'")
+
     # prepare mutable state
     cash = float(starting_cash)
     pos_side, pos_price, pos_lots = 0, 0.0, 0
@@ -252,7 +290,7 @@ def backtest(df, strategy=None, starting_cash:float=2500000.0):
             consecutive_win += 1
             consecutive_loss = 0
             if pending_reward and boost_count > 0:
-                current_margin = max(1.0, 0.15 * c3 * POINT_VALUE)
+                current_margin = max(1.0, MARGIN_FACTOR * c3 * POINT_VALUE)
                 position_size = min(dynamic_max_lots(cash, current_margin), position_size * 2)
                 boost_count -= 1
                 if boost_count == 0:
@@ -283,7 +321,7 @@ def backtest(df, strategy=None, starting_cash:float=2500000.0):
         nonlocal cash,pos_side,pos_price,pos_lots,fixed_stop,trail_stop,boost_next_entry,position_size
         nonlocal pending_entry_fee, trades_today
 
-        current_margin_per_lot = max(1.0, 0.15 * c3 * POINT_VALUE)
+        current_margin_per_lot = max(1.0, MARGIN_FACTOR * c3 * POINT_VALUE)
         lots_by_cash = lots_from_cash(cash, current_margin_per_lot)
         dyn_cap      = dynamic_max_lots(cash, current_margin_per_lot)
         desired_cap  = dyn_cap if boost_next_entry else position_size
@@ -426,107 +464,17 @@ def balance_chart_base64(events_df, text_on_empty="No data available"):
 
 import pandas as pd
 
-def build_detailed_pnl_df(events_df, bar_minutes=15):
+def build_detailed_pnl_df(events_df, bar_minutes=15, candles=None, point_value=1.0):
     """
     Build detailed PnL dataframe from ENTRY/EXIT events.
+
+    candles: the frame the events were produced from (its high / low give
+             true bar MFE / MAE); without it MFE / MAE use entry / exit prices.
+    Vectorised over all trades in utils/trade_analytics.py.
     """
-    if events_df is None or events_df.empty:
-        return pd.DataFrame(columns=[
-            "entry_time","exit_time","direction","entry_price","exit_price","lots",
-            "reason_entry","reason_exit","holding_bars","holding_minutes",
-            "mfe_pct","mae_pct","gross_pnl","brokerage","net_pnl",
-            "pnl_pct_price","starting_cash_at_entry","available_after_exit"
-        ])
-
-    events_df = events_df.sort_values("time").reset_index(drop=True)
-
-    rows = []
-    open_trade = None
-
-    for _, r in events_df.iterrows():
-
-        # ---------------- ENTRY ----------------
-        if r["event"] == "ENTRY":
-            open_trade = {
-                "entry_time": r["time"],
-                "direction": r["direction"],
-                "entry_price": r["price"],
-                "lots": r["lots"],
-                "reason_entry": r["reason"],
-                "entry_bar": r["bar_index"],
-                "starting_cash_at_entry": r["available_cash"],
-                "max_fav_price": r["price"],
-                "max_adv_price": r["price"],
-                "entry_fee": 0.0  # will infer later
-            }
-
-        # ---------------- EXIT ----------------
-        elif r["event"] == "EXIT" and open_trade is not None:
-
-            exit_price = r["price"]
-            side = 1 if open_trade["direction"] == "LONG" else -1
-
-            # holding
-            holding_bars = r["bar_index"] - open_trade["entry_bar"]
-            holding_minutes = holding_bars * bar_minutes
-
-            # price movement %
-            mfe_pct = (
-                (open_trade["max_fav_price"] - open_trade["entry_price"])
-                / open_trade["entry_price"]
-            ) * 100 * side
-
-            mae_pct = (
-                (open_trade["max_adv_price"] - open_trade["entry_price"])
-                / open_trade["entry_price"]
-            ) * 100 * side
-
-            # gross pnl (before fees)
-            gross_pnl = (
-                (exit_price - open_trade["entry_price"])
-                * side
-                * open_trade["lots"]
-            )
-
-            # brokerage = gross - net
-            net_pnl = r["realized_pnl"]
-            brokerage = gross_pnl - net_pnl
-
-            pnl_pct_price = (
-                (exit_price - open_trade["entry_price"])
-                / open_trade["entry_price"]
-            ) * 100 * side
-
-            rows.append({
-                "entry_time": open_trade["entry_time"],
-                "exit_time": r["time"],
-                "direction": open_trade["direction"],
-                "entry_price": open_trade["entry_price"],
-                "exit_price": exit_price,
-                "lots": open_trade["lots"],
-                "reason_entry": open_trade["reason_entry"],
-                "reason_exit": r["reason"],
-                "holding_bars": holding_bars,
-                "holding_minutes": holding_minutes,
-                "mfe_pct": round(mfe_pct, 2),
-                "mae_pct": round(mae_pct, 2),
-                "gross_pnl": round(gross_pnl, 2),
-                "brokerage": round(brokerage, 2),
-                "net_pnl": round(net_pnl, 2),
-                "pnl_pct_price": round(pnl_pct_price, 2),
-                "starting_cash_at_entry": open_trade["starting_cash_at_entry"],
-                "available_after_exit": r["available_cash"],
-            })
-
-            open_trade = None
-
-        # ---------------- TRACK MFE / MAE ----------------
-        if open_trade is not None:
-            if open_trade["direction"] == "LONG":
-                open_trade["max_fav_price"] = max(open_trade["max_fav_price"], r["price"])
-                open_trade["max_adv_price"] = min(open_trade["max_adv_price"], r["price"])
-            else:
-                open_trade["max_fav_price"] = min(open_trade["max_fav_price"], r["price"])
-                open_trade["max_adv_price"] = max(open_trade["max_adv_price"], r["price"])
+    high = low = None
+    if candles is not None:
+        high, low = candles["high"].to_numpy(), candles["low"].to_numpy()
 
-    return pd.DataFrame(rows)
+    df = trade_analytics(events_df, high, low, point_value=point_value, bar_minutes=bar_minutes)
+    return df.round({c: 2 for c in ("mfe_pct", "mae_pct", "gross_pnl", "brokerage", "net_pnl", "pnl_pct_price")})
@@ -0,0 +1,252 @@
+# utils/benchmark.py
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.indicator_cache import indicator_cache
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+# row-by-row legacy loops: above this size they are skipped unless asked for
+SLOW_MAX_BARS = 100_000
+
+
+# -------------------------
+# Synthetic data
+# -------------------------
+def synthetic_ohlc(n_bars=6000, seed=7, tz=None, freq="15min"):
+    """
+    Seeded SILVERM-like candles, 15-minute by default (MCX session
+    09:00-23:00, weekdays). Same seed -> same candles, so timings and test
+    results are comparable between runs.
+    """
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2023-01-02 09:00", periods=n_bars * 3, freq=freq)
+    idx = idx[(idx.dayofweek < 5) & (idx.hour >= 9) & (idx.hour < 23)][:n_bars]
+    if tz:
+        idx = idx.tz_localize(tz)
+
+    close = 70000.0 * np.exp(np.cumsum(rng.normal(0, 0.004, len(idx))))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.002, len(idx))) * close
+    return pd.DataFrame({
+        "datetime": idx,
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": rng.integers(1, 500, len(idx)),
+    })
+
+
+# -------------------------
+# Targets
+# -------------------------
+# Each target takes the candles and returns (fn, reset): fn is the timed call,
+# reset (or None) runs untimed before every call.
+
+def _strategy_defaults():
+    from utils.backtest import DEFAULTS
+    return dict(DEFAULTS)
+
+
+def _bench_backtest(candles):
+    from utils.backtest import backtest
+    return (lambda: backtest(candles)), indicator_cache.clear
+
+
+def _bench_backtest_engine(candles):
+    from types import SimpleNamespace
+    from backtest_runner.backtest_engine import backtest
+    strategy = SimpleNamespace(**_strategy_defaults())
+    df = candles.copy()
+    return (lambda: backtest(df, strategy, 2500000.0)), None
+
+
+def _bench_apply_indicators(candles):
+    from utils.backtest import apply_indicators, normalize_candles
+    df, params = normalize_candles(candles), _strategy_defaults()
+    return (lambda: apply_indicators(df.copy(), params)), indicator_cache.clear
+
+
+def _bench_apply_indicators_cached(candles):
+    from utils.backtest import apply_indicators, normalize_candles
+    df, params = normalize_candles(candles), _strategy_defaults()
+    apply_indicators(df.copy(), params)
+    return (lambda: apply_indicators(df.copy(), params)), None
+
+
+def _bench_add_indicators(candles):
+    from utils.indicator_preprocessor import add_indicators
+    df = candles.rename(columns={"datetime": "timestamp"})
+    return (lambda: add_indicators(df)), indicator_cache.clear
+
+
+def _bench_live_indicators(candles):
+    from utils.live_indicators import LiveIndicators
+    rows = candles.rename(columns={"datetime": "start"}).to_dict("records")
+    return (lambda: LiveIndicators().seed(rows)), None
+
+
+def _events(candles):
+    from utils.backtest import backtest
+    return backtest(candles)[0]
+
+
+def _bench_build_detailed_pnl_df(candles):
+    from utils.backtest import build_detailed_pnl_df, normalize_candles
+    df, events_df = normalize_candles(candles), _events(candles)
+    return (lambda: build_detailed_pnl_df(events_df, candles=df)), None
+
+
+def _bench_build_pnl_from_events(candles):
+    from utils.backtest import apply_indicators, normalize_candles
+    from backtest_runner.Bro_gaurd_SILVERMINI import build_pnl_from_events
+    df = apply_indicators(normalize_candles(candles), _strategy_defaults())
+    events_df = _events(candles)
+    return (lambda: build_pnl_from_events(df, events_df)), None
+
+
+def _bench_balance_chart(candles):
+    from utils.backtest import balance_chart_base64
+    events_df = _events(candles)
+    return (lambda: balance_chart_base64(events_df)), None
+
+
+# name -> (factory, slow)
+BENCHMARKS = {
+    "utils.backtest.backtest": (_bench_backtest, False),
+    "backtest_engine.backtest": (_bench_backtest_engine, True),
+    "apply_indicators": (_bench_apply_indicators, False),
+    "apply_indicators[cached]": (_bench_apply_indicators_cached, False),
+    "add_indicators": (_bench_add_indicators, False),
+    "live_indicators": (_bench_live_indicators, False),
+    "build_detailed_pnl_df": (_bench_build_detailed_pnl_df, False),
+    "build_pnl_from_events": (_bench_build_pnl_from_events, False),
+    "balance_chart_base64": (_bench_balance_chart, False),
+}
+
+
+# -------------------------
+# Measurement
+# -------------------------
+def measure(fn, reset=None, repeat=3):
+    """
+    Best-of-`repeat` wall time, then one extra call under tracemalloc for
+    peak traced memory (kept separate so tracing does not inflate timings).
+    Returns (seconds, peak_mb).
+    """
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        if reset: reset()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+
+    if reset: reset()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, names=None, repeat=3, seed=7, include_slow=False, log=None):
+    """
+    Time every selected target at every size. Returns a list of result rows
+    {"name", "bars", "seconds", "peak_mb"} (or {"name", "bars", "skipped"}).
+    The indicator cache's disk tier is switched off while measuring.
+    """
+    names = list(names or BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    rows = []
+    disk_dir, indicator_cache.disk_dir = indicator_cache.disk_dir, None
+    try:
+        for n_bars in sizes:
+            candles = synthetic_ohlc(n_bars, seed=seed)
+            for name in names:
+                factory, slow = BENCHMARKS[name]
+                if slow and not include_slow and n_bars > SLOW_MAX_BARS:
+                    rows.append({"name": name, "bars": n_bars, "skipped": f"slow target (> {SLOW_MAX_BARS} bars)"})
+                    continue
+                fn, reset = factory(candles)
+                seconds, peak_mb = measure(fn, reset, repeat)
+                row = {"name": name, "bars": n_bars, "seconds": round(seconds, 6), "peak_mb": round(peak_mb, 3)}
+                rows.append(row)
+                if log: log(row)
+    finally:
+        indicator_cache.disk_dir = disk_dir
+        indicator_cache.clear()
+    return rows
+
+
+# -------------------------
+# History
+# -------------------------
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def append_history(path, results, label=None):
+    """Append one run (results + environment) to the JSON history file."""
+    history = load_history(path)
+    record = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "label": label,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    history.append(record)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(history, fh, indent=2)
+    os.replace(tmp, path)
+    return record
+
+
+def compare_runs(previous, current, threshold=0.2):
+    """
+    Rows of `current` that are slower than the same (name, bars) in
+    `previous` by more than `threshold` (0.2 = 20%).
+    """
+    before = {(r["name"], r["bars"]): r for r in previous.get("results", []) if "seconds" in r}
+    regressions = []
+    for r in current.get("results", []):
+        old = before.get((r["name"], r["bars"]))
+        if old is None or "seconds" not in r or old["seconds"] <= 0:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        if ratio > 1 + threshold:
+            regressions.append({"name": r["name"], "bars": r["bars"], "before": old["seconds"],
+                                "after": r["seconds"], "ratio": round(ratio, 3)})
+    return regressions
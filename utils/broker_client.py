@@ -0,0 +1,203 @@
+# utils/broker_client.py
+import bisect
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from logzero import logger
+
+BASE_URL = "https://apiconnect.angelone.in"
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# how the broker reports throttling in a 200 body: "Access denied because of exceeding access rate"
+THROTTLE_TEXT = "access rate"
+
+# name -> (method, path, timeout seconds, idempotent)
+# Non-idempotent calls (order placement, login) are only retried when the
+# connection could not be opened, i.e. the request never reached the broker.
+ENDPOINTS = {
+    "login": ("POST", "/rest/auth/angelbroking/user/v1/loginByPassword", 10, False),
+    "candles": ("POST", "/rest/secure/angelbroking/historical/v1/getCandleData", 30, True),
+    "rms": ("GET", "/rest/secure/angelbroking/user/v1/getRMS", 5, True),
+    "positions": ("GET", "/rest/secure/angelbroking/portfolio/v1/getPositions", 5, True),
+    "margin": ("POST", "/rest/secure/angelbroking/margin/v1/batch", 5, True),
+    "place_order": ("POST", "/rest/secure/angelbroking/order/v1/placeOrder", 10, False),
+}
+
+# latency bucket upper bounds in milliseconds (last bucket: everything slower)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def endpoint_url(name):
+    return BASE_URL + ENDPOINTS[name][1]
+
+
+@lru_cache(maxsize=256)
+def broker_headers(api_key, jwt_token=None, bearer=True):
+    """
+    Standard SmartAPI headers, built once per (api_key, jwt_token).
+    The returned dict is shared: pass it to requests, do not mutate it.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "X-UserType": "USER",
+        "X-SourceID": "WEB",
+        "X-ClientLocalIP": "127.0.0.1",
+        "X-ClientPublicIP": "127.0.0.1",
+        "X-MACAddress": "AA-BB-CC-11-22-33",
+        "X-PrivateKey": api_key,
+    }
+    if jwt_token:
+        headers["Authorization"] = f"Bearer {jwt_token}" if bearer else jwt_token
+    return headers
+
+
+def throttled(resp):
+    """True if a 200 response body carries the broker's throttle message (checked without parsing the JSON)."""
+    return resp.status_code == 200 and THROTTLE_TEXT.encode() in resp.content[:512].lower()
+
+
+# -------------------------
+# Latency histograms
+# -------------------------
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (ms) with error count; thread-safe."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, ms, error=False):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+            if error:
+                self.errors += 1
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Upper bound (ms) of the bucket holding the q-quantile; max_ms for the overflow bucket."""
+        n = self.count
+        if not n:
+            return None
+        rank, seen = q * n, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return self.buckets[i] if i < len(self.buckets) else self.max_ms
+        return self.max_ms
+
+    def stats(self):
+        n = self.count
+        return {
+            "count": n,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / n, 2) if n else None,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 2) if n else None,
+            "buckets": dict(zip([f"<={b}" for b in self.buckets] + ["inf"], self.counts)),
+        }
+
+
+# -------------------------
+# Client
+# -------------------------
+class AngelOneClient:
+    """
+    One keep-alive connection pool for every Angel One REST call, with a
+    per-endpoint timeout and retry policy (see ENDPOINTS) and a latency
+    histogram per endpoint. request() returns the final requests.Response,
+    or raises the last requests.RequestException once retries are used up,
+    so callers keep their own status / JSON handling.
+    """
+
+    def __init__(self, pool_size=10, retries=2, backoff=0.25, session=None, clock=time.perf_counter,
+                 sleep=time.sleep):
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session = session
+        self.retries, self.backoff = retries, backoff
+        self._clock, self._sleep = clock, sleep
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, endpoint):
+        with self._lock:
+            if endpoint not in self._histograms:
+                self._histograms[endpoint] = LatencyHistogram()
+            return self._histograms[endpoint]
+
+    def observe(self, endpoint, started, error=False):
+        self.histogram(endpoint).observe((self._clock() - started) * 1000, error)
+
+    def _retryable(self, idempotent, exc=None, resp=None, throttle=False):
+        if exc is not None:
+            if isinstance(exc, (requests.ConnectionError, requests.Timeout)) and idempotent:
+                return True
+            return isinstance(exc, requests.ConnectTimeout)
+        return idempotent and (resp.status_code in RETRYABLE_STATUS or throttle)
+
+    def request(self, endpoint, headers=None, json=None, data=None, timeout=None, retries=None, limiter=None):
+        """
+        One call with the endpoint's retry policy; `limiter` (anything with
+        acquire(), e.g. a TokenBucket) is acquired before every attempt.
+        """
+        method, path, default_timeout, idempotent = ENDPOINTS[endpoint]
+        timeout = default_timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+
+        for attempt in range(retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+            started = self._clock()
+            try:
+                resp = self.session.request(method, BASE_URL + path, headers=headers, json=json, data=data,
+                                            timeout=timeout)
+            except requests.RequestException as e:
+                self.observe(endpoint, started, error=True)
+                if attempt < retries and self._retryable(idempotent, exc=e):
+                    logger.warning("Angel One %s failed (%s), retrying", endpoint, e)
+                    self._sleep(self.backoff * (2 ** attempt) * (1 + 0.25 * random.random()))
+                    continue
+                raise
+            throttle = throttled(resp)
+            self.observe(endpoint, started, error=resp.status_code >= 400 or throttle)
+            if attempt < retries and self._retryable(idempotent, resp=resp, throttle=throttle):
+                logger.warning("Angel One %s %s, retrying", endpoint,
+                               "throttled" if throttle else f"returned HTTP {resp.status_code}")
+                self._sleep(self.backoff * (2 ** attempt) * (1 + 0.25 * random.random()))
+                continue
+            return resp
+
+    def latency_stats(self):
+        """{endpoint: LatencyHistogram.stats()} for every endpoint called so far."""
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {name: h.stats() for name, h in sorted(histograms.items())}
+
+    def close(self):
+        self.session.close()
+
+
+# process-wide client: live engines, web views and workers share one pool
+angelone_client = AngelOneClient(
+    pool_size=int(os.getenv("ANGELONE_POOL_SIZE", "10")),
+    retries=int(os.getenv("ANGELONE_RETRIES", "2")),
+)
@@ -0,0 +1,49 @@
+# utils/candle_builder.py
+from datetime import datetime
+
+import pytz
+
+IST = pytz.timezone("Asia/Kolkata")
+
+
+def to_ist(ts: datetime) -> datetime:
+    """
+    Convert any datetime to IST.
+    Assumes UTC if tzinfo is missing.
+    """
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=pytz.UTC).astimezone(IST)
+    return ts.astimezone(IST)
+
+
+def update_candle(engine, tick, minutes=1):
+    """
+    Fold one tick into engine.current_candle (IST, `minutes` wide); returns
+    the candle this tick closed, if any. Only touches engine.current_candle
+    and engine.last_candle_start.
+    """
+    # ✅ SINGLE SOURCE OF TRUTH — convert here
+    ts_ist = to_ist(tick["timestamp"])
+
+    minute = (ts_ist.minute // minutes) * minutes
+    candle_start = ts_ist.replace(minute=minute, second=0, microsecond=0)
+
+    # 🔹 SAME CANDLE (update OHLC)
+    if engine.current_candle is not None and candle_start == engine.last_candle_start:
+        c = engine.current_candle
+        c["high"] = max(c["high"], tick["ltp"])
+        c["low"] = min(c["low"], tick["ltp"])
+        c["close"] = tick["ltp"]
+        return None
+
+    # 🔹 FIRST CANDLE / CANDLE CLOSED → START NEW CANDLE
+    closed = engine.current_candle
+    engine.current_candle = {
+        "start": candle_start,
+        "open": tick["ltp"],
+        "high": tick["ltp"],
+        "low": tick["ltp"],
+        "close": tick["ltp"],
+    }
+    engine.last_candle_start = candle_start
+    return closed
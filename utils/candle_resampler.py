@@ -0,0 +1,118 @@
+# utils/candle_resampler.py
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+IST = "Asia/Kolkata"
+
+# higher timeframes built from the live engine's 1-minute LiveCandle rows
+TIMEFRAMES = {"5m": 5, "15m": 15, "30m": 30, "1h": 60}
+BASE_INTERVAL = "1m"
+
+_NS_PER_MIN = 60_000_000_000
+
+
+# -------------------------
+# Vectorised resampling
+# -------------------------
+def resample_ohlc(candles, minutes):
+    """
+    Aggregate sorted 1-minute candles (columns start_time, open, high, low,
+    close) into `minutes`-wide bars aligned to the IST wall clock (09:00,
+    09:15, ... for 15m; 09:00, 10:00, ... for 1h).
+
+    Each row's bucket is its IST epoch minute // minutes; bucket boundaries
+    come from one diff, OHLC from first / last / maximum.reduceat /
+    minimum.reduceat. Returns start_time (IST), open, high, low, close and
+    n_minutes (1-minute rows that went into the bar).
+    """
+    cols = ["start_time", "open", "high", "low", "close", "n_minutes"]
+    if candles is None or len(candles) == 0:
+        return pd.DataFrame(columns=cols)
+
+    times = pd.DatetimeIndex(candles["start_time"])
+    times = times.tz_localize(IST) if times.tz is None else times.tz_convert(IST)
+    wall_ns = times.tz_localize(None).as_unit("ns").asi8
+    step = np.int64(minutes) * _NS_PER_MIN
+    bucket = wall_ns // step
+
+    starts = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+    ends = np.append(starts[1:], len(bucket)) - 1
+
+    open_ = candles["open"].to_numpy(dtype=np.float64)
+    close = candles["close"].to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        "start_time": pd.DatetimeIndex(bucket[starts] * step).tz_localize(IST),
+        "open": open_[starts],
+        "high": np.maximum.reduceat(candles["high"].to_numpy(dtype=np.float64), starts),
+        "low": np.minimum.reduceat(candles["low"].to_numpy(dtype=np.float64), starts),
+        "close": close[ends],
+        "n_minutes": np.diff(np.append(starts, len(bucket))),
+    }, columns=cols)
+
+
+# -------------------------
+# Incremental persistence (LiveCandle)
+# -------------------------
+def _base_candles(user_id, token, since=None):
+    from live_trading.models import LiveCandle
+
+    qs = LiveCandle.objects.filter(user_id=user_id, token=str(token), interval=BASE_INTERVAL)
+    if since is not None:
+        qs = qs.filter(start_time__gte=since)
+    rows = list(qs.order_by("start_time").values_list("start_time", "open", "high", "low", "close"))
+    return pd.DataFrame(rows, columns=["start_time", "open", "high", "low", "close"])
+
+
+def update_resampled(user_id, token, intervals=tuple(TIMEFRAMES)):
+    """
+    Bring the stored higher-timeframe LiveCandle rows up to date.
+
+    Per interval only the 1-minute rows from the last stored bar onwards are
+    read (that bar may still have been open when it was written), re-aggregated
+    and upserted, so every new minute touches the open bar only. With nothing
+    stored yet the whole 1-minute history is resampled once (backfill).
+    Returns {interval: rows written}.
+    """
+    from live_trading.models import LiveCandle
+
+    written = {}
+    for interval in intervals:
+        minutes = TIMEFRAMES[interval]
+        last = (LiveCandle.objects.filter(user_id=user_id, token=str(token), interval=interval)
+                .order_by("-start_time").values_list("start_time", flat=True).first())
+        bars = resample_ohlc(_base_candles(user_id, token, since=last), minutes)
+        objs = [
+            LiveCandle(user_id=user_id, token=str(token), interval=interval,
+                       start_time=row.start_time.to_pydatetime(),
+                       end_time=(row.start_time + timedelta(minutes=minutes)).to_pydatetime(),
+                       open=row.open, high=row.high, low=row.low, close=row.close)
+            for row in bars.itertuples(index=False)
+        ]
+        if objs:
+            LiveCandle.objects.bulk_create(
+                objs, update_conflicts=True,
+                unique_fields=["user", "token", "start_time", "interval"],
+                update_fields=["end_time", "open", "high", "low", "close"],
+            )
+        written[interval] = len(objs)
+    return written
+
+
+def load_resampled(user_id, token, interval="15m", start=None, end=None):
+    """
+    Stored bars of one interval as backtest-ready candles
+    (datetime in IST, open, high, low, close).
+    """
+    from live_trading.models import LiveCandle
+
+    qs = LiveCandle.objects.filter(user_id=user_id, token=str(token), interval=interval)
+    if start is not None:
+        qs = qs.filter(start_time__gte=start)
+    if end is not None:
+        qs = qs.filter(start_time__lt=end)
+    rows = list(qs.order_by("start_time").values_list("start_time", "open", "high", "low", "close"))
+    df = pd.DataFrame(rows, columns=["datetime", "open", "high", "low", "close"])
+    df["datetime"] = pd.to_datetime(df["datetime"], utc=True).dt.tz_convert(IST)
+    return df
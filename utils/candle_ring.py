@@ -0,0 +1,84 @@
+# utils/candle_ring.py
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+CANDLE_DTYPE = np.dtype([
+    ("epoch_ns", "i8"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+])
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_epoch_ns(ts):
+    """Aware datetime (naive = UTC) -> int nanoseconds since the epoch."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+class CandleRingBuffer:
+    """
+    Fixed-capacity candle history backed by one structured NumPy array.
+
+    Every candle is written twice (slot i and i + capacity), so the last n
+    candles are always one contiguous slice: last(n) is an O(1),
+    zero-copy view and append() is O(1). Memory is 2 * capacity records,
+    whatever the uptime.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = capacity
+        self._buf = np.zeros(2 * capacity, dtype=CANDLE_DTYPE)
+        self._head = 0      # next slot in [0, capacity)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, candle):
+        """candle: {"start": datetime, "open", "high", "low", "close"}."""
+        self.append_values(to_epoch_ns(candle["start"]), candle["open"], candle["high"], candle["low"],
+                           candle["close"])
+
+    def append_values(self, epoch_ns, o, h, l, c):
+        rec = (epoch_ns, o, h, l, c)
+        self._buf[self._head] = rec
+        self._buf[self._head + self.capacity] = rec
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def extend(self, candles):
+        for c in candles:
+            self.append(c)
+
+    def clear(self):
+        self._head = self._count = 0
+
+    def last(self, n=None):
+        """View of the newest min(n, len) candles, oldest first (do not keep across appends)."""
+        n = self._count if n is None else min(n, self._count)
+        end = self._head + self.capacity
+        return self._buf[end - n:end]
+
+    @property
+    def last_epoch_ns(self):
+        return int(self.last(1)["epoch_ns"][0]) if self._count else None
+
+    def times(self, n=None):
+        """datetime64[ns] (UTC) view of the newest n start times."""
+        return self.last(n)["epoch_ns"].view("M8[ns]")
+
+    def candles(self, n=None):
+        """Newest n candles as {"start", "open", "high", "low", "close"} dicts (copies; warm-up / debugging)."""
+        return [
+            {"start": _EPOCH + timedelta(microseconds=int(r["epoch_ns"]) // 1000),
+             "open": float(r["open"]), "high": float(r["high"]), "low": float(r["low"]), "close": float(r["close"])}
+            for r in self.last(n)
+        ]
@@ -0,0 +1,125 @@
+# utils/candle_store.py
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+IST = "Asia/Kolkata"
+
+# getCandleData's answer for a range without candles (holidays, weekends)
+NO_DATA = "No data available."
+
+CANDLE_COLUMNS = ["datetime", "open", "high", "low", "close", "volume"]
+
+
+def _ist(value):
+    ts = pd.Timestamp(value)
+    return ts.tz_localize(IST) if ts.tzinfo is None else ts.tz_convert(IST)
+
+
+def _ist_index(values):
+    times = pd.DatetimeIndex(values)
+    return times.tz_localize(IST) if times.tz is None else times.tz_convert(IST)
+
+
+def missing_day_runs(days, covered):
+    """Contiguous runs [(first_day, last_day), ...] of `days` not in `covered`."""
+    runs = []
+    for day in days:
+        if day in covered:
+            continue
+        if runs and runs[-1][1] == day - timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def _store(exchange, token, interval, df):
+    from backtest_runner.models import StoredCandle
+
+    if df is None or df.empty:
+        return 0
+    times = _ist_index(df["datetime"])
+    volume = df["volume"].to_numpy() if "volume" in df.columns else np.zeros(len(df))
+    objs = [
+        StoredCandle(exchange=exchange, token=token, interval=interval, start_time=t.to_pydatetime(),
+                     open=o, high=h, low=l, close=c, volume=int(v))
+        for t, o, h, l, c, v in zip(times, df["open"].to_numpy(dtype=float), df["high"].to_numpy(dtype=float),
+                                    df["low"].to_numpy(dtype=float), df["close"].to_numpy(dtype=float), volume)
+    ]
+    # re-fetched rows (today's partial bar, broker corrections) replace what was stored
+    StoredCandle.objects.bulk_create(
+        objs, batch_size=2000, update_conflicts=True,
+        unique_fields=["exchange", "token", "interval", "start_time"],
+        update_fields=["open", "high", "low", "close", "volume"],
+    )
+    return len(objs)
+
+
+def load_stored(exchange, token, interval, start, end):
+    """Stored candles with start <= datetime <= end, in the getCandleData frame layout."""
+    from backtest_runner.models import StoredCandle
+
+    rows = list(StoredCandle.objects
+                .filter(exchange=exchange, token=token, interval=interval,
+                        start_time__gte=_ist(start), start_time__lte=_ist(end))
+                .order_by("start_time")
+                .values_list("start_time", "open", "high", "low", "close", "volume"))
+    df = pd.DataFrame(rows, columns=CANDLE_COLUMNS)
+    df["datetime"] = pd.to_datetime(df["datetime"], utc=True).dt.tz_convert(IST)
+    return df
+
+
+def get_candles(fetch, exchange, symbol_token, interval, fromdate, todate):
+    """
+    Candles for [fromdate, todate] ("YYYY-MM-DD HH:MM", IST), served from
+    StoredCandle; only IST days not yet marked complete in StoredCandleDay
+    are requested, one fetch(fromdate, todate) -> (df, err) call per
+    contiguous run of missing days. Past days are marked complete once
+    fetched (also when empty, e.g. holidays); today stays open and is
+    re-fetched next time, its stored bars overwritten with the new OHLC.
+
+    Returns (df, err) like utils.angel_one.get_angelone_candles.
+    """
+    from backtest_runner.models import StoredCandleDay
+
+    token = str(symbol_token)
+    start, end = _ist(fromdate), _ist(todate)
+    days = [d.date() for d in pd.date_range(start.normalize().tz_localize(None), end.normalize().tz_localize(None))]
+    today = pd.Timestamp.now(tz=IST).date()
+
+    covered = set(StoredCandleDay.objects
+                  .filter(exchange=exchange, token=token, interval=interval, day__gte=days[0], day__lte=days[-1])
+                  .values_list("day", flat=True)) if days else set()
+
+    for first, last in missing_day_runs(days, covered):
+        df, err = fetch(f"{first:%Y-%m-%d} 00:00", f"{last:%Y-%m-%d} 23:59")
+        if err and err != NO_DATA:
+            return None, err
+        _store(exchange, token, interval, df)
+
+        counts = {}
+        if df is not None and not df.empty:
+            counts = pd.Series(_ist_index(df["datetime"]).date).value_counts().to_dict()
+        StoredCandleDay.objects.bulk_create([
+            StoredCandleDay(exchange=exchange, token=token, interval=interval, day=d, candles=counts.get(d, 0))
+            for d in pd.date_range(first, last).date if d < today
+        ], ignore_conflicts=True)
+        logger.info("Candle store: fetched %s %s %s %s..%s", exchange, token, interval, first, last)
+
+    df = load_stored(exchange, token, interval, start, end)
+    if df.empty:
+        return None, NO_DATA
+    return df, None
+
+
+def get_angelone_candles_cached(jwt_token, api_key, exchange, symbol_token, interval, fromdate, todate):
+    """Drop-in for get_angelone_candles: local store first, missing days via the chunked downloader."""
+    from utils.historical_downloader import download_candles
+
+    def fetch(first, last):
+        return download_candles(jwt_token, api_key, exchange, symbol_token, interval, first, last)
+
+    return get_candles(fetch, exchange, symbol_token, interval, fromdate, todate)
@@ -2,6 +2,7 @@ import threading
 
 from logzero import logger
 
+from utils.engine_runtime import ENGINE_RUNTIME
 from utils.live_data_runner import candle_and_strategy_thread, db_writer_thread, UserEngine, websocket_thread
 
 ENGINES = {}   # user_id → engine
@@ -17,6 +18,12 @@ def start_live_engine(user_id, token):
 
     logger.info(f"Starting engine for user {user_id}")
 
+    if ENGINE_RUNTIME == "asyncio":
+        # coroutines on the shared event loop (utils.engine_runtime), no threads per user
+        engine.start()
+        logger.info(f"Engine started for user {user_id} (asyncio)")
+        return
+
     engine.thread_ws = threading.Thread(
         target=websocket_thread,
         args=(engine,),
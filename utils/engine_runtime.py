@@ -0,0 +1,71 @@
+# utils/engine_runtime.py
+import asyncio
+import os
+import threading
+
+from logzero import logger
+
+# how live engines run: "threads" (OS threads per engine) or "asyncio" (coroutines on one shared loop)
+ENGINE_RUNTIME = os.getenv("ENGINE_RUNTIME", "threads")
+
+# worker threads for blocking calls made from the loop (ORM writes, broker REST)
+BLOCKING_WORKERS = int(os.getenv("ENGINE_BLOCKING_WORKERS", "32"))
+
+
+class AsyncEngineRuntime:
+    """
+    One asyncio event loop, on its own thread, hosting any number of
+    engines as coroutines. Blocking work (Django ORM, requests-based
+    broker calls) goes through asyncio.to_thread onto a bounded executor,
+    so the thread count stays fixed however many engines run.
+    """
+
+    def __init__(self, blocking_workers=BLOCKING_WORKERS):
+        self.blocking_workers = blocking_workers
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self.loop is not None:
+                return
+            from concurrent.futures import ThreadPoolExecutor
+
+            self.loop = asyncio.new_event_loop()
+            self.loop.set_default_executor(
+                ThreadPoolExecutor(max_workers=self.blocking_workers, thread_name_prefix="engine-io"))
+            self._thread = threading.Thread(target=self._run, daemon=True, name="engine-loop")
+            self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the runtime loop; returns a concurrent.futures.Future."""
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Engine coroutine failed: %s", future.exception())
+
+    def shutdown(self, timeout=5):
+        with self._lock:
+            loop, thread = self.loop, self._thread
+            self.loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
+
+# process-wide runtime (its loop starts with the first engine)
+engine_runtime = AsyncEngineRuntime()
@@ -0,0 +1,79 @@
+# utils/event_log.py
+import numpy as np
+import pandas as pd
+
+# kind per column: "time" (int64 ns), "category" (int8 codes) or a numpy dtype
+EVENT_SCHEMA = [
+    ("time", "time"), ("event", "category"), ("direction", "category"), ("price", "f8"),
+    ("lots", "i8"), ("reason", "category"), ("realized_pnl", "f8"), ("realized_pnl_cum", "f8"),
+    ("available_cash", "f8"), ("margin_in_use", "f8"), ("bar_index", "i8"),
+]
+TRADE_SCHEMA = [
+    ("time", "time"), ("direction", "category"), ("price", "f8"), ("lots", "i8"),
+    ("reason", "category"), ("realized_pnl", "f8"), ("available_after", "f8"),
+]
+
+
+class EventLog:
+    """
+    Preallocated, growable columnar recorder (one NumPy structured array).
+
+    Rows are appended positionally in schema order. Time is given as int64
+    nanoseconds (UTC for tz-aware data; set .tz to restore it), string
+    columns of kind "category" are stored as int8 codes. to_frame() builds
+    the DataFrame on views of the buffer: numeric columns are not copied;
+    string columns are object (the backtest() events_df contract), or
+    Categorical.from_codes over the stored codes with categorical=True for
+    internal consumers (sweep / walk-forward scoring).
+    """
+
+    def __init__(self, schema, capacity=256, tz=None):
+        self.schema = list(schema)
+        self.columns = [name for name, _ in self.schema]
+        self.tz = tz
+        self.n = 0
+        dtype = [(name, "i8" if kind == "time" else "i1" if kind == "category" else kind)
+                 for name, kind in self.schema]
+        self._data = np.empty(max(1, capacity), dtype=dtype)
+        # position -> {value: code}; dict order is code order
+        self._codes = {i: {} for i, (_, kind) in enumerate(self.schema) if kind == "category"}
+
+    def __len__(self):
+        return self.n
+
+    def _grow(self):
+        data = np.empty(len(self._data) * 2, dtype=self._data.dtype)
+        data[:self.n] = self._data[:self.n]
+        self._data = data
+
+    def append(self, *row):
+        if self.n == len(self._data):
+            self._grow()
+        row = list(row)
+        for i, codes in self._codes.items():
+            code = codes.get(row[i])
+            if code is None:
+                if len(codes) >= 127:
+                    raise ValueError(f"Too many categories in column {self.columns[i]}")
+                code = codes[row[i]] = len(codes)
+            row[i] = code
+        self._data[self.n] = tuple(row)
+        self.n += 1
+
+    def categories(self, name):
+        return list(self._codes[self.columns.index(name)])
+
+    def to_frame(self, categorical=False):
+        data = self._data[:self.n]
+        cols = {}
+        for i, (name, kind) in enumerate(self.schema):
+            if kind == "time":
+                times = pd.DatetimeIndex(data[name].view("M8[ns]"))
+                cols[name] = times.tz_localize("UTC").tz_convert(self.tz) if self.tz is not None else times
+            elif kind == "category" and categorical:
+                cols[name] = pd.Categorical.from_codes(data[name], categories=list(self._codes[i]))
+            elif kind == "category":
+                cols[name] = np.array(list(self._codes[i]), dtype=object)[data[name]]
+            else:
+                cols[name] = data[name]
+        return pd.DataFrame(cols, columns=self.columns, copy=False)
@@ -0,0 +1,139 @@
+# utils/historical_downloader.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from logzero import logger
+
+from utils.angel_one import candle_headers, candles_frame
+from utils.broker_client import angelone_client
+
+# longest range (days) getCandleData accepts per request, by interval
+MAX_DAYS_PER_REQUEST = {
+    "ONE_MINUTE": 30,
+    "THREE_MINUTE": 60,
+    "FIVE_MINUTE": 100,
+    "TEN_MINUTE": 100,
+    "FIFTEEN_MINUTE": 200,
+    "THIRTY_MINUTE": 200,
+    "ONE_HOUR": 400,
+    "ONE_DAY": 2000,
+}
+
+# broker limit for historical requests, per API key
+REQUESTS_PER_SECOND = 3
+
+
+# -------------------------
+# Rate limiting
+# -------------------------
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts of up to
+    `capacity`. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._clock, self._sleep = clock, sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+# shared by every download in the process, so parallel jobs stay under the broker limit together
+angelone_limiter = TokenBucket(REQUESTS_PER_SECOND)
+
+
+# -------------------------
+# Windows
+# -------------------------
+def split_windows(fromdate, todate, interval):
+    """
+    Split [fromdate, todate] ("YYYY-MM-DD HH:MM") into consecutive,
+    non-overlapping windows no longer than MAX_DAYS_PER_REQUEST[interval].
+    """
+    if interval not in MAX_DAYS_PER_REQUEST:
+        raise ValueError(f"Unknown interval: {interval}")
+    start, end = pd.Timestamp(fromdate), pd.Timestamp(todate)
+    span = pd.Timedelta(days=MAX_DAYS_PER_REQUEST[interval])
+    minute = pd.Timedelta(minutes=1)
+
+    windows = []
+    while start <= end:
+        stop = min(start + span - minute, end)
+        windows.append((f"{start:%Y-%m-%d %H:%M}", f"{stop:%Y-%m-%d %H:%M}"))
+        start = stop + minute
+    return windows
+
+
+# -------------------------
+# Download
+# -------------------------
+def _fetch_window(client, limiter, headers, payload, retries):
+    """
+    Rows of one window. Retries (throttling, server and network errors,
+    with backoff) are the client's; `limiter` is acquired before each attempt.
+    """
+    try:
+        resp = client.request("candles", headers=headers, json=payload, retries=retries, limiter=limiter)
+        if resp.status_code >= 400:
+            return None, f"HTTP {resp.status_code}"
+        data = resp.json()
+    except (requests.RequestException, ValueError) as e:
+        return None, str(e)
+    if data.get("status"):
+        return data.get("data") or [], None
+    return None, data.get("message", "API failed.")
+
+
+def download_candles(jwt_token, api_key, exchange, symbol_token, interval, fromdate, todate,
+                     max_workers=4, limiter=None, client=None, retries=4):
+    """
+    Historical candles for any range length: broker-legal windows fetched
+    concurrently through `client` (default: the shared angelone_client and
+    its retry policy, with `retries` attempts per window), throttled by
+    `limiter` (default: the process-wide angelone_limiter), merged,
+    de-duplicated and sorted.
+
+    Returns (df, err) like utils.angel_one.get_angelone_candles.
+    """
+    windows = split_windows(fromdate, todate, interval)
+    limiter = limiter or angelone_limiter
+    headers = candle_headers(jwt_token, api_key)
+    client = client or angelone_client
+
+    def fetch(window):
+        payload = {"exchange": exchange, "symboltoken": symbol_token, "interval": interval,
+                   "fromdate": window[0], "todate": window[1]}
+        return _fetch_window(client, limiter, headers, payload, retries)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+        results = list(pool.map(fetch, windows))
+
+    rows = []
+    for window, (window_rows, err) in zip(windows, results):
+        if err is not None:
+            logger.warning("Candle download failed for %s..%s: %s", window[0], window[1], err)
+            return None, f"{err} ({window[0]} .. {window[1]})"
+        rows.extend(window_rows)
+
+    if not rows:
+        return None, "No data available."
+    df = candles_frame(rows)
+    return df.drop_duplicates("datetime", keep="last").reset_index(drop=True), None
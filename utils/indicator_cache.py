@@ -0,0 +1,187 @@
+# utils/indicator_cache.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+
+# -------------------------
+# Fingerprints
+# -------------------------
+def fingerprint(*arrays):
+    """Content hash of one or more arrays (dtype + shape + bytes)."""
+    h = hashlib.blake2b(digest_size=16)
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(f"{a.dtype.str}{a.shape}".encode())
+        h.update(a.view(np.uint8) if a.dtype != object else repr(a.tolist()).encode())
+    return h.hexdigest()
+
+
+def _time_ns(times):
+    times = pd.DatetimeIndex(times)
+    tz = str(times.tz) if times.tz is not None else ""
+    return times.asi8, tz
+
+
+def dataset_fingerprint(df, time_col="datetime"):
+    """Fingerprint of a candle frame: timestamps (+ tz) and OHLC prices."""
+    ns, tz = _time_ns(df[time_col])
+    prices = [df[c].to_numpy(dtype=np.float64) for c in ("open", "high", "low", "close") if c in df.columns]
+    return fingerprint(ns, *prices) + (f"-{tz}" if tz else "")
+
+
+# -------------------------
+# Indicator kernels
+# -------------------------
+def _ema(values, span):
+    return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def _month_end(times, rule):
+    """
+    rule="last_row": last row of each calendar month (groupby(...).tail(1))
+    rule="max_time": rows whose timestamp is the latest of their month
+    Months are taken on wall-clock time in the series' own timezone.
+    """
+    times = pd.DatetimeIndex(times)
+    wall = times.tz_localize(None) if times.tz is not None else times
+    ym = wall.year.to_numpy() * 12 + wall.month.to_numpy()
+    flags = np.zeros(len(ym), dtype=bool)
+    if not len(ym):
+        return flags
+
+    if rule == "last_row":
+        _, last_rev = np.unique(ym[::-1], return_index=True)
+        flags[len(ym) - 1 - last_rev] = True
+    elif rule == "max_time":
+        ns = wall.asi8
+        month_max = pd.Series(ns).groupby(ym).transform("max").to_numpy()
+        flags = ns == month_max
+    else:
+        raise ValueError(f"Unknown month-end rule: {rule}")
+    return flags
+
+
+# -------------------------
+# Cache
+# -------------------------
+class IndicatorCache:
+    """
+    Content-addressed indicator cache.
+
+    Key = (dataset fingerprint, indicator spec), e.g. (fp, ("ema", "close", 78)).
+    In-memory tier is an LRU of at most max_entries arrays and max_bytes of
+    array data (an EMA over 1M bars is 8 MB; every sweep worker process has
+    its own tier); if disk_dir is set, arrays are also written there as .npy
+    and read back on a memory miss (shared across processes and runs).
+    Returned arrays are read-only.
+    """
+
+    def __init__(self, max_entries=128, disk_dir=None, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._mem = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = 0
+
+    def _disk_path(self, fp, spec):
+        name = "_".join(str(s) for s in spec).replace(os.sep, "-")
+        return os.path.join(self.disk_dir, fp, f"{name}.npy")
+
+    def _remember(self, key, arr):
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._mem[key] = arr
+            self._bytes += arr.nbytes
+            # the newest array stays even if it alone exceeds max_bytes
+            while len(self._mem) > 1 and (len(self._mem) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._mem.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def get_or_compute(self, fp, spec, compute):
+        key = (fp, spec)
+        with self._lock:
+            arr = self._mem.get(key)
+            if arr is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return arr
+
+        if self.disk_dir:
+            path = self._disk_path(fp, spec)
+            if os.path.exists(path):
+                try:
+                    arr = np.load(path)
+                    arr.flags.writeable = False
+                    self.disk_hits += 1
+                    self._remember(key, arr)
+                    return arr
+                except (OSError, ValueError) as e:
+                    logger.warning("Indicator cache file unreadable (%s): %s", path, e)
+
+        self.misses += 1
+        arr = np.asarray(compute())
+        arr.flags.writeable = False
+        self._remember(key, arr)
+
+        if self.disk_dir:
+            path = self._disk_path(fp, spec)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as fh:
+                    np.save(fh, arr)
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.warning("Indicator cache write failed (%s): %s", path, e)
+        return arr
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._bytes = 0
+
+    def size_bytes(self):
+        """Bytes of array data held in memory."""
+        return self._bytes
+
+    # ---- indicator helpers (fp defaults to the input array's own fingerprint) ----
+    def ema(self, values, span, fp=None, column="close"):
+        values = np.asarray(values, dtype=np.float64)
+        fp = fp or fingerprint(values)
+        return self.get_or_compute(fp, ("ema", column, int(span)), lambda: _ema(values, int(span)))
+
+    def rolling_max(self, values, window, fp=None, column="high"):
+        values = np.asarray(values, dtype=np.float64)
+        fp = fp or fingerprint(values)
+        return self.get_or_compute(fp, ("rolling_max", column, int(window)),
+                                   lambda: pd.Series(values).rolling(int(window)).max().to_numpy())
+
+    def rolling_min(self, values, window, fp=None, column="low"):
+        values = np.asarray(values, dtype=np.float64)
+        fp = fp or fingerprint(values)
+        return self.get_or_compute(fp, ("rolling_min", column, int(window)),
+                                   lambda: pd.Series(values).rolling(int(window)).min().to_numpy())
+
+    def month_end(self, times, rule="last_row", fp=None):
+        if fp is None:
+            ns, tz = _time_ns(times)
+            fp = fingerprint(ns) + (f"-{tz}" if tz else "")
+        return self.get_or_compute(fp, ("month_end", rule), lambda: _month_end(times, rule))
+
+
+# process-wide cache; INDICATOR_CACHE_DIR enables the on-disk tier
+indicator_cache = IndicatorCache(
+    max_entries=int(os.getenv("INDICATOR_CACHE_SIZE", "128")),
+    max_bytes=int(os.getenv("INDICATOR_CACHE_MB", "64")) * 1024 * 1024,
+    disk_dir=os.getenv("INDICATOR_CACHE_DIR") or None,
+)
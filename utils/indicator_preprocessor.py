@@ -2,6 +2,7 @@
 import pandas as pd
 
 from live_trading.models import LivePosition
+from utils.indicator_cache import indicator_cache, dataset_fingerprint
 
 EMA_FAST = 27
 EMA_SLOW = 78
@@ -21,21 +22,14 @@ def add_indicators(df: pd.DataFrame) -> pd.DataFrame:
     # Ensure timestamp is datetime
     df["timestamp"] = pd.to_datetime(df["timestamp"])
 
-    # --- EMA Calculations ---
-    df["ema_27"] = df["close"].ewm(span=EMA_FAST, adjust=False).mean()
-    df["ema_78"] = df["close"].ewm(span=EMA_SLOW, adjust=False).mean()
-
-    # --- Month End Detection ---
-    df["year"] = df["timestamp"].dt.year
-    df["month"] = df["timestamp"].dt.month
+    fp = dataset_fingerprint(df, time_col="timestamp")
 
-    df["is_month_end"] = (
-        df.groupby(["year", "month"])["timestamp"]
-        .transform("max") == df["timestamp"]
-    )
+    # --- EMA Calculations ---
+    df["ema_27"] = indicator_cache.ema(df["close"], EMA_FAST, fp)
+    df["ema_78"] = indicator_cache.ema(df["close"], EMA_SLOW, fp)
 
-    # Cleanup helper columns
-    df.drop(columns=["year", "month"], inplace=True)
+    # --- Month End Detection (latest timestamp of each month) ---
+    df["is_month_end"] = indicator_cache.month_end(df["timestamp"], "max_time", fp)
 
     return df
 
@@ -0,0 +1,43 @@
+# utils/intrabar.py
+import numpy as np
+import pandas as pd
+
+from utils.backtest import normalize_candles
+
+# AngelOne interval of the finer candles fetched in intrabar mode
+SUB_BAR_INTERVAL = "ONE_MINUTE"
+
+
+def sub_bar_arrays(bar_times, sub_candles, bar_minutes=15):
+    """
+    Align finer candles (e.g. 1-minute) to the strategy's bars.
+
+    Bar i covers [bar_times[i], min(bar_times[i] + bar_minutes, bar_times[i+1]));
+    its sub-bars are sub_*[sub_start[i]:sub_stop[i]], found with two
+    np.searchsorted calls over the sorted sub-bar timestamps. The result is
+    merged into candle_arrays() output; ArrayEngine then fills STOP exits on
+    the first breaching sub-bar instead of the bar close.
+    """
+    sub = normalize_candles(sub_candles)
+    bar_times = pd.DatetimeIndex(bar_times)
+    sub_times = pd.DatetimeIndex(sub["datetime"])
+    if (bar_times.tz is None) != (sub_times.tz is None):
+        raise ValueError("Bars and sub-bars must both be timezone-aware or both naive")
+    if bar_times.tz is not None:
+        sub_times = sub_times.tz_convert(bar_times.tz)
+
+    bar_ns = bar_times.as_unit("ns").asi8
+    sub_ns = sub_times.as_unit("ns").asi8
+    bar_end = bar_ns + np.int64(bar_minutes) * 60_000_000_000
+    if len(bar_ns) > 1:
+        bar_end[:-1] = np.minimum(bar_end[:-1], bar_ns[1:])
+
+    return {
+        "sub_times": sub_times,
+        "sub_ns": sub_ns,
+        "sub_open": sub["open"].to_numpy(dtype=np.float64),
+        "sub_high": sub["high"].to_numpy(dtype=np.float64),
+        "sub_low": sub["low"].to_numpy(dtype=np.float64),
+        "sub_start": np.searchsorted(sub_ns, bar_ns, side="left"),
+        "sub_stop": np.searchsorted(sub_ns, bar_end, side="left"),
+    }
@@ -1,5 +1,7 @@
 # utils/new_live_data_runner.py
 
+import asyncio
+import os
 import threading
 import time
 import queue
@@ -12,7 +14,6 @@ from django.core.cache import cache
 from logzero import logger
 from django.utils import timezone
 from SmartApi import SmartConnect
-from SmartApi.smartWebSocketV2 import SmartWebSocketV2
 from matplotlib.style.core import available
 
 from backtest_runner.models import AngelOneKey
@@ -20,32 +21,44 @@ from live_trading.models import LiveTick, LiveCandle
 from portal import settings
 from utils.placeorder import buy_order, sell_order
 from utils.angel_one import get_account_balance, login_and_get_tokens, get_margin_required
-from utils.indicator_preprocessor import add_indicators
-from utils.strategies_live import c3_strategy, EMA_LONG
+from utils.live_indicators import LiveIndicators
+from utils.candle_ring import CandleRingBuffer, to_epoch_ns
+from utils.tick_writer import BatchedTickWriter, save_live_ticks
+from utils.tick_journal import journal_for
+from utils.market_data_hub import market_data_hub, EXCHANGE_TYPE_MCX
+from utils.engine_runtime import ENGINE_RUNTIME, engine_runtime
+from utils.strategies_live import c3_signal, EMA_LONG
 from utils.position_manager import PositionManager
 from utils.expiry_utils import is_last_friday_before_expiry, is_one_week_before_expiry
+from utils.candle_resampler import update_resampled
 
 CANDLE_INTERVAL_MINUTES = 1
 
+# instrument every engine subscribes to
+LIVE_TOKEN = 451669
+
+# where raw ticks go: "journal" (utils.tick_journal files) or "db" (LiveTick rows)
+TICK_STORE = os.getenv("TICK_STORE", "journal")
+
 from utils.redis_cache import init_redis, acquire_candle_lock, acquire_trade_lock, release_trade_lock
 
 init_redis()
 
-import pytz
-from datetime import datetime
+from utils.candle_builder import IST, to_ist, update_candle
 
-IST = pytz.timezone("Asia/Kolkata")
+REQUIRED_CANDLES = EMA_LONG + 5
 
-def to_ist(ts: datetime) -> datetime:
-    """
-    Convert any datetime to IST.
-    Assumes UTC if tzinfo is missing.
-    """
-    if ts.tzinfo is None:
-        return ts.replace(tzinfo=pytz.UTC).astimezone(IST)
-    return ts.astimezone(IST)
 
-REQUIRED_CANDLES = EMA_LONG + 5
+def save_to_journal(user_id, ticks):
+    """BatchedTickWriter save(): append to the per-instrument tick journal of each tick's token."""
+    by_token = {}
+    for t in ticks:
+        by_token.setdefault(t["token"], []).append(t)
+    for token, group in by_token.items():
+        journal_for(token).append_ticks(group)
+
+# closed candles kept in memory per engine (one trading day of 1m bars)
+CANDLE_BUFFER_SIZE = max(1440, REQUIRED_CANDLES)
 # ==========================================================
 # USER ENGINE (ONE PER USER)
 # ==========================================================
@@ -55,9 +68,11 @@ from collections import deque
 
 
 class UserEngine:
-    def __init__(self, user_id, token):
+    def __init__(self, user_id, token, runtime=None):
         self.user_id = user_id
         self.token = token
+        # "threads" or "asyncio" (see utils.engine_runtime)
+        self.runtime = runtime or ENGINE_RUNTIME
 
         # Engine state
         self.running = threading.Event()
@@ -65,11 +80,18 @@ class UserEngine:
 
         # FAST IN-MEMORY CACHES
         # self.tick_queue = queue.Queue(maxsize=5000)
-        self.tick_queue_db = queue.Queue(maxsize=5000)
-        self.tick_queue_candle = queue.Queue(maxsize=5000)
+        queue_cls = asyncio.Queue if self.runtime == "asyncio" else queue.Queue
+        self.tick_queue_db = queue_cls(maxsize=5000)
+        self.tick_queue_candle = queue_cls(maxsize=5000)
+        self.market_sub = None
+        self.market_lock = threading.Lock()     # orders subscribe (websocket_thread) against stop()
+        self.tick_writer = BatchedTickWriter(
+            self.tick_queue_db, user_id,
+            save=save_live_ticks if TICK_STORE == "db" else save_to_journal,
+        )
 
-        # Candle data
-        self.candles = deque(maxlen=200)
+        # Candle data (fixed-size, array-backed)
+        self.candles = CandleRingBuffer(CANDLE_BUFFER_SIZE)
         self.current_candle = None
         self.last_candle_start = None
 
@@ -88,10 +110,15 @@ class UserEngine:
         # Position manager
         self.position_manager = PositionManager(user_id, token)
 
-        self.candles = []
+        self.indicators = LiveIndicators()
         self.is_warmed_up = False
 
     def start(self):
+        if self.runtime == "asyncio":
+            # coroutines on the shared runtime loop instead of three threads
+            self.future = engine_runtime.submit(run_engine_async(self))
+            return
+
         threading.Thread(
             target=websocket_thread,
             args=(self,),
@@ -112,6 +139,12 @@ class UserEngine:
 
     def stop(self):
         self.running.clear()
+        with self.market_lock:
+            sub, self.market_sub = self.market_sub, None
+        if sub is not None:
+            market_data_hub.unsubscribe(sub)
+        # write the ticks still queued / pending in the current batch
+        self.tick_writer.stop()
 
     # ==================================================
     # 🔥 ADD THIS METHOD (YOU MISSED THIS)
@@ -147,90 +180,107 @@ class UserEngine:
 # ==========================================================
 # THREAD 1 — WEBSOCKET
 # ==========================================================
-def websocket_thread(engine):
+def websocket_thread(engine, on_tick=None):
+    """
+    Attach the engine to the shared market-data feed of its instrument
+    (one broker socket per instrument, however many engines use it).
+    Returns once subscribed; UserEngine.stop() unsubscribes.
+    """
     if not ensure_valid_session(engine):
         logger.error("AngelOne login failed")
-        return
+        return False
 
-    sws = SmartWebSocketV2(
-        engine.jwt_token,
-        engine.api_key,
-        AngelOneKey.objects.get(user_id=engine.user_id).client_code,
-        engine.feed_token
-    )
+    credentials = {
+        "jwt_token": engine.jwt_token,
+        "api_key": engine.api_key,
+        "client_code": AngelOneKey.objects.get(user_id=engine.user_id).client_code,
+        "feed_token": engine.feed_token,
+    }
+    # stop() may have run during the login above: never subscribe a stopped engine
+    with engine.market_lock:
+        if not engine.running.is_set():
+            logger.info("Engine %s stopped before subscribing", engine.user_id)
+            return False
+        engine.market_sub = market_data_hub.subscribe(
+            LIVE_TOKEN,
+            on_tick or (lambda tick: on_market_tick(engine, tick)),
+            exchange_type=EXCHANGE_TYPE_MCX,
+            credentials=credentials,
+        )
+    logger.info("Engine %s subscribed to market data %s", engine.user_id, LIVE_TOKEN)
+    return True
 
-    correlation_id = "live_feed"
-    mode = 1  # 1 = LTP, 2 = Quote, 3 = SnapQuote
 
-    token_list = [{
-        "exchangeType": 5,  # 5 = NSE (INDEX)
-        "tokens": [451669]
-    }]
+def on_market_tick(engine, tick):
+    """
+    Hub callback, on the feed thread shared by every engine on the
+    instrument: only hands the tick over, never blocks. Tick-level exits
+    run on the engine's candle / strategy consumer.
+    """
+    try:
+        engine.tick_queue_db.put_nowait(tick)
+        engine.tick_queue_candle.put_nowait(tick)
 
-    def on_open(ws):
-        logger.info("WebSocket connected : subscribing")
-        sws.subscribe(correlation_id, mode, token_list)
+    except queue.Full:
+        logger.warning("Tick queue full")
 
-    def on_data(ws, tick):
-        if "last_traded_price" not in tick:
-            return
 
-        ltp = tick["last_traded_price"] / 100
+# ==========================================================
+# ASYNCIO RUNTIME (ENGINE_RUNTIME=asyncio)
+# ==========================================================
+async def run_engine_async(engine):
+    """
+    The engine as coroutines on the runtime loop: tick writer + candle /
+    strategy consumer. Login, ORM writes and broker calls run via
+    asyncio.to_thread, so the loop never blocks on them.
+    """
+    loop = asyncio.get_running_loop()
 
-        # Check for tick-based exits (SL)
-        engine.position_manager.check_exit_on_tick(ltp)
+    def on_tick(tick):
+        # shared feed thread: hand-off only, through the loop
+        loop.call_soon_threadsafe(enqueue_tick_async, engine, tick)
 
-        data = {
-            "token": tick.get("token", 451669),
-            "ltp": ltp,
-            "timestamp": datetime.fromtimestamp(
-                tick["exchange_timestamp"] / 1000, pytz.UTC
-            )
-        }
+    if not await asyncio.to_thread(websocket_thread, engine, on_tick):
+        engine.running.clear()
+        return
 
-        logger.info("Tick received: %s", data["ltp"])
+    await asyncio.gather(
+        engine.tick_writer.arun(engine.running),
+        candle_and_strategy_task(engine),
+    )
 
-        try:
-            engine.tick_queue_db.put_nowait(data)
-            engine.tick_queue_candle.put_nowait(data)
 
-        except queue.Full:
-            logger.warning("Tick queue full")
+def enqueue_tick_async(engine, tick):
+    try:
+        engine.tick_queue_db.put_nowait(tick)
+        engine.tick_queue_candle.put_nowait(tick)
+    except asyncio.QueueFull:
+        logger.warning("Tick queue full")
 
-    def on_error(ws, error):
-        logger.error("WebSocket error: %s", error)
 
-    def on_close(ws):
-        logger.warning("WebSocket closed")
+async def candle_and_strategy_task(engine):
+    """candle_and_strategy_thread as a coroutine."""
+    while engine.running.is_set():
+        try:
+            tick = await asyncio.wait_for(engine.tick_queue_candle.get(), 1)
+        except asyncio.TimeoutError:
+            continue
 
-    sws.on_open = on_open
-    sws.on_data = on_data
-    sws.on_error = on_error
-    sws.on_close = on_close
+        # tick-level exits (SL); closing a position calls the broker
+        if engine.position_manager.has_open_position():
+            await asyncio.to_thread(engine.position_manager.check_exit_on_tick, tick["ltp"])
 
-    sws.connect()
+        closed = update_candle(engine, tick, CANDLE_INTERVAL_MINUTES)
+        if closed is not None:
+            await asyncio.to_thread(close_candle, engine, closed)
 
 
 # ==========================================================
-# THREAD 2 — DB WRITER (ASYNC, NON-BLOCKING)
+# THREAD 2 — DB WRITER (BATCHED, NON-BLOCKING)
 # ==========================================================
 def db_writer_thread(engine):
-    while engine.running.is_set():
-        try:
-            tick = engine.tick_queue_db.get(timeout=1)
-        except queue.Empty:
-            continue
-
-        try:
-            LiveTick.objects.create(
-                user_id=engine.user_id,
-                token=tick["token"],
-                ltp=tick["ltp"],
-                exchange_timestamp=tick["timestamp"]
-            )
-            logger.info("LiveTick saved")
-        except Exception as e:
-            logger.exception("LiveTick DB error: %s", e)
+    engine.tick_writer.run(engine.running)
+    logger.info("Tick writer stopped: %s", engine.tick_writer.metrics())
 
 
 # ==========================================================
@@ -244,126 +294,82 @@ def candle_and_strategy_thread(engine):
     while engine.running.is_set():
         try:
             tick = engine.tick_queue_candle.get(timeout=1)
-            logger.info("Tick received: %s", tick["ltp"])
         except queue.Empty:
             continue
 
-        # ✅ SINGLE SOURCE OF TRUTH — convert here
-        ts_ist = to_ist(tick["timestamp"])
-
-        minute = (ts_ist.minute // CANDLE_INTERVAL_MINUTES) * CANDLE_INTERVAL_MINUTES
-        candle_start = ts_ist.replace(minute=minute, second=0, microsecond=0)
-
-        # 🔹 FIRST CANDLE
-        if engine.current_candle is None:
-            engine.current_candle = {
-                "start": candle_start,
-                "open": tick["ltp"],
-                "high": tick["ltp"],
-                "low": tick["ltp"],
-                "close": tick["ltp"],
-            }
-            engine.last_candle_start = candle_start
-            continue
+        # tick-level exits (SL), off the shared feed thread
+        engine.position_manager.check_exit_on_tick(tick["ltp"])
 
-        # 🔹 SAME CANDLE (update OHLC)
-        if candle_start == engine.last_candle_start:
-            c = engine.current_candle
-            c["high"] = max(c["high"], tick["ltp"])
-            c["low"] = min(c["low"], tick["ltp"])
-            c["close"] = tick["ltp"]
-            continue
+        closed = update_candle(engine, tick, CANDLE_INTERVAL_MINUTES)
+        if closed is not None:
+            close_candle(engine, closed)
 
-        # 🔹 CANDLE CLOSED
-        closed = engine.current_candle
-
-        if not acquire_candle_lock(451669, closed["start"]):
-            logger.warning("Duplicate candle ignored: %s", closed["start"])
-            engine.current_candle = {
-                "start": candle_start,
-                "open": tick["ltp"],
-                "high": tick["ltp"],
-                "low": tick["ltp"],
-                "close": tick["ltp"]
-            }
-            engine.last_candle_start = candle_start
-            continue
 
-        # ✅ SAVE TO DB (IST ONLY)
-        try:
-            LiveCandle.objects.create(
-                user_id=engine.user_id,
-                token=451669,
-                interval=f"{CANDLE_INTERVAL_MINUTES}m",
-                start_time=closed["start"],
-                end_time=closed["start"] + timedelta(minutes=CANDLE_INTERVAL_MINUTES),
-                open=closed["open"],
-                high=closed["high"],
-                low=closed["low"],
-                close=closed["close"],
-            )
-            logger.info("LiveCandle saved @ %s", closed["start"])
-        except Exception as e:
-            logger.exception("LiveCandle DB error: %s", e)
-
-        # ✅ KEEP IN MEMORY (ORDER PRESERVED)
-        engine.candles.append(closed)
-
-        logger.info(
-            "[LIVE CANDLE] %s O:%s H:%s L:%s C:%s",
-            closed["start"],
-            closed["open"],
-            closed["high"],
-            closed["low"],
-            closed["close"],
+def close_candle(engine, closed):
+    """Persist a closed candle, advance the indicators and run the strategy (blocking: DB + broker)."""
+    # per user: every engine on the shared feed closes the same candle
+    if not acquire_candle_lock(LIVE_TOKEN, closed["start"], user_id=engine.user_id):
+        logger.warning("Duplicate candle ignored: %s", closed["start"])
+        return
+
+    # ✅ SAVE TO DB (IST ONLY)
+    try:
+        LiveCandle.objects.create(
+            user_id=engine.user_id,
+            token=451669,
+            interval=f"{CANDLE_INTERVAL_MINUTES}m",
+            start_time=closed["start"],
+            end_time=closed["start"] + timedelta(minutes=CANDLE_INTERVAL_MINUTES),
+            open=closed["open"],
+            high=closed["high"],
+            low=closed["low"],
+            close=closed["close"],
         )
+        logger.info("LiveCandle saved @ %s", closed["start"])
+    except Exception as e:
+        logger.exception("LiveCandle DB error: %s", e)
+
+    # ✅ KEEP IN MEMORY (ORDER PRESERVED)
+    engine.candles.append(closed)
+    engine.indicators.update(closed)
+
+    logger.info(
+        "[LIVE CANDLE] %s O:%s H:%s L:%s C:%s",
+        closed["start"],
+        closed["open"],
+        closed["high"],
+        closed["low"],
+        closed["close"],
+    )
+
+    step_strategy(engine)
+
+    # roll the new minute into the open 5m / 15m / 30m / 1h bars (after the strategy: off the order path)
+    try:
+        update_resampled(engine.user_id, 451669)
+    except Exception as e:
+        logger.exception("Resampled candle update failed: %s", e)
+
+
+def step_strategy(engine):
+    """Warm-up check, then the strategy on the candle just closed."""
+    # 🔥 STRATEGY — ONLY ON CLOSED CANDLE (streaming indicators, no pandas)
+    if not engine.is_warmed_up:
+        if not engine.indicators.ready:
+            logger.info(
+                "Warming up candles: have=%s need=%s",
+                engine.indicators.count,
+                REQUIRED_CANDLES
+            )
+            load_initial_candles_from_db(engine, REQUIRED_CANDLES)
+            return
+
+        engine.is_warmed_up = True
+        logger.info("Strategy warm-up complete")
+
+    run_strategy_live(engine)
 
-        # 🔥 STRATEGY — ONLY ON CLOSED CANDLE
-        df = pd.DataFrame(engine.candles)
-        df.rename(columns={"start": "timestamp"}, inplace=True)
-
-        # print("dataframe created:", len(df), EMA_LONG+5)
-        # if len(df) >= EMA_LONG + 5:
-        #     df = pd.read_csv(CSV_PATH)
-        #     df = add_indicators(df)
-        #     run_strategy_live(engine, df)
-        #     print("strategy ran")
-        # else:
-
-        # df = pd.read_csv(CSV_PATH)
-        # engine.candles.append(closed)
-
-        if not engine.is_warmed_up:
-            if len(engine.candles) < REQUIRED_CANDLES:
-                logger.info(
-                    "Warming up candles: have=%s need=%s",
-                    len(engine.candles),
-                    REQUIRED_CANDLES
-                )
-                load_initial_candles_from_db(engine, REQUIRED_CANDLES)
-                continue
-
-            engine.is_warmed_up = True
-            logger.info("Strategy warm-up complete")
-
-        df = pd.DataFrame(engine.candles)
-        df.rename(columns={"start": "timestamp"}, inplace=True)
-        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-
-        df = add_indicators(df)
-        run_strategy_live(engine, df)
-
-        logger.info("Strategy executed on candle close")
-
-        # 🔹 START NEW CANDLE
-        engine.current_candle = {
-            "start": candle_start,
-            "open": tick["ltp"],
-            "high": tick["ltp"],
-            "low": tick["ltp"],
-            "close": tick["ltp"],
-        }
-        engine.last_candle_start = candle_start
+    logger.info("Strategy executed on candle close")
 
 
 from django.core.cache import cache
@@ -397,13 +403,14 @@ CSV_PATH = os.path.join(settings.BASE_DIR, "utils", "test", "today_data.csv")
 # ==========================================================
 # STRATEGY RUNNER (SAFE & FAST)
 # ==========================================================
-def run_strategy_live(engine, df):
+def run_strategy_live(engine):
     logger.info("Running strategy live...")
     if not engine.api_key or not engine.jwt_token or not engine.client_code:
         logger.error("Engine credentials missing — cannot trade")
         return
     pm = engine.position_manager
-    last = df.iloc[-1]
+    ind = engine.indicators
+    last = ind.last
     ist_time = last["timestamp"].astimezone(IST)
 
     # ==========================================================
@@ -416,8 +423,7 @@ def run_strategy_live(engine, df):
     # ==========================================================
     # 2️⃣ FORCE EXIT ON MONTH END
     # ==========================================================
-    is_month_end = (ist_time + timedelta(days=1)).month != ist_time.month
-    if is_month_end and pm.has_open_position():
+    if ind.is_month_end and pm.has_open_position():
         logger.info("Month-end detected, forcing exit.")
         pm.force_exit(reason="MONTH_END_EXIT", price=last["close"])
         return
@@ -425,13 +431,11 @@ def run_strategy_live(engine, df):
     # ==========================================================
     # 3️⃣ CALCULATE SIGNAL (USING CLOSED CANDLES ONLY)
     # ==========================================================
-    signal = c3_strategy(df)
+    signal = c3_signal(ind)
     print("signal generated:", signal)
     action = signal["action"]
 
-    ema_fast = last["ema_27"]
-    ema_slow = last["ema_78"]
-    is_uptrend = ema_fast > ema_slow
+    is_uptrend = ind.is_uptrend
 
     logger.info(
         "Candle %s | C3 Action: %s | Uptrend: %s",
@@ -575,7 +579,8 @@ def run_strategy_live(engine, df):
 # ==========================================================
 def load_initial_candles_from_db(engine, limit):
     """
-    Load last `limit` candles from DB into engine.candles
+    Load last `limit` candles from DB into engine.candles and seed the
+    streaming indicators from them (the only full pass over history)
     Runs only once per engine lifecycle
     """
     if len(engine.candles) >= limit:
@@ -584,21 +589,28 @@ def load_initial_candles_from_db(engine, limit):
     qs = (
         LiveCandle.objects
         .filter(
+            user_id=engine.user_id,
             token=451669,
+            interval=f"{CANDLE_INTERVAL_MINUTES}m",
         )
         .order_by("-start_time")[:limit]
     )
 
     candles = list(qs)[::-1]  # chronological order
 
+    merged = {to_epoch_ns(c["start"]): c for c in engine.candles.candles()}
     for c in candles:
-        engine.candles.append({
+        merged.setdefault(to_epoch_ns(c.start_time), {
             "start": c.start_time,
             "open": c.open,
             "high": c.high,
             "low": c.low,
             "close": c.close,
         })
+    history = [merged[k] for k in sorted(merged)]
+    engine.candles.clear()
+    engine.candles.extend(history)
+    engine.indicators.seed(history)
 
     logger.info(
         "Loaded %s historical candles from DB for user %s",
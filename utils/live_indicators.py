@@ -0,0 +1,106 @@
+# utils/live_indicators.py
+import calendar
+import math
+from collections import deque
+from zoneinfo import ZoneInfo
+
+from utils.strategies_live import EMA_SHORT, EMA_LONG
+
+IST = ZoneInfo("Asia/Kolkata")
+
+
+class StreamingEMA:
+    """
+    EMA updated one value at a time; same recursion as
+    pandas ewm(span=span, adjust=False): first value seeds, then
+    ema += alpha * (x - ema).
+    """
+
+    def __init__(self, span):
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self.value = None
+
+    def update(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class LiveIndicators:
+    """
+    Indicator state of one live engine, advanced in O(1) per closed candle:
+    EMA27 / EMA78 of the close, the last three candles and a month-end flag
+    (IST calendar, as used by run_strategy_live). Seeded once from warm-up
+    history; candles with a non-numeric OHLC are skipped, like the dropna in
+    c3_strategy.
+    """
+
+    def __init__(self, fast=EMA_SHORT, slow=EMA_LONG):
+        self.fast, self.slow = fast, slow
+        self.reset()
+
+    def reset(self):
+        self.ema_fast = StreamingEMA(self.fast)
+        self.ema_slow = StreamingEMA(self.slow)
+        self.window = deque(maxlen=3)
+        self.count = 0
+        self.last_start = None
+        self._month_end_day = (None, False)
+
+    def seed(self, candles):
+        """Rebuild the state from history (oldest first)."""
+        self.reset()
+        for c in candles:
+            self.update(c)
+        return self
+
+    def update(self, candle):
+        """candle: {"start", "open", "high", "low", "close"}. Returns False if skipped."""
+        try:
+            bar = (candle["start"], float(candle["open"]), float(candle["high"]),
+                   float(candle["low"]), float(candle["close"]))
+        except (TypeError, ValueError):
+            return False
+        if not all(math.isfinite(v) for v in bar[1:]):
+            return False
+        if self.last_start is not None and bar[0] <= self.last_start:
+            return False
+
+        self.ema_fast.update(bar[4])
+        self.ema_slow.update(bar[4])
+        self.window.append(bar)
+        self.count += 1
+        self.last_start = bar[0]
+        return True
+
+    @property
+    def ready(self):
+        # c3_strategy needs EMA_LONG + 3 clean candles
+        return self.count >= self.slow + 3
+
+    @property
+    def last(self):
+        """Latest candle as {"timestamp", "open", "high", "low", "close"} (None before the first)."""
+        if not self.window:
+            return None
+        ts, o, h, l, c = self.window[-1]
+        return {"timestamp": ts, "open": o, "high": h, "low": l, "close": c}
+
+    @property
+    def is_uptrend(self):
+        return self.ema_fast.value > self.ema_slow.value
+
+    @property
+    def is_month_end(self):
+        """True if the latest candle falls on the last calendar day of its month (IST)."""
+        if self.last_start is None:
+            return False
+        ts = self.last_start
+        day = (ts.astimezone(IST) if ts.tzinfo else ts).date()
+        if self._month_end_day[0] != day:
+            self._month_end_day = (day, day.day == calendar.monthrange(day.year, day.month)[1])
+        return self._month_end_day[1]
+
+    def closes(self):
+        """Closes of the last three candles, oldest first."""
+        return [bar[4] for bar in self.window]
@@ -0,0 +1,196 @@
+# utils/market_data_hub.py
+import os
+import threading
+from datetime import datetime
+
+import pytz
+from logzero import logger
+
+# SmartWebSocketV2 exchange type of the live instrument (MCX futures)
+EXCHANGE_TYPE_MCX = 5
+LTP_MODE = 1
+
+# cap of each Redis stream (approximate, XADD MAXLEN ~)
+STREAM_MAXLEN = 100_000
+
+
+def decode_tick(raw, default_token=None):
+    """SmartWebSocketV2 message -> {"token", "ltp", "timestamp"}; None if it carries no price."""
+    if not isinstance(raw, dict) or "last_traded_price" not in raw:
+        return None
+    return {
+        "token": raw.get("token", default_token),
+        "ltp": raw["last_traded_price"] / 100,
+        "timestamp": datetime.fromtimestamp(raw["exchange_timestamp"] / 1000, pytz.UTC),
+    }
+
+
+# -------------------------
+# Feeds (one per instrument)
+# -------------------------
+class AngelOneFeed:
+    """One SmartWebSocketV2 LTP subscription, decoded once for every subscriber."""
+
+    def __init__(self, token, exchange_type=EXCHANGE_TYPE_MCX, credentials=None):
+        self.token = token
+        self.exchange_type = exchange_type
+        self.credentials = credentials or {}
+        self.sws = None
+
+    def start(self, publish):
+        from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+        c = self.credentials
+        self.sws = SmartWebSocketV2(c["jwt_token"], c["api_key"], c["client_code"], c["feed_token"])
+        token_list = [{"exchangeType": self.exchange_type, "tokens": [self.token]}]
+
+        def on_open(ws):
+            logger.info("Market data feed %s connected: subscribing", self.token)
+            self.sws.subscribe(f"feed_{self.token}", LTP_MODE, token_list)
+
+        def on_data(ws, raw):
+            tick = decode_tick(raw, self.token)
+            if tick is not None:
+                publish(tick)
+
+        self.sws.on_open = on_open
+        self.sws.on_data = on_data
+        self.sws.on_error = lambda ws, error: logger.error("Market data feed %s error: %s", self.token, error)
+        self.sws.on_close = lambda ws: logger.warning("Market data feed %s closed", self.token)
+        threading.Thread(target=self.sws.connect, daemon=True, name=f"feed-{self.token}").start()
+
+    def stop(self):
+        if self.sws is not None:
+            try:
+                self.sws.close_connection()
+            except Exception as e:
+                logger.warning("Market data feed %s close failed: %s", self.token, e)
+            self.sws = None
+
+
+class LocalFeed:
+    """Stand-in publisher for tests and replays: ticks are pushed in-process, no network."""
+
+    def __init__(self, token, exchange_type=EXCHANGE_TYPE_MCX, credentials=None):
+        self.token = token
+        self._publish = None
+
+    def start(self, publish):
+        self._publish = publish
+
+    def stop(self):
+        self._publish = None
+
+    def push(self, ltp, timestamp=None):
+        if self._publish is not None:
+            self._publish({"token": self.token, "ltp": float(ltp), "timestamp": timestamp or datetime.now(pytz.UTC)})
+
+    def replay_journal(self, day, root=None):
+        """Publish one tick-journal day (utils.tick_journal) in order; returns ticks sent."""
+        from datetime import timedelta
+        from utils.tick_journal import read_ticks
+
+        epoch = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+        ticks = read_ticks(self.token, day, root)
+        for ns, price in zip(ticks["epoch_ns"], ticks["price"]):
+            self.push(price, epoch + timedelta(microseconds=int(ns) // 1000))
+        return len(ticks)
+
+
+FEEDS = {"angelone": AngelOneFeed, "local": LocalFeed}
+
+
+# -------------------------
+# Hub
+# -------------------------
+class Subscription:
+    def __init__(self, token, on_tick):
+        self.token = token
+        self.on_tick = on_tick
+        self.delivered = 0
+        self.failed = 0
+
+
+class MarketDataHub:
+    """
+    Keeps one feed per instrument and fans each decoded tick out to every
+    subscribed engine (in-process callbacks, typically queue put_nowait),
+    so feed cost scales with instruments, not users. The feed starts with
+    the first subscriber (using its credentials) and stops with the last.
+
+    With `redis_stream=True` every tick is also XADDed to the Redis stream
+    "ticks:<token>" for consumers in other processes.
+    """
+
+    def __init__(self, feed_factory=AngelOneFeed, redis_stream=False, stream_maxlen=STREAM_MAXLEN):
+        self.feed_factory = feed_factory
+        self.redis_stream = redis_stream
+        self.stream_maxlen = stream_maxlen
+        self._feeds = {}
+        self._subs = {}       # token -> tuple of Subscription (replaced, never mutated)
+        self._ticks = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, token, on_tick, exchange_type=EXCHANGE_TYPE_MCX, credentials=None):
+        sub = Subscription(token, on_tick)
+        with self._lock:
+            self._subs[token] = self._subs.get(token, ()) + (sub,)
+            if token not in self._feeds:
+                feed = self.feed_factory(token, exchange_type, credentials)
+                self._feeds[token] = feed
+                self._ticks.setdefault(token, 0)
+                feed.start(lambda tick, token=token: self.publish(token, tick))
+                logger.info("Market data feed started for %s", token)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = tuple(s for s in self._subs.get(sub.token, ()) if s is not sub)
+            if subs:
+                self._subs[sub.token] = subs
+                return
+            self._subs.pop(sub.token, None)
+            feed = self._feeds.pop(sub.token, None)
+        if feed is not None:
+            feed.stop()
+            logger.info("Market data feed stopped for %s", sub.token)
+
+    def publish(self, token, tick):
+        self._ticks[token] = self._ticks.get(token, 0) + 1
+        for sub in self._subs.get(token, ()):
+            try:
+                sub.on_tick(tick)
+                sub.delivered += 1
+            except Exception as e:
+                sub.failed += 1
+                logger.exception("Tick subscriber for %s failed: %s", token, e)
+        if self.redis_stream:
+            self._xadd(token, tick)
+
+    def _xadd(self, token, tick):
+        from utils import redis_cache
+
+        if redis_cache.redis_client is None:
+            return
+        try:
+            redis_cache.redis_client.xadd(
+                f"ticks:{token}", {"ltp": tick["ltp"], "ts": tick["timestamp"].isoformat()},
+                maxlen=self.stream_maxlen, approximate=True)
+        except Exception as e:
+            logger.warning("Tick stream XADD failed: %s", e)
+
+    def feed(self, token):
+        return self._feeds.get(token)
+
+    def stats(self):
+        """{token: {"subscribers", "ticks"}} of the running feeds."""
+        with self._lock:
+            return {token: {"subscribers": len(self._subs.get(token, ())), "ticks": self._ticks.get(token, 0)}
+                    for token in self._feeds}
+
+
+# process-wide hub; MARKET_DATA_FEED=local swaps the broker socket for LocalFeed
+market_data_hub = MarketDataHub(
+    feed_factory=FEEDS[os.getenv("MARKET_DATA_FEED", "angelone")],
+    redis_stream=os.getenv("MARKET_DATA_STREAM", "") == "redis",
+)
@@ -0,0 +1,161 @@
+# utils/metrics.py
+import numpy as np
+import pandas as pd
+
+from utils.trade_analytics import pair_trades
+
+TRADING_DAYS = 252
+
+
+def _wall(times):
+    times = pd.DatetimeIndex(times)
+    return times.tz_localize(None) if times.tz is not None else times
+
+
+def _period_returns(keys, equity_after, start_cash):
+    """Compounded return per period: start = previous period's end cash."""
+    if not len(keys):
+        return [], np.empty(0)
+    last = np.flatnonzero(np.append(keys[1:] != keys[:-1], True))
+    end_cash = equity_after[last]
+    begin_cash = np.concatenate([[start_cash], end_cash[:-1]])
+    safe = np.where(begin_cash > 0, begin_cash, 1.0)
+    ret = np.where(begin_cash > 0, (end_cash / safe - 1.0) * 100.0, 0.0)
+    return last, np.column_stack([begin_cash, end_cash, ret])
+
+
+def _run_lengths(flags):
+    """Longest run of True and of False in a boolean array."""
+    if not len(flags):
+        return 0, 0
+    starts = np.concatenate([[0], np.flatnonzero(flags[1:] != flags[:-1]) + 1])
+    lengths = np.diff(np.append(starts, len(flags)))
+    vals = flags[starts]
+    return int(lengths[vals].max(initial=0)), int(lengths[~vals].max(initial=0))
+
+
+def _held_ns(ev):
+    """
+    Nanoseconds with at least one position open. ENTRY / EXIT are paired
+    per leg when the events carry one (portfolio logs interleave legs),
+    and overlapping holdings across legs are counted once.
+    """
+    groups = [g for _, g in ev.groupby("leg", sort=False)] if "leg" in ev.columns else [ev]
+    starts, ends = [], []
+    for g in groups:
+        paired, entry_pos, exit_pos = pair_trades(g)
+        times = pd.DatetimeIndex(paired["time"]).asi8
+        starts.append(times[entry_pos])
+        ends.append(times[exit_pos])
+    starts, ends = np.concatenate(starts), np.concatenate(ends)
+    if not len(starts):
+        return 0
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    covered_to = np.concatenate([[starts[0]], reach[:-1]])
+    return int(np.maximum(reach - np.maximum(starts, covered_to), 0).sum())
+
+
+def compute_metrics(events_df, starting_cash, stats=None, periods_per_year=TRADING_DAYS):
+    """
+    Performance metrics of one backtest, from its events (closed-trade equity).
+
+    stats: the backtest stats dict; its first_ts / last_ts set the period
+           (otherwise the first / last event time is used)
+    Equity after each EXIT is "portfolio_cash" when present (pooled
+    portfolio events), else "available_cash".
+
+    Returns a dict: total_return_pct, cagr_pct, max_drawdown / _pct,
+    max_drawdown_duration_days, sharpe, sortino (daily, annualised),
+    profit_factor, expectancy, avg_win, avg_loss, win_rate, trades,
+    max_win_streak, max_loss_streak, exposure_pct (share of the span with
+    any position open; per-leg pairing when events have a "leg" column),
+    and "yearly" / "monthly" lists of {period, start_cash, end_cash,
+    return_pct}.
+    Ratios that are undefined (no losses, no variance, ...) are None.
+    """
+    start_cash = float(starting_cash)
+    ev = events_df if events_df is not None else pd.DataFrame(columns=["time", "event"])
+    is_exit = (ev["event"] == "EXIT").to_numpy(dtype=bool)
+
+    exit_times = pd.DatetimeIndex(ev["time"][is_exit])
+    pnl = ev["realized_pnl"][is_exit].to_numpy(dtype=np.float64) if len(ev) else np.empty(0)
+    cash_col = "portfolio_cash" if "portfolio_cash" in ev.columns else "available_cash"
+    cash_after = ev[cash_col][is_exit].to_numpy(dtype=np.float64) if len(ev) else np.empty(0)
+
+    first_ts = (stats or {}).get("first_ts")
+    last_ts = (stats or {}).get("last_ts")
+    if first_ts is None and len(ev): first_ts = pd.Timestamp(ev["time"].min())
+    if last_ts is None and len(ev): last_ts = pd.Timestamp(ev["time"].max())
+
+    equity = np.concatenate([[start_cash], cash_after])
+    end_cash = float(equity[-1])
+    out = {
+        "starting_cash": start_cash,
+        "ending_cash": end_cash,
+        "total_return_pct": (end_cash / start_cash - 1.0) * 100.0 if start_cash > 0 else 0.0,
+        "trades": int(len(pnl)),
+    }
+
+    # ---- CAGR over the tested span ----
+    years = ((last_ts - first_ts).total_seconds() / (365.25 * 86400)) if first_ts is not None else 0.0
+    out["cagr_pct"] = ((end_cash / start_cash) ** (1.0 / years) - 1.0) * 100.0 \
+        if years > 0 and end_cash > 0 and start_cash > 0 else None
+
+    # ---- yearly / monthly compounded returns ----
+    wall = _wall(exit_times)
+    year = wall.year.to_numpy()
+    ym = year * 12 + wall.month.to_numpy() - 1
+    last, table = _period_returns(year, cash_after, start_cash)
+    out["yearly"] = [{"year": int(year[i]), "start_cash": float(s), "end_cash": float(e), "return_pct": float(r)}
+                     for i, (s, e, r) in zip(last, table)]
+    last, table = _period_returns(ym, cash_after, start_cash)
+    out["monthly"] = [{"month": f"{ym[i] // 12:04d}-{ym[i] % 12 + 1:02d}", "start_cash": float(s),
+                       "end_cash": float(e), "return_pct": float(r)} for i, (s, e, r) in zip(last, table)]
+
+    # ---- drawdown (closed-trade equity) ----
+    peak = np.maximum.accumulate(equity)
+    out["max_drawdown"] = float((peak - equity).max())
+    out["max_drawdown_pct"] = float(((peak - equity) / peak).max() * 100.0) if peak.min() > 0 else None
+
+    eq_times = _wall(pd.DatetimeIndex([first_ts]).append(exit_times)) if first_ts is not None else wall
+    at_peak = np.flatnonzero(equity >= peak)
+    seg_end = np.append(at_peak[1:], -1)
+    underwater = np.append(np.diff(at_peak) > 1, at_peak[-1] < len(equity) - 1)
+    if underwater.any() and len(eq_times):
+        end_time = np.where(seg_end >= 0, eq_times.asi8[np.maximum(seg_end, 0)], _wall([last_ts]).asi8[0])
+        durations = (end_time - eq_times.asi8[at_peak])[underwater]
+        out["max_drawdown_duration_days"] = float(durations.max() / (86400 * 1e9))
+    else:
+        out["max_drawdown_duration_days"] = 0.0
+
+    # ---- daily risk ratios (business-day grid, equity carried forward) ----
+    out["sharpe"] = out["sortino"] = None
+    if first_ts is not None and len(pnl):
+        days = pd.bdate_range(_wall([first_ts])[0].normalize(), _wall([last_ts])[0].normalize())
+        daily = pd.Series(cash_after, index=wall.normalize()).groupby(level=0).last()
+        daily = daily.reindex(days.union(daily.index)).ffill().fillna(start_cash).to_numpy()
+        rets = np.diff(np.concatenate([[start_cash], daily])) / np.concatenate([[start_cash], daily[:-1]])
+        if len(rets) > 1 and rets.std(ddof=1) > 0:
+            out["sharpe"] = float(rets.mean() / rets.std(ddof=1) * np.sqrt(periods_per_year))
+        downside = np.sqrt(np.mean(np.minimum(rets, 0.0) ** 2)) if len(rets) else 0.0
+        if downside > 0:
+            out["sortino"] = float(rets.mean() / downside * np.sqrt(periods_per_year))
+
+    # ---- trade statistics (win = pnl >= 0, as in the engines) ----
+    win = pnl >= 0
+    gross_win, gross_loss = float(pnl[win].sum()), float(-pnl[~win].sum())
+    out["win_rate"] = float(win.mean() * 100.0) if len(pnl) else 0.0
+    out["profit_factor"] = gross_win / gross_loss if gross_loss > 0 else None
+    out["expectancy"] = float(pnl.mean()) if len(pnl) else 0.0
+    out["avg_win"] = float(pnl[win].mean()) if win.any() else 0.0
+    out["avg_loss"] = float(pnl[~win].mean()) if (~win).any() else 0.0
+    out["max_win_streak"], out["max_loss_streak"] = _run_lengths(win)
+
+    # ---- exposure: time in a position / tested span ----
+    out["exposure_pct"] = 0.0
+    if len(pnl) and first_ts is not None and last_ts > first_ts:
+        out["exposure_pct"] = float(_held_ns(ev) / (last_ts - first_ts).value * 100.0)
+
+    return out
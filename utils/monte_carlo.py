@@ -0,0 +1,223 @@
+# utils/monte_carlo.py
+import numpy as np
+import pandas as pd
+
+from utils.backtest import resolve_strategy_params
+
+# position_size doubles on every loss; clamp it (lots are capped by cash far below this)
+MAX_POSITION_SIZE = 1 << 40
+
+PATH_COLUMNS = ["ending_cash", "min_cash", "max_drawdown", "max_drawdown_pct", "max_lots", "ruined", "ruin_trade"]
+
+
+# -------------------------
+# Trade samples
+# -------------------------
+def trade_samples(events_df):
+    """
+    Per-trade inputs for resampling, from a backtest events_df.
+
+    P&L is taken per lot (net of fees, which are proportional to lots) so a
+    resampled trade can be re-sized by the path's own lot rules.
+    """
+    if events_df is None or events_df.empty:
+        return {"pnl_per_lot": np.empty(0), "entry_price": np.empty(0), "exit_price": np.empty(0), "lots": np.empty(0, dtype=np.int64)}
+
+    entries = events_df[events_df["event"] == "ENTRY"]
+    exits = events_df[events_df["event"] == "EXIT"]
+    n = min(len(entries), len(exits))
+    lots = exits["lots"].to_numpy(dtype=np.int64)[:n]
+    return {
+        "pnl_per_lot": exits["realized_pnl"].to_numpy(dtype=np.float64)[:n] / lots,
+        "entry_price": entries["price"].to_numpy(dtype=np.float64)[:n],
+        "exit_price": exits["price"].to_numpy(dtype=np.float64)[:n],
+        "lots": lots,
+    }
+
+
+def resample_indices(n_trades, n_paths, horizon=None, method="bootstrap", block_size=5, seed=None):
+    """
+    (n_paths x horizon) matrix of trade indices.
+
+    method="bootstrap": i.i.d. draws with replacement
+    method="block": circular block bootstrap (keeps streaks of block_size trades,
+                    which matter for the loss-doubling rules)
+    """
+    if n_trades < 1:
+        raise ValueError("No trades to resample")
+    horizon = horizon or n_trades
+    rng = np.random.default_rng(seed)
+
+    if method == "bootstrap":
+        return rng.integers(0, n_trades, size=(n_paths, horizon), dtype=np.int64)
+    if method == "block":
+        block_size = max(1, min(int(block_size), n_trades))
+        n_blocks = -(-horizon // block_size)
+        starts = rng.integers(0, n_trades, size=(n_paths, n_blocks, 1), dtype=np.int64)
+        idx = (starts + np.arange(block_size)) % n_trades
+        return idx.reshape(n_paths, -1)[:, :horizon]
+    raise ValueError(f"Unknown resampling method: {method}")
+
+
+# -------------------------
+# Path simulation
+# -------------------------
+def simulate_paths(samples, idx, strategy_params, starting_cash, sizing="backtest", ruin_fraction=0.5):
+    """
+    Replay resampled trade sequences, all paths at once (loop over trades,
+    vectorised over paths).
+
+    sizing="backtest": lot doubling / halving, 3-win boost and loss-streak
+                       reward of utils.array_engine.ArrayEngine, capped by cash
+    sizing="live": PositionManager.update_after_trade / calculate_lots rules
+
+    A path is ruined once cash falls to ruin_fraction * starting_cash or
+    below; it stops trading from then on.
+    """
+    p = strategy_params
+    pv = float(p["point_value"])
+    margin_factor = float(p["margin_factor"])
+    reserve = float(p["reserve_cash"])
+    if sizing not in ("backtest", "live"):
+        raise ValueError(f"Unknown sizing rules: {sizing}")
+
+    n_paths, horizon = idx.shape
+    cash = np.full(n_paths, float(starting_cash))
+    peak = cash.copy()
+    min_cash = cash.copy()
+    max_dd = np.zeros(n_paths)
+    max_dd_pct = np.zeros(n_paths)
+    max_lots = np.zeros(n_paths, dtype=np.int64)
+    alive = np.ones(n_paths, dtype=bool)
+    ruin_trade = np.full(n_paths, -1, dtype=np.int64)
+    ruin_cash = ruin_fraction * float(starting_cash)
+
+    position_size = np.full(n_paths, int(p["initial_lots"]), dtype=np.int64)
+    consecutive_loss = np.zeros(n_paths, dtype=np.int64)
+    consecutive_win = np.zeros(n_paths, dtype=np.int64)
+    pending_reward = np.zeros(n_paths, dtype=bool)
+    boost_count = np.zeros(n_paths, dtype=np.int64)
+    boost_next_entry = np.zeros(n_paths, dtype=bool)
+    reward_boost = np.zeros(n_paths, dtype=np.int64)      # live rules
+
+    pnl_per_lot, entry_price, exit_price = samples["pnl_per_lot"], samples["entry_price"], samples["exit_price"]
+
+    for t in range(horizon):
+        k = idx[:, t]
+
+        # ---- entry sizing ----
+        margin = np.maximum(1.0, margin_factor * entry_price[k] * pv)
+        dyn_cap = np.maximum(1, np.floor(np.maximum(0.0, 0.5 * cash) / margin)).astype(np.int64)
+        if sizing == "backtest":
+            lots_by_cash = np.maximum(np.floor(np.maximum(0.0, cash - reserve) / margin), 1).astype(np.int64)
+            desired = np.where(boost_next_entry, dyn_cap, position_size)
+            lots = np.maximum(1, np.minimum(np.minimum(lots_by_cash, desired), dyn_cap))
+            boost_next_entry &= ~alive
+        else:
+            lots = np.maximum(1, np.minimum(position_size + reward_boost, dyn_cap))
+
+        pnl = np.where(alive, pnl_per_lot[k] * lots, 0.0)
+        cash = cash + pnl
+        max_lots = np.where(alive, np.maximum(max_lots, lots), max_lots)
+
+        # ---- sizing update after exit ----
+        if sizing == "backtest":
+            win = alive & (pnl >= 0)
+            loss = alive & ~win
+
+            consecutive_win = np.where(win, consecutive_win + 1, np.where(loss, 0, consecutive_win))
+            consecutive_loss = np.where(win, 0, np.where(loss, consecutive_loss + 1, consecutive_loss))
+
+            reward = win & pending_reward & (boost_count > 0)
+            exit_margin = np.maximum(1.0, margin_factor * exit_price[k] * pv)
+            exit_cap = np.maximum(1, np.floor(np.maximum(0.0, 0.5 * cash) / exit_margin)).astype(np.int64)
+            position_size = np.where(reward, np.minimum(exit_cap, position_size * 2), position_size)
+            boost_count = np.where(reward, boost_count - 1, boost_count)
+            done = reward & (boost_count == 0)
+            pending_reward &= ~done
+            consecutive_loss = np.where(done, 0, consecutive_loss)
+
+            third_win = win & (consecutive_win == 3)
+            boost_next_entry |= third_win
+            position_size = np.where(win & ~third_win, np.maximum(1, position_size // 2), position_size)
+
+            streak3 = loss & (consecutive_loss == 3)
+            streak5 = loss & (consecutive_loss == 5)
+            pending_reward |= streak3 | streak5
+            boost_count = np.where(streak3, 1, np.where(streak5, 2, boost_count))
+            position_size = np.where(loss, np.maximum(1, position_size * 2), position_size)
+        else:
+            win = alive & (pnl > 0)
+            loss = alive & ~win
+            consecutive_win = np.where(win, consecutive_win + 1, np.where(loss, 0, consecutive_win))
+            consecutive_loss = np.where(loss, consecutive_loss + 1, np.where(win, 0, consecutive_loss))
+            position_size = np.where(win, np.maximum(1, position_size // 2), np.where(loss, position_size * 2, position_size))
+            reward_boost = (reward_boost + (win & (consecutive_win >= 3))
+                            + (loss & (consecutive_loss >= 3)) + 2 * (loss & (consecutive_loss >= 5)))
+        position_size = np.minimum(position_size, MAX_POSITION_SIZE)
+
+        # ---- drawdown / ruin on closed-trade cash ----
+        peak = np.maximum(peak, cash)
+        dd = peak - cash
+        max_dd = np.maximum(max_dd, dd)
+        max_dd_pct = np.maximum(max_dd_pct, dd / peak * 100.0)
+        min_cash = np.minimum(min_cash, cash)
+
+        newly_ruined = alive & (cash <= ruin_cash)
+        ruin_trade[newly_ruined] = t
+        alive &= ~newly_ruined
+
+    return pd.DataFrame({
+        "ending_cash": cash,
+        "min_cash": min_cash,
+        "max_drawdown": max_dd,
+        "max_drawdown_pct": max_dd_pct,
+        "max_lots": max_lots,
+        "ruined": ruin_trade >= 0,
+        "ruin_trade": ruin_trade,
+    }, columns=PATH_COLUMNS)
+
+
+def summarize_paths(paths, starting_cash, percentiles=(5, 25, 50, 75, 95)):
+    """Distribution summary of simulate_paths output."""
+    q = list(percentiles)
+    return {
+        "paths": len(paths),
+        "ruin_probability": float(paths["ruined"].mean()),
+        "loss_probability": float((paths["ending_cash"] < starting_cash).mean()),
+        "ending_cash": dict(zip(q, np.percentile(paths["ending_cash"], q).tolist())),
+        "max_drawdown": dict(zip(q, np.percentile(paths["max_drawdown"], q).tolist())),
+        "max_drawdown_pct": dict(zip(q, np.percentile(paths["max_drawdown_pct"], q).tolist())),
+        "max_lots": int(paths["max_lots"].max()) if len(paths) else 0,
+    }
+
+
+# -------------------------
+# Public API
+# -------------------------
+def run_monte_carlo(events_df, strategy=None, starting_cash=2500000.0, n_paths=10000, horizon=None,
+                    method="bootstrap", block_size=5, sizing="backtest", ruin_fraction=0.5, seed=None):
+    """
+    Monte Carlo risk study of a backtest's trades.
+
+    events_df: events from utils.backtest.backtest (same strategy / cash)
+    Returns (paths_df, summary); summary["historical"] is the original trade
+    order replayed through the same rules, for comparison.
+    """
+    params = resolve_strategy_params(strategy)
+    samples = trade_samples(events_df)
+    n_trades = len(samples["pnl_per_lot"])
+
+    idx = resample_indices(n_trades, n_paths, horizon, method, block_size, seed)
+    paths = simulate_paths(samples, idx, params, starting_cash, sizing, ruin_fraction)
+    historical = simulate_paths(samples, np.arange(n_trades)[None, :], params, starting_cash, sizing, ruin_fraction)
+
+    summary = summarize_paths(paths, starting_cash)
+    summary.update({
+        "trades": n_trades,
+        "horizon": idx.shape[1],
+        "method": method,
+        "sizing": sizing,
+        "historical": historical.iloc[0].to_dict(),
+    })
+    return paths, summary
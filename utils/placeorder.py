@@ -1,11 +1,12 @@
 # utils/angel_one_orders.py
 
 import json
-import requests
 from logzero import logger
 
+from utils.broker_client import angelone_client, broker_headers, endpoint_url
+
 # Angel One Official REST Order Endpoint
-ORDER_URL = "https://apiconnect.angelone.in/rest/secure/angelbroking/order/v1/placeOrder"
+ORDER_URL = endpoint_url("place_order")
 
 
 def place_order(api_key: str,
@@ -28,16 +29,7 @@ def place_order(api_key: str,
     Returns: dict (API response)
     """
 
-    headers = {
-        "Content-Type": "application/json",
-        "X-ClientLocalIP": "127.0.0.1",
-        "X-ClientPublicIP": "127.0.0.1",
-        "X-MACAddress": "00:00:00:00:00:00",
-        "X-PrivateKey": api_key,
-        "X-UserType": "USER",  # REQUIRED
-        "X-SourceID": "WEB",  # REQUIRED
-        "Authorization": f"{jwt_token}"
-    }
+    headers = broker_headers(api_key, jwt_token, bearer=False)
 
     payload = {
         "exchange": exchange.upper(),               # MCX / NSE / BSE
@@ -55,7 +47,8 @@ def place_order(api_key: str,
     logger.info(f"PLACEMENT PAYLOAD: {payload}")
 
     try:
-        response = requests.post(ORDER_URL, headers=headers, data=json.dumps(payload))
+        # never retried once sent: a lost response must not become a second order
+        response = angelone_client.request("place_order", headers=headers, data=json.dumps(payload))
 
         try:
             data = response.json()
@@ -0,0 +1,152 @@
+# utils/portfolio.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.array_engine import ArrayEngine, candle_arrays
+from utils.backtest import normalize_candles, apply_indicators, resolve_strategy_params
+
+
+# -------------------------
+# Per-leg preparation (independent, runs in worker processes)
+# -------------------------
+def _prepare_leg(args):
+    candles, params = args
+    df = apply_indicators(normalize_candles(candles), params)
+    return candle_arrays(df, float(params["breakout_buffer"]))
+
+
+def _margin_in_use(eng):
+    if eng.pos_side == 0:
+        return 0.0
+    return eng.pos_lots * max(1.0, eng.margin_factor * eng.pos_price * eng.point_value)
+
+
+# engine stats that only describe the pool as one leg saw it; left out of per-leg stats
+LEG_CASH_STATS = ("ending_cash", "flat_cash_min", "flat_cash_max")
+
+
+# -------------------------
+# Public API
+# -------------------------
+def run_portfolio(legs, starting_cash=2500000.0, workers=None):
+    """
+    Backtest several instruments against one cash / margin pool.
+
+    legs: {name: (candles, strategy)} — strategy is a Strategy row, dict or None
+    Each leg keeps its own C3+EMA state machine (utils.array_engine.ArrayEngine);
+    bars of all legs are merged on one timeline and, at every timestamp, each
+    leg with a bar there is advanced by one bar. Before a leg steps, its
+    engine cash is set to the pool cash minus margin held by the other legs'
+    open positions, so sizing sees what is really free; its realised P&L is
+    booked back into the pool.
+
+    Indicator / mask preparation has no cross-leg dependency and runs in
+    parallel (workers processes; 1 = in this process).
+
+    Returns:
+      events_df: all legs' events in time order, with "leg" and
+                 "portfolio_cash" (pool cash after the event) columns
+      leg_results: {name: (events_df, trades_df, stats)} per leg; the
+                 leg frames' cash column is "pool_cash_view" (pool cash less
+                 the other legs' margin, as that leg saw it: not a separate
+                 balance, do not add them up) and the leg stats carry no
+                 cash fields (LEG_CASH_STATS)
+      stats: backtest-style stats for the pooled account
+    """
+    if not legs:
+        raise ValueError("Portfolio needs at least one leg")
+    names = list(legs)
+    params = [resolve_strategy_params(legs[n][1]) for n in names]
+    jobs = [(legs[n][0], p) for n, p in zip(names, params)]
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            arrays = list(pool.map(_prepare_leg, jobs))
+    else:
+        arrays = [_prepare_leg(j) for j in jobs]
+
+    tz_aware = {a["times"].tz is not None for a in arrays if len(a["times"])}
+    if len(tz_aware) > 1:
+        raise ValueError("Cannot mix timezone-aware and naive candle sets in one portfolio")
+
+    # merged timeline: (time, leg order) for every bar of every leg
+    bar_time = np.concatenate([a["times"].asi8 for a in arrays])
+    bar_leg = np.concatenate([np.full(len(a["times"]), k) for k, a in enumerate(arrays)])
+    bar_local = np.concatenate([np.arange(len(a["times"])) for a in arrays])
+    order = np.lexsort((bar_leg, bar_time))
+
+    engines = []
+    for a, p in zip(arrays, params):
+        eng = ArrayEngine(p, starting_cash)
+        eng.load(a)
+        engines.append(eng)
+
+    pool_cash = float(starting_cash)
+    margin = [0.0] * len(engines)
+    leg_pool_cash = [[] for _ in engines]     # pool cash after each of a leg's events
+
+    def step(k, fn):
+        nonlocal pool_cash
+        eng = engines[k]
+        n_events = len(eng.events)
+        eng.cash = pool_cash - (sum(margin) - margin[k])
+        before = eng.cash
+        fn(eng)
+        pool_cash += eng.cash - before
+        margin[k] = _margin_in_use(eng)
+        leg_pool_cash[k].extend([pool_cash] * (len(eng.events) - n_events))
+
+    last_bar = [len(a["times"]) - 1 for a in arrays]
+    for k, j in zip(bar_leg[order].tolist(), bar_local[order].tolist()):
+        if j >= 2:
+            step(k, lambda eng, j=j: eng.run(j, j + 1))
+        if j == last_bar[k]:
+            # leg's data ends here: force-close it now so its P&L is pooled in time order
+            step(k, lambda eng: eng.close_open())
+
+    leg_results, frames = {}, []
+    for k, (name, eng) in enumerate(zip(names, engines)):
+        ev, tr, st = eng.results()
+        frames.append(ev.assign(leg=name, portfolio_cash=leg_pool_cash[k]))
+        # a leg has no balance of its own: its engine cash is the pool less the other legs' margin
+        leg_results[name] = (
+            ev.rename(columns={"available_cash": "pool_cash_view"}),
+            tr.rename(columns={"available_after": "pool_cash_view"}),
+            {key: v for key, v in st.items() if key not in LEG_CASH_STATS},
+        )
+
+    events_df = pd.concat(frames, ignore_index=True)
+    seq = np.concatenate([np.arange(len(f)) for f in frames])
+    leg_no = np.concatenate([np.full(len(f), k) for k, f in enumerate(frames)])
+    # same order the bars were processed in: time, then leg order
+    events_df = events_df.iloc[np.lexsort((seq, leg_no, _event_ns(events_df)))].reset_index(drop=True)
+
+    return events_df, leg_results, _pool_stats(events_df, engines, starting_cash, pool_cash)
+
+
+def _event_ns(events_df):
+    return pd.DatetimeIndex(events_df["time"]).asi8 if len(events_df) else np.empty(0, dtype=np.int64)
+
+
+def _pool_stats(events_df, engines, starting_cash, pool_cash):
+    exits = events_df[events_df["event"] == "EXIT"]
+    pnls = exits["realized_pnl"].tolist()
+    cash_after = exits["portfolio_cash"].to_numpy()
+    flat_min, flat_max = (float(starting_cash), None), (float(starting_cash), None)
+    if len(exits):
+        lo, hi = int(np.argmin(cash_after)), int(np.argmax(cash_after))
+        if cash_after[lo] < flat_min[0]: flat_min = (float(cash_after[lo]), exits["time"].iloc[lo])
+        if cash_after[hi] > flat_max[0]: flat_max = (float(cash_after[hi]), exits["time"].iloc[hi])
+
+    firsts = [e.first_ts for e in engines if e.first_ts is not None]
+    lasts = [e.last_ts for e in engines if e.last_ts is not None]
+    return {
+        "wins": sum(e.wins for e in engines), "losses": sum(e.losses for e in engines), "exit_pnls": pnls,
+        "flat_cash_min": flat_min, "flat_cash_max": flat_max,
+        "first_ts": min(firsts) if firsts else None, "last_ts": max(lasts) if lasts else None,
+        "ending_cash": pool_cash, "realized_pnl_sum": sum(e.realized_pnl_cum for e in engines),
+    }
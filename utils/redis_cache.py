@@ -47,15 +47,16 @@ def redis_delete(key):
 # CANDLE LOCK (PER TIMEFRAME)
 # =======================
 
-def acquire_candle_lock(token, candle_time, ttl=900):
+def acquire_candle_lock(token, candle_time, ttl=900, user_id=None):
     """
-    Ensures only ONE execution per candle.
+    Ensures only ONE execution per candle (per user when user_id is given).
     """
     if redis_client is None:
         logger.warning("Redis down → candle lock bypassed")
         return True
 
-    key = f"lock:candle:{token}:{candle_time.strftime('%Y-%m-%d %H:%M')}"
+    scope = token if user_id is None else f"{user_id}:{token}"
+    key = f"lock:candle:{scope}:{candle_time.strftime('%Y-%m-%d %H:%M')}"
     return redis_client.set(key, "1", nx=True, ex=ttl)
 
 
@@ -0,0 +1,128 @@
+# utils/result_cache.py
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+
+from logzero import logger
+
+# bump when engine changes alter results for the same inputs
+ENGINE_VERSION = 1
+
+_DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "backtest_results")
+
+
+def result_key(strategy_params, symbol_token, interval, from_date, to_date, starting_cash, **extra):
+    """
+    Cache key of one dashboard backtest: hash of the fully resolved strategy
+    parameters, instrument, interval, date range, starting cash and
+    ENGINE_VERSION (plus any extra options such as intrabar).
+    """
+    payload = {
+        "params": {k: strategy_params[k] for k in sorted(strategy_params)},
+        "symbol_token": str(symbol_token),
+        "interval": interval,
+        "from": str(from_date),
+        "to": str(to_date),
+        "starting_cash": round(float(starting_cash), 2),
+        "engine": ENGINE_VERSION,
+        **extra,
+    }
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk, size-bounded LRU of finished backtests (events, trades, stats,
+    chart PNG), shared by all web / worker processes on the host.
+
+    Entries live under <disk_dir>/strategy_<id>/<key>.pkl, so a Strategy row
+    change can drop all of its results at once (invalidate()). A hit touches
+    the file's mtime; after each put the oldest files are removed until the
+    total size is at most max_bytes.
+    """
+
+    def __init__(self, disk_dir, max_bytes=256 * 1024 * 1024):
+        self.disk_dir = disk_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _path(self, strategy_id, key):
+        return os.path.join(self.disk_dir, f"strategy_{strategy_id}", f"{key}.pkl")
+
+    def get(self, strategy_id, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(strategy_id, key)
+        try:
+            with open(path, "rb") as fh:
+                entry = pickle.load(fh)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning("Result cache entry unreadable (%s): %s", path, e)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, strategy_id, key, entry):
+        if not self.disk_dir:
+            return
+        path = self._path(strategy_id, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                pickle.dump(entry, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Result cache write failed (%s): %s", path, e)
+            return
+        self._evict()
+
+    def _entries(self):
+        out = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    out.append((st.st_mtime, st.st_size, path))
+        return out
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+
+    def size_bytes(self):
+        return sum(size for _, size, _ in self._entries()) if self.disk_dir else 0
+
+    def invalidate(self, strategy_id):
+        """Drop every cached result of one strategy."""
+        if self.disk_dir:
+            shutil.rmtree(os.path.join(self.disk_dir, f"strategy_{strategy_id}"), ignore_errors=True)
+
+
+# process-wide cache; RESULT_CACHE_DIR="" disables it
+result_cache = ResultCache(
+    disk_dir=os.getenv("RESULT_CACHE_DIR", _DEFAULT_DIR) or None,
+    max_bytes=int(os.getenv("RESULT_CACHE_MB", "256")) * 1024 * 1024,
+)
@@ -0,0 +1,200 @@
+# utils/runtime_benchmark.py
+import asyncio
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from utils.candle_builder import update_candle
+from utils.engine_runtime import AsyncEngineRuntime
+from utils.market_data_hub import LocalFeed, MarketDataHub
+from utils.tick_writer import BatchedTickWriter
+
+RUNTIMES = ("threads", "asyncio")
+BENCH_TOKEN = 451669
+
+
+# -------------------------
+# Stand-in engine
+# -------------------------
+class BenchEngine:
+    """
+    The per-engine work of UserEngine minus DB / broker I/O: a tick writer
+    (no-op save) and the candle builder fed from the shared hub.
+    """
+
+    def __init__(self, user_id, runtime):
+        self.user_id = user_id
+        self.running = threading.Event()
+        self.running.set()
+        queue_cls = asyncio.Queue if runtime == "asyncio" else queue.Queue
+        self.tick_queue_db = queue_cls(maxsize=100_000)
+        self.tick_queue_candle = queue_cls(maxsize=100_000)
+        self.tick_writer = BatchedTickWriter(self.tick_queue_db, user_id, save=lambda user_id, ticks: None)
+        self.current_candle = None
+        self.last_candle_start = None
+        self.ticks_seen = 0
+        self.candles_closed = 0
+
+    def on_candle_tick(self, tick):
+        if update_candle(self, tick) is not None:
+            self.candles_closed += 1
+        self.ticks_seen += 1
+
+
+def _candle_thread(engine):
+    while engine.running.is_set():
+        try:
+            tick = engine.tick_queue_candle.get(timeout=1)
+        except queue.Empty:
+            continue
+        engine.on_candle_tick(tick)
+
+
+async def _candle_task(engine):
+    while engine.running.is_set():
+        try:
+            tick = await asyncio.wait_for(engine.tick_queue_candle.get(), 1)
+        except asyncio.TimeoutError:
+            continue
+        engine.on_candle_tick(tick)
+
+
+async def _run_async(engine):
+    await asyncio.gather(engine.tick_writer.arun(engine.running), _candle_task(engine))
+
+
+# -------------------------
+# Process counters
+# -------------------------
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, KiB on Linux
+
+
+def _counters():
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return time.perf_counter(), ru.ru_nvcsw + ru.ru_nivcsw, ru.ru_utime + ru.ru_stime
+
+
+def _delta(start):
+    wall, ctx, cpu = (b - a for a, b in zip(start, _counters()))
+    return wall, ctx, cpu
+
+
+# -------------------------
+# Benchmark
+# -------------------------
+def benchmark_runtime(runtime, engines=100, ticks=600, idle=2.0, timeout=120):
+    """
+    Host `engines` stand-in engines in this process with the given runtime,
+    then measure: startup time and RSS growth, OS threads, context switches
+    and CPU per second while idle, and wall / context switches / CPU to fan
+    `ticks` ticks out to every engine through one MarketDataHub feed.
+    """
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown runtime: {runtime}")
+
+    rss0, threads0 = _rss_mb(), threading.active_count()
+    hub = MarketDataHub(feed_factory=LocalFeed)
+    bench = [BenchEngine(i, runtime) for i in range(engines)]
+    workers, rt, subs = [], None, []
+
+    start = _counters()
+    if runtime == "threads":
+        for e in bench:
+            workers += [threading.Thread(target=e.tick_writer.run, args=(e.running,), daemon=True),
+                        threading.Thread(target=_candle_thread, args=(e,), daemon=True)]
+            workers[-2].start()
+            workers[-1].start()
+
+            def deliver(tick, e=e):
+                e.tick_queue_db.put_nowait(tick)
+                e.tick_queue_candle.put_nowait(tick)
+
+            subs.append(hub.subscribe(BENCH_TOKEN, deliver))
+    else:
+        rt = AsyncEngineRuntime(blocking_workers=4)
+        futures = [rt.submit(_run_async(e)) for e in bench]
+        loop = rt.loop
+
+        def enqueue(e, tick):
+            e.tick_queue_db.put_nowait(tick)
+            e.tick_queue_candle.put_nowait(tick)
+
+        for e in bench:
+            subs.append(hub.subscribe(BENCH_TOKEN, lambda tick, e=e: loop.call_soon_threadsafe(enqueue, e, tick)))
+    startup_s = _delta(start)[0]
+
+    result = {
+        "runtime": runtime,
+        "engines": engines,
+        "startup_s": round(startup_s, 4),
+        "os_threads": threading.active_count() - threads0,
+        "rss_mb": round(_rss_mb() - rss0, 2),
+    }
+
+    # idle: every engine waiting for ticks
+    start = _counters()
+    time.sleep(idle)
+    wall, ctx, cpu = _delta(start)
+    result["idle_ctx_switches_per_s"] = round(ctx / wall, 1)
+    result["idle_cpu_pct"] = round(100 * cpu / wall, 2)
+
+    # load: one feed, fanned out to every engine
+    feed = hub.feed(BENCH_TOKEN)
+    t0 = datetime(2024, 3, 1, 4, 0, tzinfo=timezone.utc)
+    start = _counters()
+    for i in range(ticks):
+        feed.push(70000.0 + (i % 50), t0 + timedelta(seconds=i))
+    expected = engines * ticks
+    deadline = time.monotonic() + timeout
+    while sum(e.ticks_seen for e in bench) < expected and time.monotonic() < deadline:
+        time.sleep(0.001)
+    wall, ctx, cpu = _delta(start)
+    delivered = sum(e.ticks_seen for e in bench)
+    result.update({
+        "ticks": ticks,
+        "delivered": delivered,
+        "fanout_s": round(wall, 4),
+        "ticks_per_s": round(delivered / wall) if wall else None,
+        "fanout_ctx_switches": ctx,
+        "fanout_cpu_s": round(cpu, 4),
+        "candles_closed": sum(e.candles_closed for e in bench),
+    })
+
+    # teardown (final tick-writer flushes included)
+    for sub in subs:
+        hub.unsubscribe(sub)
+    for e in bench:
+        e.running.clear()
+    for e in bench:
+        e.tick_writer.stop(timeout=10)
+    if rt is not None:
+        for f in futures:
+            f.result(timeout=10)
+        rt.shutdown()
+    for t in workers:
+        t.join(5)
+    result["flushed_rows"] = sum(e.tick_writer.rows for e in bench)
+    return result
+
+
+def _child(args):
+    return benchmark_runtime(*args)
+
+
+def compare_runtimes(engines=100, ticks=600, idle=2.0, runtimes=RUNTIMES):
+    """benchmark_runtime for each runtime, each in a fresh process so RSS / thread counts do not mix."""
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for runtime in runtimes:
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(_child, ((runtime, engines, ticks, idle),)))
+    return results
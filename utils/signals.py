@@ -0,0 +1,63 @@
+# utils/signals.py
+import numpy as np
+
+# -------------------------
+# C3 breakout signal masks
+# -------------------------
+# C1 = bar i-2, C2 = bar i-1, C3 = bar i (the signal bar).
+#   LONG : C1 and C2 green, C2 high > C1 high, C3 close > C2 high * (1 + buffer)
+#   SHORT: C1 and C2 red,   C2 low  < C1 low,  C3 close < C2 low  * (1 - buffer)
+# backtest_runner/backtest_engine.py never had the higher-high / lower-low
+# check, hence confirm_extreme.
+
+
+def _ohlc(candles):
+    return tuple(np.asarray(candles[k], dtype=np.float64) for k in ("open", "high", "low", "close"))
+
+
+def c3_pattern(candles, confirm_extreme=True):
+    """
+    Buffer-independent part of the C3 pattern, computed once per candle set.
+
+    candles: DataFrame or dict with open/high/low/close
+    Returns dict of arrays aligned to C3 bars 2..n-1.
+    """
+    o, h, l, c = _ohlc(candles)
+    o1, h1, l1, c1 = o[:-2], h[:-2], l[:-2], c[:-2]
+    o2, h2, l2, c2 = o[1:-1], h[1:-1], l[1:-1], c[1:-1]
+
+    up = (c1 > o1) & (c2 > o2)
+    down = (c1 < o1) & (c2 < o2)
+    if confirm_extreme:
+        up &= h2 > h1
+        down &= l2 < l1
+
+    return {"n": len(c), "up": up, "down": down, "h2": h2, "l2": l2, "c3": c[2:]}
+
+
+def breakout_masks_from_pattern(pattern, buffer):
+    """Apply one buffer value to a c3_pattern() result -> (long_break, short_break)."""
+    n = pattern["n"]
+    long_break = np.zeros(n, dtype=bool)
+    short_break = np.zeros(n, dtype=bool)
+    if n < 3:
+        return long_break, short_break
+
+    c3 = pattern["c3"]
+    long_break[2:] = pattern["up"] & (c3 > pattern["h2"] * (1 + buffer))
+    short_break[2:] = pattern["down"] & (c3 < pattern["l2"] * (1 - buffer))
+    return long_break, short_break
+
+
+def c3_breakout_masks(candles, buffer, confirm_extreme=True):
+    """
+    Boolean long/short breakout arrays for every bar (first two bars are False).
+    long_break[i] is True when bar i closes as a valid C3 LONG breakout.
+    """
+    return breakout_masks_from_pattern(c3_pattern(candles, confirm_extreme), buffer)
+
+
+def c3_breakout_mask_table(candles, buffers, confirm_extreme=True):
+    """One pass per buffer value: {buffer: (long_break, short_break)}."""
+    pattern = c3_pattern(candles, confirm_extreme)
+    return {b: breakout_masks_from_pattern(pattern, b) for b in buffers}
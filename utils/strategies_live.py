@@ -110,7 +110,7 @@ def c3_strategy(df: pd.DataFrame):
         result["reason"] = "Insufficient candles after cleanup"
         return result
 
-    # EMA calculation
+    # EMA calculation (not via indicator_cache: a growing live frame never repeats a key)
     df["ema_27"] = df["close"].ewm(span=EMA_SHORT, adjust=False).mean()
     df["ema_78"] = df["close"].ewm(span=EMA_LONG, adjust=False).mean()
 
@@ -137,6 +137,32 @@ def c3_strategy(df: pd.DataFrame):
     }
 
 
+def c3_signal(indicators):
+    """
+    c3_strategy on streaming state (utils.live_indicators.LiveIndicators):
+    same rules and result dict, no DataFrame.
+    """
+    if indicators is None or not indicators.ready:
+        return {"action": "HOLD", "reason": "Not enough candles", "price": None}
+
+    cl1, cl2, cl3 = indicators.closes()
+    ema_uptrend = indicators.is_uptrend
+    price_pattern = cl1 < cl2 < cl3
+
+    if ema_uptrend and price_pattern:
+        return {
+            "action": "BUY",
+            "reason": "C3 CONFIRMED (EMA27>EMA78 & C1<C2<C3)",
+            "price": float(cl3),
+        }
+
+    return {
+        "action": "HOLD",
+        "reason": f"ema_uptrend={ema_uptrend}, price_pattern={price_pattern}",
+        "price": float(cl3),
+    }
+
+
 def should_run_strategy(engine, candle_time):
     if engine.last_strategy_candle == candle_time:
         return False
@@ -0,0 +1,120 @@
+# utils/streaming_backtest.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.array_engine import ArrayEngine, candle_arrays
+from utils.backtest import normalize_candles, resolve_strategy_params
+
+STREAM_COLUMNS = ["datetime", "open", "high", "low", "close"]
+
+
+# -------------------------
+# Chunk sources
+# -------------------------
+def iter_candle_chunks(source, chunksize=100_000):
+    """
+    Yield raw candle DataFrames from a CSV / Parquet path, a DataFrame
+    (sliced) or any iterable of DataFrames.
+    Parquet needs pyarrow, which is optional and imported only here.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start:start + chunksize]
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        if path.lower().endswith((".parquet", ".pq")):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Reading Parquet candles requires pyarrow (pip install pyarrow)")
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(path, chunksize=chunksize)
+        return
+
+    yield from source
+
+
+def _seeded_ema(values, span, prev):
+    """EMA (adjust=False) continuing from the previous chunk's last value."""
+    if prev is None:
+        return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+    # prepend the carried value: pandas restarts the recursion from it exactly
+    seeded = pd.Series(np.concatenate([[prev], values])).ewm(span=span, adjust=False).mean()
+    return seeded.to_numpy()[1:]
+
+
+def _wall_month(times):
+    times = pd.DatetimeIndex(times)
+    wall = times.tz_localize(None) if times.tz is not None else times
+    return wall.year.to_numpy() * 12 + wall.month.to_numpy()
+
+
+# -------------------------
+# Public API
+# -------------------------
+def stream_backtest(source, strategy=None, starting_cash=2500000.0, chunksize=100_000):
+    """
+    Out-of-core utils.backtest.backtest: candles are read chunk by chunk and
+    only the current chunk is held in memory.
+
+    Carried across chunk boundaries:
+      - EMA state (last ema_s / ema_l value)
+      - the last two processed bars (C3 pattern lookback)
+      - the newest bar of each chunk, held back until the next chunk shows
+        whether it is the last bar of its month
+      - the ArrayEngine itself (position, stops, cooldown, sizing, cash)
+
+    Candles must already be in time order across chunks (ValueError if not).
+    Returns events_df, trades_df, stats exactly as backtest(...) would.
+    """
+    params = resolve_strategy_params(strategy)
+    ema_short, ema_long = int(params["ema_short"]), int(params["ema_long"])
+    breakout_buffer = float(params["breakout_buffer"])
+
+    eng = ArrayEngine(params, starting_cash)
+    state = {"ema_s": None, "ema_l": None, "lead": None, "offset": 0}
+
+    def process(block, next_month):
+        """Run the engine over `block`; next_month is the month key of the bar after it (None = end)."""
+        ema_s = _seeded_ema(block["close"].to_numpy(dtype=np.float64), ema_short, state["ema_s"])
+        ema_l = _seeded_ema(block["close"].to_numpy(dtype=np.float64), ema_long, state["ema_l"])
+        ym = _wall_month(block["datetime"])
+        following = np.append(ym[1:], -1 if next_month is None else next_month)
+
+        block = block.assign(ema_s=ema_s, ema_l=ema_l, is_month_end=ym != following)
+        lead = state["lead"]
+        frame = block if lead is None else pd.concat([lead, block], ignore_index=True)
+        n_lead = 0 if lead is None else len(lead)
+
+        eng.load(candle_arrays(frame, breakout_buffer), bar_offset=state["offset"] - n_lead)
+        eng.run(start=n_lead)
+
+        state["ema_s"], state["ema_l"] = ema_s[-1], ema_l[-1]
+        state["lead"] = frame.iloc[-2:].reset_index(drop=True)
+        state["offset"] += len(block)
+
+    held = None
+    for raw in iter_candle_chunks(source, chunksize):
+        chunk = normalize_candles(raw)[STREAM_COLUMNS]
+        if chunk.empty:
+            continue
+        if held is not None:
+            if chunk["datetime"].iloc[0] < held["datetime"].iloc[-1]:
+                raise ValueError("Candle chunks are not in time order")
+            chunk = pd.concat([held, chunk], ignore_index=True)
+
+        if len(chunk) > 1:
+            body = chunk.iloc[:-1]
+            process(body, _wall_month(chunk["datetime"].iloc[-1:])[0])
+        held = chunk.iloc[-1:].reset_index(drop=True)
+
+    if held is not None:
+        process(held, None)
+    eng.close_open()
+    return eng.results()
@@ -0,0 +1,247 @@
+# utils/sweep.py
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from utils.array_engine import ArrayEngine
+from utils.backtest import normalize_candles, apply_indicators, resolve_strategy_params
+from utils.indicator_cache import indicator_cache, dataset_fingerprint
+from utils.metrics import compute_metrics
+from utils.signals import c3_pattern, breakout_masks_from_pattern
+
+# Strategy model fields a sweep may vary
+SWEEP_FIELDS = ("ema_short", "ema_long", "fixed_sl_pct", "trail_sl_pct", "breakout_buffer", "margin_factor")
+
+# arrays shared with workers (name -> dtype)
+SHARED_ARRAYS = {
+    "open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64,
+    "month_end": np.bool_, "day": np.int64, "time_ns": np.int64,
+}
+
+RESULT_COLUMNS = ["ending_cash", "realized_pnl_sum", "trades", "wins", "losses", "win_rate", "min_cash",
+                  "cagr_pct", "max_drawdown_pct", "sharpe", "profit_factor"]
+METRIC_COLUMNS = RESULT_COLUMNS[7:]
+
+
+# -------------------------
+# Grid helpers
+# -------------------------
+def load_grid(arg):
+    """Sweep grid from a JSON object string or a path to a JSON file; ValueError if unreadable."""
+    try:
+        if arg.strip().startswith("{"):
+            return json.loads(arg)
+        with open(arg) as fh:
+            return json.load(fh)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Invalid grid: {e}")
+
+
+def strategy_by_name(name):
+    """Strategy row called `name` (None for an empty name); ValueError if there is none."""
+    from backtest_runner.models import Strategy
+
+    if not name:
+        return None
+    strategy = Strategy.objects.filter(name=name).first()
+    if strategy is None:
+        raise ValueError(f"Strategy not found: {name}")
+    return strategy
+
+
+def expand_grid(grid):
+    """{"ema_short": [9, 27], "ema_long": [26, 78]} -> list of param dicts (cartesian product)."""
+    unknown = set(grid) - set(SWEEP_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown sweep fields: {', '.join(sorted(unknown))}")
+    keys = list(grid)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+# -------------------------
+# Shared memory
+# -------------------------
+def _share_candles(df):
+    """Copy candle arrays into shared memory once. Returns (segments, spec)."""
+    times = pd.DatetimeIndex(df["datetime"])
+    wall = times.tz_localize(None) if times.tz is not None else times
+    source = {
+        "open": df["open"].to_numpy(),
+        "high": df["high"].to_numpy(),
+        "low": df["low"].to_numpy(),
+        "close": df["close"].to_numpy(),
+        "month_end": df["is_month_end"].to_numpy(),
+        "day": wall.values.astype("datetime64[D]").astype(np.int64),
+        "time_ns": times.asi8,
+    }
+
+    segments, spec = [], {"n": len(df), "tz": str(times.tz) if times.tz is not None else None,
+                          "fp": dataset_fingerprint(df), "arrays": {}}
+    for name, dtype in SHARED_ARRAYS.items():
+        arr = np.ascontiguousarray(source[name], dtype=dtype)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=dtype, buffer=shm.buf)[:] = arr
+        segments.append(shm)
+        spec["arrays"][name] = shm.name
+    return segments, spec
+
+
+# per-process state (set once by _init_worker)
+_WORKER = {}
+
+
+def _init_worker(spec, base_params, starting_cash):
+    arrays, segments = {}, []
+    for name, shm_name in spec["arrays"].items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        segments.append(shm)
+        arrays[name] = np.ndarray((spec["n"],), dtype=SHARED_ARRAYS[name], buffer=shm.buf)
+
+    times = pd.DatetimeIndex(arrays["time_ns"].copy().view("datetime64[ns]"))
+    if spec["tz"]:
+        times = times.tz_localize("UTC").tz_convert(spec["tz"])
+
+    _WORKER.clear()
+    _WORKER.update({
+        "arrays": arrays,
+        "segments": segments,        # keep mappings alive for the life of the worker
+        "times": times,
+        "base_params": base_params,
+        "starting_cash": starting_cash,
+        "fp": spec["fp"],            # indicator cache key (shared disk tier across workers)
+        "masks": {},                 # buffer -> (long, short)
+        "pattern": None,
+    })
+
+
+def _release_worker():
+    segments = _WORKER.get("segments", [])
+    _WORKER.clear()              # drop array views before closing their mappings
+    for shm in segments:
+        shm.close()
+
+
+def _worker_ema(span):
+    return indicator_cache.ema(_WORKER["arrays"]["close"], span, _WORKER["fp"])
+
+
+def _worker_masks(buffer):
+    cache = _WORKER["masks"]
+    if buffer not in cache:
+        if _WORKER["pattern"] is None:
+            _WORKER["pattern"] = c3_pattern(_WORKER["arrays"])
+        cache[buffer] = breakout_masks_from_pattern(_WORKER["pattern"], buffer)
+    return cache[buffer]
+
+
+def _worker_engine(params, starting_cash, start=0, stop=None):
+    """
+    Run one fully resolved parameter set over bars [start, stop) of the shared
+    candles. Indicators and masks are full-history, so a window sees the same
+    EMA values as a whole-history run; bar_index stays absolute.
+    """
+    arrays = _WORKER["arrays"]
+    stop = len(_WORKER["times"]) if stop is None else stop
+    lead = min(start, 2)         # the loop needs two prior bars before `start`
+    sl = slice(start - lead, stop)
+    long_break, short_break = _worker_masks(float(params["breakout_buffer"]))
+
+    eng = ArrayEngine(params, starting_cash)
+    eng.load({
+        "times": _WORKER["times"][sl],
+        "high": arrays["high"][sl], "low": arrays["low"][sl], "close": arrays["close"][sl],
+        "ema_s": _worker_ema(int(params["ema_short"]))[sl],
+        "ema_l": _worker_ema(int(params["ema_long"]))[sl],
+        "month_end": arrays["month_end"][sl], "day": arrays["day"][sl],
+        "long_break": long_break[sl], "short_break": short_break[sl],
+    }, bar_offset=start - lead)
+    eng.run(start=lead)
+    eng.close_open()
+    return eng
+
+
+def _run_combo(combo):
+    params = dict(_WORKER["base_params"])
+    params.update(combo)
+    eng = _worker_engine(params, _WORKER["starting_cash"])
+    return summarize_stats(eng.stats(), eng.events.to_frame(categorical=True), _WORKER["starting_cash"])
+
+
+def summarize_stats(stats, events_df=None, starting_cash=None):
+    """
+    Flatten a backtest stats dict into one result row. With the run's
+    events_df and starting_cash, the METRIC_COLUMNS are filled in too.
+    """
+    trades = stats["wins"] + stats["losses"]
+    row = {
+        "ending_cash": stats["ending_cash"],
+        "realized_pnl_sum": stats["realized_pnl_sum"],
+        "trades": trades,
+        "wins": stats["wins"],
+        "losses": stats["losses"],
+        "win_rate": (stats["wins"] / trades * 100.0) if trades else 0.0,
+        "min_cash": stats["flat_cash_min"][0],
+    }
+    if events_df is not None:
+        metrics = compute_metrics(events_df, starting_cash, stats)
+        row.update({col: metrics[col] for col in METRIC_COLUMNS})
+    return row
+
+
+# -------------------------
+# Public API
+# -------------------------
+def run_sweep(candles, grid, strategy=None, starting_cash=2500000.0, workers=None,
+              rank_by="ending_cash", ascending=False):
+    """
+    Evaluate every combination of `grid` over one candle set.
+
+    candles: anything utils.backtest.normalize_candles accepts
+    grid: {field: [values]} over SWEEP_FIELDS
+    strategy: Strategy row / dict supplying the fixed parameters
+    workers: process count (None = all cores, 1 = run in this process)
+
+    OHLC, month-end and day arrays are copied into shared memory once and
+    attached by each worker; EMAs come from utils.indicator_cache (keyed by
+    the dataset fingerprint, so INDICATOR_CACHE_DIR shares them across
+    workers and runs) and breakout masks are computed once per buffer.
+
+    Returns a DataFrame with one row per combination, ranked by `rank_by`.
+    """
+    combos = expand_grid(grid)
+    base_params = resolve_strategy_params(strategy)
+
+    df = normalize_candles(candles)
+    df = apply_indicators(df, base_params)
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(combos)) or 1
+
+    segments, spec = _share_candles(df)
+    try:
+        if workers == 1:
+            _init_worker(spec, base_params, starting_cash)
+            try:
+                rows = [_run_combo(c) for c in combos]
+            finally:
+                _release_worker()
+        else:
+            chunksize = max(1, len(combos) // (workers * 8))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(spec, base_params, starting_cash)) as pool:
+                rows = list(pool.map(_run_combo, combos, chunksize=chunksize))
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+    table = pd.concat([pd.DataFrame(combos), pd.DataFrame(rows, columns=RESULT_COLUMNS)], axis=1)
+    table = table.sort_values(rank_by, ascending=ascending, kind="stable").reset_index(drop=True)
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table
@@ -0,0 +1,153 @@
+# utils/tick_journal.py
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from utils.candle_ring import to_epoch_ns
+
+# one record per tick: exchange time (ns since epoch, UTC) + last traded price
+TICK_DTYPE = np.dtype([("epoch_ns", "<i8"), ("price", "<f8")])
+
+# journal days follow the exchange's calendar
+IST_OFFSET = timedelta(hours=5, minutes=30)
+_IST_OFFSET_NS = IST_OFFSET // timedelta(microseconds=1) * 1000
+_DAY_NS = 86_400 * 10**9
+
+_DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tick_journal")
+
+
+def journal_dir():
+    return os.getenv("TICK_JOURNAL_DIR", _DEFAULT_DIR)
+
+
+def journal_path(token, day, root=None):
+    """<root>/<token>/<YYYY-MM-DD>.ticks"""
+    return os.path.join(root or journal_dir(), str(token), f"{day:%Y-%m-%d}.ticks")
+
+
+def _ist_day_index(epoch_ns):
+    return (np.asarray(epoch_ns, dtype=np.int64) + _IST_OFFSET_NS) // _DAY_NS
+
+
+# -------------------------
+# Writing
+# -------------------------
+class TickJournal:
+    """
+    Append-only, per-instrument tick files: one file per IST day of raw
+    TICK_DTYPE records (16 bytes, no header), so a day can be mapped with
+    numpy.memmap without parsing.
+
+    Engines trading the same instrument share one journal (journal_for),
+    and a tick not newer than the last one written (same time and price,
+    or older) is dropped, so N engines fed the same feed write it once.
+    """
+
+    def __init__(self, token, root=None):
+        self.token = str(token)
+        self.root = root or journal_dir()
+        self._lock = threading.Lock()
+        self._last = (None, None)
+        self.records = 0
+
+    def append(self, epoch_ns, prices):
+        """Append ticks (arrays of epoch ns and price, oldest first); returns records written."""
+        epoch_ns = np.asarray(epoch_ns, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        if not len(epoch_ns):
+            return 0
+
+        with self._lock:
+            last_ns, last_price = self._last
+            if last_ns is not None:
+                keep = (epoch_ns > last_ns) | ((epoch_ns == last_ns) & (prices != last_price))
+                epoch_ns, prices = epoch_ns[keep], prices[keep]
+                if not len(epoch_ns):
+                    return 0
+
+            records = np.empty(len(epoch_ns), dtype=TICK_DTYPE)
+            records["epoch_ns"], records["price"] = epoch_ns, prices
+
+            days = _ist_day_index(epoch_ns)
+            bounds = np.flatnonzero(np.diff(days)) + 1
+            for chunk, day in zip(np.split(records, bounds), days[np.r_[0, bounds]]):
+                path = journal_path(self.token, date(1970, 1, 1) + timedelta(days=int(day)), self.root)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "ab") as fh:
+                    chunk.tofile(fh)
+
+            self._last = (int(epoch_ns[-1]), float(prices[-1]))
+            self.records += len(records)
+            return len(records)
+
+    def append_ticks(self, ticks):
+        """Append engine ticks ({"ltp", "timestamp"} dicts)."""
+        return self.append([to_epoch_ns(t["timestamp"]) for t in ticks], [t["ltp"] for t in ticks])
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def journal_for(token, root=None):
+    """Process-wide TickJournal of one instrument."""
+    key = (root or journal_dir(), str(token))
+    with _journals_lock:
+        if key not in _journals:
+            _journals[key] = TickJournal(token, root=key[0])
+        return _journals[key]
+
+
+# -------------------------
+# Reading
+# -------------------------
+def journal_days(token, root=None):
+    """IST days with a journal file for `token`, oldest first."""
+    folder = os.path.join(root or journal_dir(), str(token))
+    if not os.path.isdir(folder):
+        return []
+    return sorted(datetime.strptime(name[:-6], "%Y-%m-%d").date()
+                  for name in os.listdir(folder) if name.endswith(".ticks"))
+
+
+def read_ticks(token, day, root=None):
+    """
+    One day's ticks as a read-only TICK_DTYPE memmap (zero-copy); empty
+    array if there is no file. A partly written last record is ignored.
+    """
+    path = journal_path(token, day, root)
+    try:
+        n = os.path.getsize(path) // TICK_DTYPE.itemsize
+    except OSError:
+        n = 0
+    if n == 0:
+        return np.empty(0, dtype=TICK_DTYPE)
+    return np.memmap(path, dtype=TICK_DTYPE, mode="r", shape=(n,))
+
+
+def ticks_frame(token, day, root=None):
+    """read_ticks as a DataFrame: datetime (Asia/Kolkata), price."""
+    ticks = read_ticks(token, day, root)
+    return pd.DataFrame({
+        "datetime": pd.to_datetime(np.asarray(ticks["epoch_ns"]), utc=True).tz_convert("Asia/Kolkata"),
+        "price": np.asarray(ticks["price"]),
+    })
+
+
+def export_to_livetick(user_id, token, day, root=None, batch_size=5000):
+    """Copy one journal day into LiveTick rows (for the admin / legacy readers); returns rows written."""
+    from live_trading.models import LiveTick
+
+    ticks = read_ticks(token, day, root)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    for i in range(0, len(ticks), batch_size):
+        chunk = ticks[i:i + batch_size]
+        LiveTick.objects.bulk_create([
+            LiveTick(user_id=user_id, token=str(token), ltp=float(price),
+                     exchange_timestamp=epoch + timedelta(microseconds=int(ns) // 1000))
+            for ns, price in zip(chunk["epoch_ns"], chunk["price"])
+        ])
+    return len(ticks)
@@ -0,0 +1,182 @@
+# utils/tick_writer.py
+import asyncio
+import queue
+import threading
+import time
+
+from logzero import logger
+
+from utils.broker_client import LatencyHistogram
+
+# flush when this many ticks are pending ...
+BATCH_SIZE = 500
+# ... or when the oldest pending tick has waited this long (seconds)
+FLUSH_INTERVAL = 0.25
+
+# put by stop() so a loop blocked on an empty queue notices the shutdown at once
+_WAKE = object()
+
+
+def save_live_ticks(user_id, ticks):
+    """One INSERT (per bulk_create batch) for a list of {"token", "ltp", "timestamp"} ticks."""
+    from live_trading.models import LiveTick
+
+    LiveTick.objects.bulk_create([
+        LiveTick(user_id=user_id, token=t["token"], ltp=t["ltp"], exchange_timestamp=t["timestamp"])
+        for t in ticks
+    ], batch_size=BATCH_SIZE)
+
+
+class BatchedTickWriter:
+    """
+    Drains an engine's tick queue into bulk inserts instead of one
+    LiveTick.objects.create (and transaction) per tick. A batch is written
+    once it holds `batch_size` ticks or its oldest tick is `flush_interval`
+    seconds old; stop() writes whatever is still queued.
+
+    `save(user_id, ticks)` does the write (default: save_live_ticks).
+    A failed batch is logged and dropped, as single failed inserts were.
+    """
+
+    def __init__(self, tick_queue, user_id, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, save=None,
+                 clock=time.monotonic):
+        self.queue = tick_queue
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.save = save or save_live_ticks
+        self._clock = clock
+
+        self._pending = []
+        self._deadline = None
+        self._lock = threading.Lock()
+        self._started = threading.Event()
+        self._stopped = threading.Event()
+        self._loop = None   # set by arun(): the queue is then an asyncio.Queue of that loop
+
+        # metrics
+        self.batches = 0
+        self.rows = 0
+        self.failed_rows = 0
+        self.max_batch = 0
+        self.last_batch = 0
+        self.flush_latency = LatencyHistogram()
+
+    # -------------------------
+    # Loop
+    # -------------------------
+    def _take(self, tick):
+        if tick is _WAKE:
+            return
+        if not self._pending:
+            self._deadline = self._clock() + self.flush_interval
+        self._pending.append(tick)
+
+    def _drain_nowait(self, limit):
+        while len(self._pending) < limit:
+            try:
+                self._take(self.queue.get_nowait())
+            except (queue.Empty, asyncio.QueueEmpty):
+                return
+
+    def run(self, running):
+        """Writer loop; returns (after a final flush) once `running` is cleared."""
+        self._started.set()
+        try:
+            while running.is_set():
+                wait = 1 if not self._pending else min(1, max(0.0, self._deadline - self._clock()))
+                try:
+                    self._take(self.queue.get(timeout=wait))
+                except queue.Empty:
+                    pass
+                self._drain_nowait(self.batch_size)
+
+                if self._pending and (len(self._pending) >= self.batch_size or self._clock() >= self._deadline):
+                    self.flush()
+        finally:
+            self._final_flush()
+            self._stopped.set()
+
+    async def arun(self, running):
+        """run() for an asyncio.Queue on the engine runtime's event loop; the inserts run in a worker thread."""
+        self._loop = asyncio.get_running_loop()
+        self._started.set()
+        try:
+            while running.is_set():
+                wait = 1 if not self._pending else min(1, max(0.0, self._deadline - self._clock()))
+                try:
+                    self._take(await asyncio.wait_for(self.queue.get(), wait))
+                except asyncio.TimeoutError:
+                    pass
+                self._drain_nowait(self.batch_size)
+
+                if self._pending and (len(self._pending) >= self.batch_size or self._clock() >= self._deadline):
+                    await asyncio.to_thread(self.flush)
+        finally:
+            # drain on the loop (asyncio.Queue is not thread-safe), insert off it
+            while True:
+                self._drain_nowait(self.batch_size)
+                if not self._pending:
+                    break
+                await asyncio.to_thread(self.flush)
+            self._stopped.set()
+
+    def _final_flush(self):
+        while True:
+            self._drain_nowait(self.batch_size)
+            if not self._pending:
+                return
+            self.flush()
+
+    def flush(self):
+        """Write the pending ticks (if any) as one batch."""
+        with self._lock:
+            batch, self._pending, self._deadline = self._pending, [], None
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                self.save(self.user_id, batch)
+            except Exception as e:
+                self.failed_rows += len(batch)
+                self.flush_latency.observe((time.perf_counter() - started) * 1000, error=True)
+                logger.exception("LiveTick batch of %s failed: %s", len(batch), e)
+                return 0
+
+            self.flush_latency.observe((time.perf_counter() - started) * 1000)
+            self.batches += 1
+            self.rows += len(batch)
+            self.last_batch = len(batch)
+            self.max_batch = max(self.max_batch, len(batch))
+            return len(batch)
+
+    def stop(self, timeout=5):
+        """Wait for the loop's final flush (the caller clears `running` first); flush here if it never ran."""
+        if self._started.is_set():
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._wake)
+            else:
+                self._wake()
+            if not self._stopped.wait(timeout):
+                logger.warning("Tick writer for user %s did not finish within %ss", self.user_id, timeout)
+        else:
+            self._final_flush()
+
+    def _wake(self):
+        try:
+            self.queue.put_nowait(_WAKE)
+        except (queue.Full, asyncio.QueueFull):
+            pass  # the loop is not blocked on an empty queue then
+
+    def metrics(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "failed_rows": self.failed_rows,
+            "queued": self.queue.qsize(),
+            "mean_batch": round(self.rows / self.batches, 1) if self.batches else None,
+            "max_batch": self.max_batch,
+            "last_batch": self.last_batch,
+            "flush_latency": self.flush_latency.stats(),
+        }
@@ -0,0 +1,101 @@
+# utils/trade_analytics.py
+import numpy as np
+import pandas as pd
+
+TRADE_ANALYTICS_COLUMNS = [
+    "entry_time","exit_time","direction","entry_price","exit_price","lots",
+    "reason_entry","reason_exit","holding_bars","holding_minutes",
+    "mfe_pct","mae_pct","gross_pnl","brokerage","net_pnl",
+    "pnl_pct_price","starting_cash_at_entry","available_after_exit"
+]
+
+
+def pair_trades(events_df):
+    """
+    Positions (in time order) of every ENTRY row immediately followed by its
+    EXIT row. Engines log strictly alternating ENTRY / EXIT per instrument,
+    so this is the same pairing as walking the log with an open-trade slot.
+    Returns (sorted events_df, entry_pos, exit_pos).
+    """
+    ev = events_df.sort_values("time", kind="stable").reset_index(drop=True)
+    kind = ev["event"].to_numpy().astype(object)
+    entry_pos = np.flatnonzero((kind[:-1] == "ENTRY") & (kind[1:] == "EXIT"))
+    return ev, entry_pos, entry_pos + 1
+
+
+def segment_extremes(high, low, start, stop):
+    """
+    max(high) / min(low) over every bar segment [start[k], stop[k]] (inclusive)
+    in one np.maximum.reduceat / np.minimum.reduceat call each.
+    """
+    high = np.append(np.asarray(high, dtype=np.float64), np.nan)   # room for stop + 1 == len
+    low = np.append(np.asarray(low, dtype=np.float64), np.nan)
+    bounds = np.empty(2 * len(start), dtype=np.int64)
+    bounds[0::2], bounds[1::2] = start, np.asarray(stop) + 1
+    return np.maximum.reduceat(high, bounds)[0::2], np.minimum.reduceat(low, bounds)[0::2]
+
+
+def trade_analytics(events_df, high=None, low=None, point_value=1.0, brokerage_pct=None, bar_minutes=15):
+    """
+    One row per round trip (TRADE_ANALYTICS_COLUMNS), all trades at once.
+
+    high / low: bar arrays the events' bar_index refers to; MFE / MAE are
+                taken from the true bar extremes between entry and exit bar
+                (inclusive). Without them, only entry / exit prices are used.
+    brokerage_pct: fees = pct * (entry + exit) * lots * point_value and
+                net = gross - fees; if None, net is the engine's realized_pnl
+                and brokerage = gross - net.
+    """
+    if events_df is None or events_df.empty:
+        return pd.DataFrame(columns=TRADE_ANALYTICS_COLUMNS)
+
+    ev, entry_pos, exit_pos = pair_trades(events_df)
+    entries, exits = ev.iloc[entry_pos], ev.iloc[exit_pos]
+
+    entry_price = entries["price"].to_numpy(dtype=np.float64)
+    exit_price = exits["price"].to_numpy(dtype=np.float64)
+    lots = entries["lots"].to_numpy(dtype=np.int64)
+    direction = entries["direction"].to_numpy().astype(object)
+    side = np.where(direction == "LONG", 1.0, -1.0)
+    entry_bar = entries["bar_index"].to_numpy(dtype=np.int64)
+    exit_bar = exits["bar_index"].to_numpy(dtype=np.int64)
+
+    if high is not None and low is not None and len(entry_bar):
+        seg_high, seg_low = segment_extremes(high, low, entry_bar, exit_bar)
+    else:
+        seg_high = np.maximum(entry_price, exit_price)
+        seg_low = np.minimum(entry_price, exit_price)
+
+    long_ = side > 0
+    mfe_pct = np.where(long_, seg_high - entry_price, entry_price - seg_low) / entry_price * 100.0
+    mae_pct = np.where(long_, seg_low - entry_price, entry_price - seg_high) / entry_price * 100.0
+
+    gross_pnl = (exit_price - entry_price) * side * lots * point_value
+    if brokerage_pct is None:
+        net_pnl = exits["realized_pnl"].to_numpy(dtype=np.float64)
+        brokerage = gross_pnl - net_pnl
+    else:
+        brokerage = brokerage_pct * entry_price * lots * point_value + brokerage_pct * exit_price * lots * point_value
+        net_pnl = gross_pnl - brokerage
+
+    holding_bars = exit_bar - entry_bar
+    return pd.DataFrame({
+        "entry_time": entries["time"].reset_index(drop=True),
+        "exit_time": exits["time"].reset_index(drop=True),
+        "direction": direction,
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "lots": lots,
+        "reason_entry": entries["reason"].to_numpy().astype(object),
+        "reason_exit": exits["reason"].to_numpy().astype(object),
+        "holding_bars": holding_bars,
+        "holding_minutes": holding_bars * bar_minutes,
+        "mfe_pct": mfe_pct,
+        "mae_pct": mae_pct,
+        "gross_pnl": gross_pnl,
+        "brokerage": brokerage,
+        "net_pnl": net_pnl,
+        "pnl_pct_price": (exit_price - entry_price) / entry_price * 100.0 * side,
+        "starting_cash_at_entry": entries["available_cash"].to_numpy(dtype=np.float64),
+        "available_after_exit": exits["available_cash"].to_numpy(dtype=np.float64),
+    }, columns=TRADE_ANALYTICS_COLUMNS)
@@ -0,0 +1,169 @@
+# utils/walk_forward.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.backtest import normalize_candles, apply_indicators, resolve_strategy_params
+from utils.sweep import (
+    expand_grid, summarize_stats, RESULT_COLUMNS,
+    _share_candles, _init_worker, _release_worker, _worker_engine, _WORKER,
+)
+
+
+# -------------------------
+# Windows
+# -------------------------
+def month_windows(times, in_sample_months=6, out_of_sample_months=1, step_months=None):
+    """
+    Rolling calendar-month windows over sorted candle times.
+
+    Returns a list of (is_start, is_stop, oos_start, oos_stop) bar ranges.
+    Windows end on month boundaries, where the strategy is already flat
+    (month-end exit), so out-of-sample segments stitch without open positions.
+    step_months must be >= out_of_sample_months: overlapping out-of-sample
+    windows would trade the same months more than once in the stitched curve.
+    """
+    if in_sample_months < 1 or out_of_sample_months < 1:
+        raise ValueError("in_sample_months and out_of_sample_months must be >= 1")
+    step = step_months or out_of_sample_months
+    if step < out_of_sample_months:
+        raise ValueError(f"step_months ({step}) must be >= out_of_sample_months ({out_of_sample_months})")
+
+    times = pd.DatetimeIndex(times)
+    wall = times.tz_localize(None) if times.tz is not None else times
+    ym = wall.year.to_numpy() * 12 + wall.month.to_numpy()
+    _, first = np.unique(ym, return_index=True)
+    bounds = list(np.sort(first)) + [len(ym)]
+    n_months = len(bounds) - 1
+
+    windows = []
+    k = in_sample_months
+    while k < n_months:
+        oos_end = min(k + out_of_sample_months, n_months)
+        windows.append((int(bounds[k - in_sample_months]), int(bounds[k]), int(bounds[k]), int(bounds[oos_end])))
+        k += step
+    return windows
+
+
+# -------------------------
+# Per-window optimisation (runs in worker processes)
+# -------------------------
+def _optimize_window(task):
+    is_start, is_stop, combos, rank_by, ascending = task
+    rows = []
+    for combo in combos:
+        params = dict(_WORKER["base_params"])
+        params.update(combo)
+        eng = _worker_engine(params, _WORKER["starting_cash"], is_start, is_stop)
+        rows.append(summarize_stats(eng.stats(), eng.events.to_frame(categorical=True), _WORKER["starting_cash"]))
+
+    table = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    best = table[rank_by].sort_values(ascending=ascending, kind="stable").index[0]
+    return combos[best], float(table.at[best, rank_by])
+
+
+# -------------------------
+# Public API
+# -------------------------
+def run_walk_forward(candles, grid, strategy=None, starting_cash=2500000.0,
+                     in_sample_months=6, out_of_sample_months=1, step_months=None,
+                     workers=None, rank_by="ending_cash", ascending=False):
+    """
+    Walk-forward optimisation of the C3+EMA backtest.
+
+    For every rolling window the grid (see utils.sweep.expand_grid) is
+    evaluated on the in-sample months and the best combination by `rank_by`
+    is traded on the following out-of-sample months. Windows are optimised
+    concurrently (one task per window over shared-memory candles; EMAs come
+    from utils.indicator_cache), then out-of-sample segments are replayed in
+    order with cash carried from one segment to the next.
+
+    Returns:
+      events_df: stitched out-of-sample events (EVENT_COLUMNS + "window"),
+                 realized_pnl_cum / available_cash continuous across windows
+      windows_df: one row per window with ranges, chosen params and scores
+      stats: same keys as utils.backtest.backtest stats, over all OOS segments
+    """
+    combos = expand_grid(grid)
+    base_params = resolve_strategy_params(strategy)
+    if rank_by not in RESULT_COLUMNS:
+        raise ValueError(f"Unknown rank_by column: {rank_by}")
+
+    df = normalize_candles(candles)
+    df = apply_indicators(df, base_params)
+    windows = month_windows(df["datetime"], in_sample_months, out_of_sample_months, step_months)
+    if not windows:
+        raise ValueError("Not enough history for one in-sample + out-of-sample window")
+
+    tasks = [(a, b, combos, rank_by, ascending) for a, b, _, _ in windows]
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+
+    segments, spec = _share_candles(df)
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(spec, base_params, starting_cash)) as pool:
+                chosen = list(pool.map(_optimize_window, tasks))
+
+        _init_worker(spec, base_params, starting_cash)
+        try:
+            if workers <= 1:
+                chosen = [_optimize_window(t) for t in tasks]
+            events_df, windows_df, stats = _stitch_out_of_sample(windows, chosen, base_params, starting_cash)
+        finally:
+            _release_worker()
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+    return events_df, windows_df, stats
+
+
+def _stitch_out_of_sample(windows, chosen, base_params, starting_cash):
+    times = _WORKER["times"]
+    cash, pnl_cum = float(starting_cash), 0.0
+    frames, rows = [], []
+    stats = {
+        "wins": 0, "losses": 0, "exit_pnls": [],
+        "flat_cash_min": (cash, None), "flat_cash_max": (cash, None),
+        "first_ts": times[windows[0][2]], "last_ts": None,
+    }
+
+    for w, ((is_a, is_b, oos_a, oos_b), (combo, score)) in enumerate(zip(windows, chosen)):
+        params = dict(base_params)
+        params.update(combo)
+        eng = _worker_engine(params, cash, oos_a, oos_b)
+        ev, _, st = eng.results()
+
+        ev["realized_pnl_cum"] = ev["realized_pnl_cum"] + pnl_cum
+        ev["window"] = w
+        frames.append(ev)
+
+        stats["wins"] += st["wins"]
+        stats["losses"] += st["losses"]
+        stats["exit_pnls"].extend(st["exit_pnls"])
+        if st["flat_cash_min"][0] < stats["flat_cash_min"][0]: stats["flat_cash_min"] = st["flat_cash_min"]
+        if st["flat_cash_max"][0] > stats["flat_cash_max"][0]: stats["flat_cash_max"] = st["flat_cash_max"]
+        stats["last_ts"] = st["last_ts"]
+
+        rows.append({
+            "window": w,
+            "is_start": times[is_a], "is_end": times[is_b - 1],
+            "oos_start": times[oos_a], "oos_end": times[oos_b - 1],
+            **combo,
+            "is_score": score,
+            "oos_pnl": eng.cash - cash,
+            "oos_trades": st["wins"] + st["losses"],
+            "oos_ending_cash": eng.cash,
+        })
+        pnl_cum += eng.realized_pnl_cum
+        cash = eng.cash
+
+    stats["ending_cash"] = cash
+    stats["realized_pnl_sum"] = pnl_cum
+
+    return pd.concat(frames, ignore_index=True), pd.DataFrame(rows), stats